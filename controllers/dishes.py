@@ -1,96 +1,206 @@
 # Controlador para gestionar platos en la base de datos
 # Importar módulos necesarios
-# Librerías para manejo de JSON, logging, fechas y excepciones HTTP
-import json 
+# Librerías para manejo de asincronía, logging, fechas, búsqueda binaria, caché de funciones y excepciones HTTP
+import asyncio
+import bisect
 import logging
 from datetime import datetime
+from functools import lru_cache
 from fastapi import HTTPException
 from models.dishes import Dish
 from models.dishes_ingredients import DishIngredient
-from utlis.database import execute_query_json
+from utlis.database import execute_query_rows, execute_bulk_insert, bulk_max_rows
+from utlis.repository import Repository
+from utlis.cache import get_cache, NOT_FOUND
+from utlis.search import PrefixIndex, LinkIndex
+from utlis.versions import table_versions
+from utlis.streaming import stream_rows_response
+from utlis.batch import fetch_by_ids
+from utlis.fields import select_fields
+from utlis.pagination import page_limit, cursor_key, page_response, cursor_after
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
 # Configurar el logger para este módulo
 logger = logging.getLogger(__name__)
 
+# Repositorio con las sentencias SQL precompiladas de la tabla de platos
+repository = Repository(Dish, "[kitchens].[dishes]")
+# Caché de platos por ID (tamaño y TTL configurables con CACHE_DISHES_MAX_SIZE y CACHE_DISHES_TTL_SECONDS)
+cache = get_cache("dishes")
+# Índice de prefijos de los nombres para el autocompletado
+search_index = PrefixIndex("dishes", repository)
+
+# Columnas de los ingredientes de un plato con sus datos relacionados
+DISH_INGREDIENT_COLUMNS: str = """
+            di.ingredient_id,
+            i.name as ingredient_name,
+            i.provider_id,
+            p.name as provider_name,
+            d.restaurant_id,
+            r.name as restaurant_name,
+            di.availability_date,
+            di.active"""
+
+# Tablas relacionadas de los ingredientes de un plato
+DISH_INGREDIENT_FROM: str = """
+        from kitchens.dishes_ingredients di
+        inner join kitchens.ingredients i
+        on di.ingredient_id = i.id
+        inner join kitchens.providers p
+        on i.provider_id = p.id
+        inner join kitchens.dishes d
+        on di.dish_id = d.id
+        inner join kitchens.restaurants r
+        on d.restaurant_id = r.id"""
+
+# Script SQL para obtener un ingrediente de un plato por sus IDs
+dish_ingredient_one_sql: str = f"""
+        select{DISH_INGREDIENT_COLUMNS}{DISH_INGREDIENT_FROM}
+        where di.dish_id = ?
+        and di.ingredient_id = ?;
+    """
+
+# Script SQL para obtener todos los ingredientes de un plato
+dish_ingredients_all_sql: str = f"""
+        select{DISH_INGREDIENT_COLUMNS}{DISH_INGREDIENT_FROM}
+        where di.dish_id = ?;
+    """
+
+# Script SQL para obtener los ingredientes de todos los platos (precarga de la caché)
+dish_ingredients_by_dish_sql: str = f"""
+        select
+            di.dish_id,{DISH_INGREDIENT_COLUMNS}{DISH_INGREDIENT_FROM}
+        order by di.dish_id, di.ingredient_id;
+    """
+
+# Tablas de las que dependen los ingredientes de un plato
+DISH_INGREDIENT_TABLES = ("dishes_ingredients", "ingredients", "providers", "dishes", "restaurants")
+
+# Script SQL para obtener todos los pares plato-ingrediente (índice inverso)
+dish_ingredient_pairs_sql: str = """
+        select dish_id, ingredient_id
+        from kitchens.dishes_ingredients
+    """
+
+# Índice inverso de los platos que usan cada ingrediente (para las búsquedas por ingrediente y por proveedor)
+dishes_by_ingredient = LinkIndex("dishes_by_ingredient", dish_ingredient_pairs_sql, "dish_id", "ingredient_id")
+
+# Caché de los ingredientes de cada plato con sus datos relacionados, por ID de plato
+# (cada elemento lleva etiquetas de los ingredientes, proveedores y restaurante de los que depende)
+links_cache = get_cache("dish_ingredients")
+
+# Repositorio de la tabla de relación entre platos e ingredientes (devuelve la fila con sus datos relacionados)
+links_repository = Repository(
+    DishIngredient,
+    "[kitchens].[dishes_ingredients]",
+    keys=("dish_id", "ingredient_id"),
+    columns=("dish_id", "ingredient_id", "availability_date", "active"),
+    identity=False,
+    returning=dish_ingredient_one_sql
+)
+
+# Obtener las etiquetas de los datos de los que dependen los ingredientes de un plato
+def _links_tags(rows: list[dict]) -> tuple[str, ...]:
+    # Etiquetas sin repetir
+    tags = set()
+    # Agregar el ingrediente, el proveedor y el restaurante de cada fila
+    for row in rows:
+        tags.add(f"ingredient:{row['ingredient_id']}")
+        tags.add(f"provider:{row['provider_id']}")
+        tags.add(f"restaurant:{row['restaurant_id']}")
+    # Devolver las etiquetas
+    return tuple(tags)
+
+# Obtener los ingredientes de un plato ordenados por ID de ingrediente (desde la caché o la base de datos)
+async def _dish_ingredients(dish_id: int) -> list[dict]:
+    # Devolver los ingredientes desde la caché si están guardados
+    rows = links_cache.get(dish_id)
+    if rows is not None:
+        return rows
+    # Versión de las tablas del join antes de consultar
+    versions = table_versions(*DISH_INGREDIENT_TABLES)
+    # Ejecutar la consulta SQL para obtener todos los ingredientes del plato
+    rows = await execute_query_rows(dish_ingredients_all_sql, params=[dish_id])
+    # Ordenar por ID de ingrediente (para la paginación)
+    rows.sort(key=lambda row: row["ingredient_id"])
+    # Guardar en la caché solo si ninguna escritura cambió las tablas mientras se consultaba
+    # (un plato sin ingredientes, o inexistente, se guarda con el TTL negativo)
+    if table_versions(*DISH_INGREDIENT_TABLES) == versions:
+        links_cache.set(dish_id, rows, ttl=None if rows else links_cache.negative_ttl, tags=_links_tags(rows))
+    # Devolver los ingredientes
+    return rows
+
+# Invalidar los ingredientes en caché de los platos que dependen de un dato ("ingredient", "provider" o "restaurant")
+def invalidate_dish_ingredients(kind: str, id: int):
+    # Quitar los platos que llevan la etiqueta del dato
+    links_cache.invalidate_tag(f"{kind}:{id}")
+
 # ------------------------- Funciones CRUD para la entidad Plato -------------------------
 
 # Crear un nuevo plato
 async def create_dish(dish: Dish) -> Dish:
     
-    # Script SQL para insertar un nuevo plato
-    sqlscript: str = """
-        insert into [kitchens].[dishes] ([restaurant_id], [name], [price], [type])
-        values (?,?,?,?)
-    """
-    
-    # Parámetros para la consulta SQL
-    params = [
-        dish.restaurant_id,
-        dish.name,
-        dish.price,
-        dish.type
-    ]
-    
-    # Resultado de la inserción
-    insert_result = None
+    # Sentencia SQL y parámetros para insertar el plato y devolver la fila creada en la misma consulta
+    sqlscript, params = repository.insert_statement(dish)
     
     # Realizar la inserción en la base de datos
     try:
-        # Ejecutar la consulta SQL para insertar el plato
-        insert_result = await execute_query_json(sqlscript, params=params,needs_commit=True)
+        # Ejecutar la consulta SQL para insertar el plato y obtener la fila creada
+        result_dict = await execute_query_rows(sqlscript, params=params, needs_commit=True)
     # Manejo de errores durante la inserción
     except Exception as e:
         # Registrar el error
         raise HTTPException(status_code=404, detail=f"Error al crear el plato: {str(e)}")
     
-    # Obtener el plato recién creado para devolverlo
-    sqlfind: str = """
-        select [id]
-            ,[restaurant_id]
-            ,[name]
-            ,[price]
-            ,[type]
-        from [kitchens].[dishes]
-        where name = ?
-    """
+    # Devolver el plato creado si la inserción devolvió la fila
+    if len(result_dict) > 0:
+        # Quitar la entrada negativa que pudiera tener el nuevo ID
+        cache.delete(result_dict[0]["id"])
+        # Agregar el nombre al índice de autocompletado
+        search_index.upsert(result_dict[0]["id"], result_dict[0]["name"])
+        # Devolver el plato creado
+        return result_dict[0]
+    # Si no se devolvió la fila, devolver una lista vacía
+    else:
+        # Devolver una lista vacía
+        return []
+
+# Crear varios platos en una sola transacción
+async def create_dishes_bulk(dishes: list[Dish]) -> list[int]:
+    
+    # Verificar el tamaño del lote
+    if len(dishes) == 0 or len(dishes) > bulk_max_rows:
+        # Lanzar una excepción HTTP 400 indicando que el lote es inválido
+        raise HTTPException(status_code=400, detail=f"El lote debe tener entre 1 y {bulk_max_rows} platos")
     
-    # Parámetros para buscar el plato recién creado
-    params = [dish.name]
+    # Filas a insertar en el orden recibido
+    rows = repository.bulk_rows(dishes)
     
-    # Resultado de la búsqueda
+    # Realizar la inserción masiva en la base de datos
     try:
-        # Realizar la búsqueda en la base de datos
-        result = await execute_query_json(sqlfind, params=params)
-        # Convertir el resultado JSON a diccionario
-        result_dict = json.loads(result)
-        # Devolver el primer plato encontrado
-        if len(result_dict) > 0:
-            # Devolver el primer plato encontrado
-            return result_dict[0]
-        # Si no se encuentra, devolver una lista vacía
-        else:
-            # Devolver una lista vacía
-            return []
-    # Manejo de errores durante la búsqueda    
+        # Insertar todas las filas en una sola transacción y obtener los IDs en el orden recibido
+        ids = await execute_bulk_insert(repository.table, list(repository.insert_columns), rows)
+    # Manejo de errores durante la inserción
     except Exception as e:
         # Registrar el error
-        raise HTTPException(status_code=404, detail=f"Error al obtener el plato creado: {str(e)}")
-        
+        raise HTTPException(status_code=404, detail=f"Error al crear los platos: {str(e)}")
+    
+    # Quitar las entradas negativas que pudieran tener los nuevos IDs y agregar los nombres al índice de autocompletado
+    for new_id, item in zip(ids, dishes):
+        cache.delete(new_id)
+        search_index.upsert(new_id, item.name)
+    # Devolver los IDs en el orden recibido
+    return ids
+
 # Obtener un plato por su ID        
 async def get_one_dish(id: int) -> Dish:
     
+    # Devolver el plato desde la caché si está guardado (NOT_FOUND indica que hace poco no existía)
+    cached = cache.get(id)
+    if cached is not None and cached is not NOT_FOUND:
+        return cached
+    
     # Script SQL para obtener un plato por su ID
-    selectscript: str = """
-        select [id]
-            ,[restaurant_id]
-            ,[name]
-            ,[price]
-            ,[type]
-        from [kitchens].[dishes]
-        where id = ?
-    """
+    selectscript: str = repository.select_one_sql
     
     # Parámetros para la consulta SQL
     params = [id]
@@ -98,19 +208,26 @@ async def get_one_dish(id: int) -> Dish:
     # Resultado de la consulta
     result_dict = []
     
+    # Versión de la tabla antes de consultar
+    versions = table_versions("dishes")
+    
     # Realizar la búsqueda en la base de datos
     try:
-        # Ejecutar la consulta SQL para obtener el plato por ID
-        result = await execute_query_json(selectscript, params=params)
-        # Convertir el resultado JSON a diccionario
-        result_dict = json.loads(result)
+        # Ejecutar la consulta SQL para obtener el plato por ID (sin consultar si se sabe que no existe)
+        result_dict = [] if cached is NOT_FOUND else await execute_query_rows(selectscript, params=params)
         
         # Retornar el plato si se encuentra
         if len(result_dict) > 0:
+            # Guardar el plato en la caché solo si ninguna escritura cambió la tabla mientras se consultaba
+            if table_versions("dishes") == versions:
+                cache.set(id, result_dict[0])
             # Retornar el primer plato encontrado
             return result_dict[0]
         # Si no se encuentra, lanzar una excepción HTTP 404
         else:
+            # Recordar por poco tiempo que el plato no existe
+            if cached is None and table_versions("dishes") == versions:
+                cache.set_missing(id)
             # Lanzar una excepción HTTP 404 indicando que el plato no fue encontrado
             raise HTTPException(status_code=404, detail=f"Plato no encontrado")
     # Manejo de errores durante la búsqueda
@@ -118,28 +235,53 @@ async def get_one_dish(id: int) -> Dish:
         # Registrar el error
         raise HTTPException(status_code=404, detail=f"Error al obtener el plato: {str(e)}")
     
-# Obtener todos los platos
-async def get_all_dishes() -> list[Dish]:
-    
-    # Script SQL para obtener todos los platos
-    selectscript: str = """
-        select [id]
-            ,[restaurant_id]
-            ,[name]
-            ,[price]
-            ,[type]
-        from [kitchens].[dishes]
-    """
+# Obtener todos los platos (con filtros y orden resueltos por la base de datos)
+async def get_all_dishes(
+    stream_format: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+    restaurant_id: int | None = None,
+    dish_type: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    sort: str | None = None,
+    fields: tuple[str, ...] | None = None
+) -> list[Dish] | dict:
+    
+    # Filtros del listado (columna, operador, valor); se ignoran los que no se enviaron
+    filters = [
+        ("restaurant_id", "=", restaurant_id),
+        ("type", "=", dish_type),
+        ("price", ">=", min_price),
+        ("price", "<=", max_price)
+    ]
+    
+    # Paginar por clave si se pidió un límite o un cursor
+    limit = page_limit(limit, cursor)
+    # Columna de orden (el cursor guarda su valor junto con el ID para continuar en el mismo orden)
+    column = (sort or repository.key).removeprefix("-")
+    # Posición de la última fila de la página anterior
+    after = cursor_after(cursor, column) if limit is not None else None
+    # Columnas a leer: las pedidas y, en una página, la clave y la columna de orden para el cursor (None para todas)
+    columns = select_fields(fields, repository.key, column) if limit is not None else fields
+    
+    # Script SQL (generado una sola vez por combinación de filtros, orden, página y columnas) y parámetros
+    # para obtener los platos; en una página se lee una fila extra para saber si hay más
+    selectscript, params = repository.select_statement(filters, sort, limit + 1 if limit is not None else None, after, columns)
     
     # Resultado de la consulta
     result_dict = []
     
     # Realizar la búsqueda en la base de datos
     try:
-        # Ejecutar la consulta SQL para obtener todos los platos
-        result = await execute_query_json(selectscript)
-        # Convertir el resultado JSON a diccionario
-        result_dict = json.loads(result)
+        # Devolver una página (desde la caché de resultados mientras la tabla no cambie) de platos si se pidió paginar
+        if limit is not None:
+            return page_response(await execute_query_rows(selectscript, params=params, cache_result=True), limit, column=column)
+        # Transmitir los platos por bloques si se pidió un formato transmitido
+        if stream_format:
+            return await stream_rows_response(selectscript, params=params, stream_format=stream_format)
+        # Ejecutar la consulta SQL para obtener todos los platos (desde la caché de resultados mientras la tabla no cambie)
+        result_dict = await execute_query_rows(selectscript, params=params, cache_result=True)
         # Devolver la lista de platos
         return result_dict
     # Manejo de errores durante la búsqueda
@@ -147,95 +289,74 @@ async def get_all_dishes() -> list[Dish]:
         # Registrar el error
         raise HTTPException(status_code=404, detail=f"Error al obtener los platos: {str(e)}")
     
-# Actualizar un plato existente    
-async def update_dish(dish: Dish) -> Dish:
-    
-    # Preparar los datos para la actualización
-    dict = dish.model_dump(exclude_unset=True)
-    # Obtener las claves de los campos a actualizar
-    keys = [k for k in dict.keys()]
-    # Quitar la clave 'id' de las claves a actualizar
-    keys.remove("id")
-    # Generar la parte de la consulta SQL para los campos a actualizar
-    variables = " = ?, ".join(keys) + " = ?"
-    
-    # Script SQL para la actualización
-    updatescript: str = f"""
-        update [kitchens].[dishes]
-        set {variables}
-        where id = ?
-    """
+# Obtener varios platos por sus IDs en el orden pedido (los que no existen se indican en missing)
+async def get_dishes_by_ids(ids: list[int]) -> dict:
     
-    # Parámetros para la consulta SQL
-    params = [dict[k] for k in keys]
-    # Agregar el ID del plato al final de los parámetros
-    params.append(dish.id)
-    
-    # Resultado de la actualización
-    update_result = None
-    
-    # Realizar la actualización en la base de datos
+    # Realizar la búsqueda en la caché y en la base de datos
     try:
-        # Ejecutar la consulta SQL para actualizar el plato
-        update_result = await execute_query_json(updatescript, params=params, needs_commit=True)
-    # Manejo de errores durante la actualización
+        # Leer los platos guardados en la caché y consultar el resto con una sola consulta
+        return await fetch_by_ids(repository, cache, ids)
+    # Manejo de errores durante la búsqueda
     except Exception as e:
         # Registrar el error
-        raise HTTPException(status_code=404, detail=f"Error al actualizar el plato: {str(e)}")
+        raise HTTPException(status_code=404, detail=f"Error al obtener los platos: {str(e)}")
     
-    # Obtener el plato actualizado para devolverlo
-    sqlfind: str = """
-        select [id]
-            ,[restaurant_id]
-            ,[name]
-            ,[price]
-            ,[type]
-        from [kitchens].[dishes]
-        where name = ?
-    """
+# Actualizar un plato existente    
+async def update_dish(dish: Dish) -> Dish:
     
-    # Parámetros para buscar el plato actualizado
-    params = [dish.name]
+    # Sentencia SQL (generada una sola vez por conjunto de campos) y parámetros para actualizar los campos enviados
+    statement = repository.update_statement(dish)
+    # Verificar que se haya enviado algún campo a actualizar
+    if statement is None:
+        # Lanzar una excepción HTTP 400 indicando que no hay campos para actualizar
+        raise HTTPException(status_code=400, detail="No se enviaron campos para actualizar")
+    # Separar la sentencia y los parámetros
+    updatescript, params = statement
     
-    # Resultado de la búsqueda
-    result_dict = []
-    
-    # Realizar la búsqueda en la base de datos
+    # Realizar la actualización en la base de datos
     try:
-        # Ejecutar la consulta SQL para obtener el plato actualizado
-        result = await execute_query_json(sqlfind, params=params)
-        # Convertir el resultado JSON a diccionario
-        result_dict = json.loads(result)
-        
-        # Devolver el plato actualizado si se encuentra
-        if len(result_dict) > 0:
-            # Devolver el primer plato encontrado
-            return result_dict[0]
-        # Si no se encuentra, devolver una lista vacía
-        else:
-            # Devolver una lista vacía
-            return []
-    # Manejo de errores durante la búsqueda
+        # Ejecutar la consulta SQL para actualizar el plato y obtener la fila actualizada
+        result_dict = await execute_query_rows(updatescript, params=params, needs_commit=True)
+    # Manejo de errores durante la actualización
     except Exception as e:
         # Registrar el error
-        raise HTTPException(status_code=404, detail=f"Error al obtener el plato actualizado: {str(e)}")
+        raise HTTPException(status_code=404, detail=f"Error al actualizar el plato: {str(e)}")
     
+    # Verificar que la actualización haya afectado alguna fila
+    if len(result_dict) == 0:
+        # Marcar el índice de autocompletado como al día (la escritura no cambió ninguna fila)
+        search_index.mark_written()
+        # Lanzar una excepción HTTP 404 indicando que el plato no fue encontrado
+        raise HTTPException(status_code=404, detail="Plato no encontrado")
+    # Invalidar el plato en la caché
+    cache.delete(dish.id)
+    # Actualizar el nombre en el índice de autocompletado (también marca el índice como al día con la escritura)
+    search_index.upsert(dish.id, result_dict[0]["name"])
+    # Invalidar sus ingredientes en caché si cambió de restaurante
+    if "restaurant_id" in dish.model_fields_set:
+        links_cache.delete(dish.id)
+    # Devolver el plato actualizado
+    return result_dict[0]
+
 # Eliminar un plato por su ID    
 async def delete_dish(id: int) -> str:
     
     # Script SQL para eliminar un plato por su ID
-    deletescript: str = """
-        delete from [kitchens].[dishes]
-        where id = ?
-    """
+    deletescript: str = repository.delete_sql
     
     # Parámetros para la consulta SQL
     params = [id]
     
     # Realizar la eliminación en la base de datos
     try:
-        # Ejecutar la consulta SQL para eliminar el plato
-        await execute_query_json(deletescript, params=params, needs_commit=True)
+        # Ejecutar la consulta SQL para eliminar el plato (el borrado en cascada también quita sus ingredientes)
+        await execute_query_rows(deletescript, params=params, needs_commit=True, tables=("dishes_ingredients",))
+        # Invalidar el plato y sus ingredientes en la caché
+        cache.delete(id)
+        links_cache.delete(id)
+        # Quitar el plato del índice de autocompletado y del índice inverso
+        search_index.remove(id)
+        dishes_by_ingredient.discard(source=id)
         # Devolver un mensaje de éxito
         return "Plato eliminado correctamente"
     # Manejo de errores durante la eliminación
@@ -243,38 +364,109 @@ async def delete_dish(id: int) -> str:
         # Registrar el error
         raise HTTPException(status_code=404, detail=f"Error al eliminar el plato: {str(e)}")
     
+# Obtener los platos que usan alguno de los ingredientes indicados (desde el índice inverso, sin recorrer la tabla)
+async def get_dishes_using(ingredient_ids: list[int]) -> list[Dish]:
+    
+    # IDs de los platos relacionados
+    dish_ids = await dishes_by_ingredient.lookup(ingredient_ids)
+    # Leer los platos desde la caché y consultar el resto con una sola consulta
+    result = await fetch_by_ids(repository, cache, dish_ids)
+    # Devolver los platos que existen, ordenados por ID
+    return [row for row in result["items"] if row is not None]
+
+# Cargar los platos y los ingredientes de cada plato en la caché (precarga al iniciar la aplicación)
+async def warm_dishes_cache() -> int:
+    
+    # Versión de las tablas del join antes de consultar
+    versions = table_versions(*DISH_INGREDIENT_TABLES)
+    # Obtener todos los platos y todos los ingredientes de los platos en dos consultas
+    dishes, links = await asyncio.gather(
+        execute_query_rows(repository.select_all_sql),
+        execute_query_rows(dish_ingredients_by_dish_sql)
+    )
+    # Guardar en la caché los platos que caben
+    for row in dishes[:cache.max_size]:
+        cache.set(row["id"], row)
+    # Agrupar los ingredientes por plato (ya vienen ordenados por plato e ingrediente)
+    by_dish = {row["id"]: [] for row in dishes}
+    for row in links:
+        # Copiar la fila sin el ID del plato (misma forma que la consulta por plato)
+        by_dish.setdefault(row["dish_id"], []).append({k: v for k, v in row.items() if k != "dish_id"})
+    # Guardar los ingredientes de cada plato solo si ninguna escritura cambió las tablas mientras se consultaba
+    if table_versions(*DISH_INGREDIENT_TABLES) == versions:
+        for dish_id, rows in list(by_dish.items())[:links_cache.max_size]:
+            links_cache.set(dish_id, rows, tags=_links_tags(rows))
+    # Devolver el número de platos cargados
+    return min(len(dishes), cache.max_size)
+
 # ------------------------- Funciones CRUD para la entidad Plato-Ingrediente -------------------------
 
 # Agregar un ingrediente a un plato    
 async def add_ingredient_to_dish(dish_id: int, ingredient_id: int) -> DishIngredient:
     
-    # Script SQL para agregar un ingrediente a un plato
-    insert_script: str = """
-        insert into [kitchens].[dishes_ingredients] ([dish_id],[ingredient_id],[availability_date],[active])
-        values (?,?,?,?);
-    """
-    
-    # Parámetros para la consulta SQL
-    params = [
-        dish_id, 
-        ingredient_id,
-        datetime.now(),
-        True
-        ]
+    # Datos de la relación a insertar (activa y disponible desde ahora)
+    link = DishIngredient.model_construct(
+        dish_id=dish_id,
+        ingredient_id=ingredient_id,
+        availability_date=datetime.now(),
+        active=True
+    )
+    # Sentencia SQL y parámetros para agregar el ingrediente y devolverlo con sus datos relacionados en un solo viaje
+    insert_script, params = links_repository.insert_statement(link)
     
     # Realizar la inserción en la base de datos
     try:
-        # Ejecutar la consulta SQL para agregar el ingrediente al plato
-        await execute_query_json(insert_script, params=params, needs_commit=True)
+        # Ejecutar la consulta SQL para agregar el ingrediente al plato y obtenerlo
+        result = await execute_query_rows(insert_script, params=params, needs_commit=True)
     # Manejo de errores durante la inserción    
     except Exception as e:
         # Registrar el error
         raise HTTPException(status_code=500, detail=f"Error al agregar el ingrediente al plato: {e}")
-    
-    # Obtener el ingrediente agregado para devolverlo
-    select_script: str = """
+    # Invalidar los ingredientes del plato en la caché
+    links_cache.delete(dish_id)
+    # Agregar la relación al índice inverso
+    dishes_by_ingredient.add((dish_id, ingredient_id))
+    
+    # Verificar que se haya devuelto el ingrediente agregado
+    if len(result) == 0:
+        # Lanzar una excepción HTTP 500 si no se pudo obtener el ingrediente agregado
+        raise HTTPException(status_code=500, detail="Error al obtener el ingrediente del plato")
+    # Devolver el ingrediente agregado
+    return result[0]
+
+# Generar el script SQL para agregar una cantidad dada de ingredientes a un plato
+@lru_cache(maxsize=64)
+def _add_ingredients_sql(count: int) -> str:
+    
+    # Marcadores de posición para los IDs pedidos
+    values = ",".join("(?)" for _ in range(count))
+    
+    # Devolver el script SQL que agrega los ingredientes válidos que aún no estaban en el plato
+    # y devuelve, para cada ID pedido, su estado y los datos del ingrediente agregado
+    return f"""
+        set nocount on;
+        declare @requested table ([ingredient_id] int primary key);
+        insert into @requested ([ingredient_id]) values {values};
+        declare @added table ([ingredient_id] int primary key);
+        insert into [kitchens].[dishes_ingredients] ([dish_id],[ingredient_id],[availability_date],[active])
+        output inserted.[ingredient_id] into @added
+        select ?, req.[ingredient_id], ?, 1
+        from @requested req
+        inner join [kitchens].[ingredients] i
+        on i.[id] = req.[ingredient_id]
+        where not exists (
+            select 1
+            from [kitchens].[dishes_ingredients] x
+            where x.[dish_id] = ?
+            and x.[ingredient_id] = req.[ingredient_id]
+        );
         select
-            di.ingredient_id,
+            req.ingredient_id,
+            case
+                when i.id is null then 'invalid'
+                when a.ingredient_id is null then 'already_linked'
+                else 'added'
+            end as link_status,
             i.name as ingredient_name,
             i.provider_id,
             p.name as provider_name,
@@ -282,120 +474,121 @@ async def add_ingredient_to_dish(dish_id: int, ingredient_id: int) -> DishIngred
             r.name as restaurant_name,
             di.availability_date,
             di.active
-        from kitchens.dishes_ingredients di
-        inner join kitchens.ingredients i
-        on di.ingredient_id = i.id
-        inner join kitchens.providers p
+        from @requested req
+        left join kitchens.ingredients i
+        on i.id = req.ingredient_id
+        left join @added a
+        on a.ingredient_id = req.ingredient_id
+        left join kitchens.dishes_ingredients di
+        on di.dish_id = ? and di.ingredient_id = a.ingredient_id
+        left join kitchens.providers p
         on i.provider_id = p.id
-        inner join kitchens.dishes d
+        left join kitchens.dishes d
         on di.dish_id = d.id
-        inner join kitchens.restaurants r
-        on d.restaurant_id = r.id
-        where di.dish_id = ?
-        and di.ingredient_id = ?;
+        left join kitchens.restaurants r
+        on d.restaurant_id = r.id;
     """
+
+# Agregar varios ingredientes a un plato en una sola sentencia y transacción
+async def add_ingredients_to_dish(dish_id: int, ingredient_ids: list[int]) -> dict:
+    
+    # Verificar que el plato exista (lanza HTTP 404 si no existe; usa la caché de platos)
+    await get_one_dish(dish_id)
+    
+    # Quitar IDs repetidos conservando el orden recibido
+    ingredient_ids = list(dict.fromkeys(ingredient_ids))
+    # Script SQL para el número de IDs pedidos (se genera una sola vez por cantidad)
+    insert_script: str = _add_ingredients_sql(len(ingredient_ids))
+    
     # Parámetros para la consulta SQL
-    params = [dish_id, ingredient_id]
+    params = [*ingredient_ids, dish_id, datetime.now(), dish_id, dish_id]
     
-    # Obtener y devolver el ingrediente agregado
+    # Realizar la inserción en la base de datos
     try:
-        # Ejecutar la consulta SQL para obtener el ingrediente agregado
-        result = await execute_query_json(select_script, params=params)
-        # Convertir el resultado JSON a un diccionario y devolver el primer elemento
-        return json.loads(result)[0]
-    # Manejo de errores durante la obtención
+        # Ejecutar la consulta SQL para agregar los ingredientes al plato
+        result = await execute_query_rows(insert_script, params=params, needs_commit=True)
+    # Manejo de errores durante la inserción
     except Exception as e:
         # Registrar el error
-        raise HTTPException(status_code=500, detail=f"Error al obtener el ingrediente del plato: {e}")
-    
+        raise HTTPException(status_code=500, detail=f"Error al agregar los ingredientes al plato: {e}")
+    # Invalidar los ingredientes del plato en la caché
+    links_cache.delete(dish_id)
+    
+    # Clasificar el resultado de cada ID pedido
+    status_by_id = {row["ingredient_id"]: row for row in result}
+    # Ingredientes agregados con sus datos relacionados, en el orden recibido
+    added = []
+    # IDs que ya estaban en el plato
+    already_linked = []
+    # IDs que no corresponden a ningún ingrediente
+    invalid = []
+    # Recorrer los IDs en el orden recibido
+    for ingredient_id in ingredient_ids:
+        # Obtener la fila del ID
+        row = status_by_id.get(ingredient_id)
+        # Obtener el estado del ID
+        link_status = row.pop("link_status") if row else "invalid"
+        # Clasificar el ID según su estado
+        if link_status == "added":
+            added.append(row)
+        elif link_status == "already_linked":
+            already_linked.append(ingredient_id)
+        else:
+            invalid.append(ingredient_id)
+    # Agregar las relaciones nuevas al índice inverso
+    dishes_by_ingredient.add(*((dish_id, row["ingredient_id"]) for row in added))
+    
+    # Devolver el resultado de la operación
+    return {
+        "added": added,
+        "already_linked": already_linked,
+        "invalid": invalid
+    }
+
 # Obtener un ingrediente de un plato por sus IDs
 async def get_one_ingredient(dish_id: int, ingredient_id: int) -> DishIngredient:
     
-    # Script SQL para obtener un ingrediente de un plato por sus IDs
-    select_script: str = """
-        select
-            di.ingredient_id,
-            i.name as ingredient_name,
-            i.provider_id,
-            p.name as provider_name,
-            d.restaurant_id,
-            r.name as restaurant_name,
-            di.availability_date,
-            di.active
-        from kitchens.dishes_ingredients di
-        inner join kitchens.ingredients i
-        on di.ingredient_id = i.id
-        inner join kitchens.providers p
-        on i.provider_id = p.id
-        inner join kitchens.dishes d
-        on di.dish_id = d.id
-        inner join kitchens.restaurants r
-        on d.restaurant_id = r.id
-        where di.dish_id = ?
-        and di.ingredient_id = ?;
-    """
-    
-    # Parámetros para la consulta SQL
-    params = [dish_id, ingredient_id]
-    
     # Obtener y devolver el ingrediente del plato
     try:
-        # Ejecutar la consulta SQL para obtener el ingrediente del plato
-        result = await execute_query_json(select_script, params=params)
-        # Convertir el resultado JSON a un diccionario
-        dict_result = json.loads(result)
-        # Verificar si el resultado está vacío
-        if len(dict_result) == 0:
+        # Obtener los ingredientes del plato ordenados por ID (una sola búsqueda en memoria si están en caché)
+        rows = await _dish_ingredients(dish_id)
+        # Buscar el ingrediente por su ID
+        position = bisect.bisect_left(rows, ingredient_id, key=lambda row: row["ingredient_id"])
+        # Verificar si el ingrediente no está en el plato
+        if position == len(rows) or rows[position]["ingredient_id"] != ingredient_id:
             # Lanzar una excepción HTTP 404 si no se encuentra el ingrediente
             raise HTTPException(status_code=404, detail="Ingrediente no encontrado para el plato")
-        # Devolver el primer ingrediente encontrado
-        return dict_result[0]
+        # Devolver el ingrediente encontrado
+        return rows[position]
     # Manejo de errores durante la obtención
     except HTTPException as e:
         # Registrar el error
         raise HTTPException(status_code=404, detail=f"Error al obtener el ingrediente del plato: {e}")
 
 # Obtener todos los ingredientes de un plato
-async def get_all_ingredients(dish_id: int) -> list[DishIngredient]:
+async def get_all_ingredients(dish_id: int, limit: int | None = None, cursor: str | None = None) -> list[DishIngredient] | dict:
     
-    # Script SQL para obtener todos los ingredientes de un plato
-    select_script: str = """
-        select
-            di.ingredient_id,
-            i.name as ingredient_name,
-            i.provider_id,
-            p.name as provider_name,
-            d.restaurant_id,
-            r.name as restaurant_name,
-            di.availability_date,
-            di.active
-        from kitchens.dishes_ingredients di
-        inner join kitchens.ingredients i
-        on di.ingredient_id = i.id
-        inner join kitchens.providers p
-        on i.provider_id = p.id
-        inner join kitchens.dishes d
-        on di.dish_id = d.id
-        inner join kitchens.restaurants r
-        on d.restaurant_id = r.id
-        where di.dish_id = ?;
-    """
-    
-    # Parámetros para la consulta SQL
-    params = [dish_id]
+    # Paginar por clave si se pidió un límite o un cursor
+    limit = page_limit(limit, cursor)
+    # Último ID de ingrediente devuelto (solo al paginar)
+    after = cursor_key(cursor, "ingredient_id") if limit is not None else None
     
     # Obtener y devolver los ingredientes del plato
     try:
-        # Ejecutar la consulta SQL para obtener los ingredientes del plato
-        result = await execute_query_json(select_script, params=params)
-        # Convertir el resultado JSON a un diccionario
-        dict_result = json.loads(result)
-        # Verificar si el resultado está vacío
-        if len(dict_result) == 0:
+        # Obtener los ingredientes del plato ordenados por ID (una sola búsqueda en memoria si están en caché)
+        rows = await _dish_ingredients(dish_id)
+        # Verificar si el plato no tiene ingredientes (solo en la primera página)
+        if len(rows) == 0 and not cursor:
             # Lanzar una excepción HTTP 404 si no se encuentran ingredientes
             raise HTTPException(status_code=404, detail="No se encontraron ingredientes para el plato")
+        # Devolver una página de ingredientes si se pidió paginar
+        if limit is not None:
+            # Posición del primer ingrediente después del cursor
+            start = bisect.bisect_right(rows, after, key=lambda row: row["ingredient_id"])
+            # Devolver la página (con una fila extra para saber si hay más)
+            return page_response(rows[start:start + limit + 1], limit, "ingredient_id")
         # Devolver la lista de ingredientes encontrados
-        return dict_result
+        return rows
     # Manejo de errores durante la obtención
     except HTTPException as e:
         # Registrar el error
@@ -404,87 +597,41 @@ async def get_all_ingredients(dish_id: int) -> list[DishIngredient]:
 # Actualizar un ingrediente de un plato
 async def update_ingredient(ingredient_data: DishIngredient) -> DishIngredient:
     
-    # Preparar los datos para la actualización
-    dict = ingredient_data.model_dump(exclude_none=True)
-    # Obtener las claves de los campos a actualizar
-    keys = [k for k in dict.keys()]
-    # Eliminar las claves que no deben actualizarse
-    keys.remove("dish_id")
-    # Eliminar la clave ingredient_id que no debe actualizarse
-    keys.remove("ingredient_id")
-    
-    # Generar la parte de la consulta SQL para los campos a actualizar
-    variables = " = ?, ".join(keys) + " = ?"
-    
-    # Script SQL para la actualización
-    updatescript: str = f"""
-        update [kitchens].[dishes_ingredients]
-        set {variables}
-        where [dish_id]=? and [ingredient_id]=?;
-    """
-    
-    # Parámetros para la consulta SQL
-    params = [dict[v] for v in keys]
-    # Agregar los IDs al final de los parámetros
-    params.append(ingredient_data.dish_id)
-    # Agregar el ID del ingrediente al final de los parámetros
-    params.append(ingredient_data.ingredient_id)
+    # Sentencia SQL (generada una sola vez por conjunto de campos) y parámetros para actualizar
+    # los campos enviados y devolver el ingrediente actualizado en el mismo viaje
+    statement = links_repository.update_statement(ingredient_data, exclude_none=True)
+    # Verificar que se haya enviado algún campo a actualizar
+    if statement is None:
+        # Lanzar una excepción HTTP 400 indicando que no hay campos para actualizar
+        raise HTTPException(status_code=400, detail="No se enviaron campos para actualizar")
+    # Separar la sentencia y los parámetros
+    updatescript, params = statement
     
     # Realizar la actualización en la base de datos
     try:
-        # Ejecutar la consulta SQL para actualizar el ingrediente del plato
-        await execute_query_json(updatescript, params=params, needs_commit=True)
+        # Ejecutar la consulta SQL para actualizar el ingrediente del plato y obtenerlo
+        result = await execute_query_rows(updatescript, params=params, needs_commit=True)
     # Manejo de errores durante la actualización
     except Exception as e:
         # Registrar el error
         raise HTTPException(status_code=500, detail=f"Error al actualizar el ingrediente del plato: {e}")
-    
-    # Obtener el ingrediente actualizado para devolverlo
-    select_script: str = """
-        select
-            di.ingredient_id,
-            i.name as ingredient_name,
-            i.provider_id,
-            p.name as provider_name,
-            d.restaurant_id,
-            r.name as restaurant_name,
-            di.availability_date,
-            di.active
-        from kitchens.dishes_ingredients di
-        inner join kitchens.ingredients i
-        on di.ingredient_id = i.id
-        inner join kitchens.providers p
-        on i.provider_id = p.id
-        inner join kitchens.dishes d
-        on di.dish_id = d.id
-        inner join kitchens.restaurants r
-        on d.restaurant_id = r.id
-        where di.dish_id = ?
-        and di.ingredient_id = ?;
-    """
-    
-    # Parámetros para la consulta SQL
-    params = [ingredient_data.dish_id, ingredient_data.ingredient_id]
-    
-    # Obtener y devolver el ingrediente actualizado
-    try:
-        # Ejecutar la consulta SQL para obtener el ingrediente actualizado
-        result = await execute_query_json(select_script, params=params)
-        # Convertir el resultado JSON a un diccionario y devolver el primer elemento
-        return json.loads(result)[0]
-    # Manejo de errores durante la obtención
-    except Exception as e:
-        # Registrar el error
-        raise HTTPException(status_code=500, detail=f"Error al obtener el ingrediente del plato: {e}")
-    
+    # Invalidar los ingredientes del plato en la caché
+    links_cache.delete(ingredient_data.dish_id)
+    # Marcar el índice inverso como al día (la actualización no cambia qué platos usan cada ingrediente)
+    dishes_by_ingredient.mark_written()
+    
+    # Verificar que el ingrediente exista en el plato
+    if len(result) == 0:
+        # Lanzar una excepción HTTP 404 si no se encuentra el ingrediente
+        raise HTTPException(status_code=404, detail="Ingrediente no encontrado para el plato")
+    # Devolver el ingrediente actualizado
+    return result[0]
+
 # Eliminar un ingrediente de un plato
 async def remove_ingredient(dish_id: int, ingredient_id: int) -> str:
     
     # Script SQL para eliminar un ingrediente de un plato
-    delete_script = """
-        delete from kitchens.dishes_ingredients
-        where [dish_id] = ? and [ingredient_id] = ?;
-    """
+    delete_script = links_repository.delete_sql
     
     # Parámetros para la consulta SQL
     params = [dish_id, ingredient_id]
@@ -492,7 +639,11 @@ async def remove_ingredient(dish_id: int, ingredient_id: int) -> str:
     # Realizar la eliminación en la base de datos
     try:
         # Ejecutar la consulta SQL para eliminar el ingrediente del plato
-        await execute_query_json(delete_script, params=params, needs_commit=True)
+        await execute_query_rows(delete_script, params=params, needs_commit=True)
+        # Invalidar los ingredientes del plato en la caché
+        links_cache.delete(dish_id)
+        # Quitar la relación del índice inverso
+        dishes_by_ingredient.discard(dish_id, ingredient_id)
         # Devolver un mensaje de éxito
         return "DELETED"
     # Manejo de errores durante la eliminación
@@ -0,0 +1,70 @@
+# Relaciones expandibles entre las entidades (?expand=).
+# Define qué relaciones se pueden pedir desde cada entidad y cómo se cargan por lotes.
+# Importar librerías necesarias
+# Librerías para la expansión de relaciones y repositorios de las entidades
+from fastapi import Response
+from utlis.expand import Relation, parse_expand, expand_tables, expand_rows
+from controllers.restaurants import repository as restaurants_repository
+from controllers.dishes import repository as dishes_repository
+from controllers.providers import repository as providers_repository
+
+# Script SQL para obtener los ingredientes de varios platos con los datos del vínculo
+dish_ingredients_in_sql: str = """
+        select
+            di.dish_id,
+            i.id,
+            i.provider_id,
+            i.name,
+            i.category,
+            di.availability_date,
+            di.active
+        from kitchens.dishes_ingredients di
+        inner join kitchens.ingredients i
+        on di.ingredient_id = i.id
+        where di.dish_id in ({values})
+    """
+
+# Relaciones de cada entidad
+RELATIONS: dict[str, dict[str, Relation]] = {
+    "restaurants": {
+        # Platos del restaurante
+        "dishes": Relation("dishes", dishes_repository.select_in_template("restaurant_id"), "id", "restaurant_id", True, ("dishes",))
+    },
+    "dishes": {
+        # Restaurante del plato
+        "restaurant": Relation("restaurants", restaurants_repository.select_in_template("id"), "restaurant_id", "id", False, ("restaurants",)),
+        # Ingredientes del plato con los datos del vínculo
+        "ingredients": Relation("ingredients", dish_ingredients_in_sql, "id", "dish_id", True, ("dishes_ingredients", "ingredients"))
+    },
+    "ingredients": {
+        # Proveedor del ingrediente
+        "provider": Relation("providers", providers_repository.select_in_template("id"), "provider_id", "id", False, ("providers",))
+    },
+    "providers": {}
+}
+
+# Obtener el árbol de relaciones pedidas y las tablas de las que dependen (para el ETag)
+def expansion(entity: str, expand: str | None) -> tuple[dict, tuple[str, ...]]:
+    # Convertir el parámetro en un árbol de relaciones
+    tree = parse_expand(RELATIONS, entity, expand)
+    # Devolver el árbol y sus tablas
+    return tree, expand_tables(RELATIONS, entity, tree)
+
+# Obtener las columnas de una entidad que se necesitan para expandir las relaciones pedidas
+def expansion_columns(entity: str, tree: dict) -> tuple[str, ...]:
+    # Columna local de cada relación
+    return tuple(RELATIONS[entity][name].local for name in tree)
+
+# Agregar las relaciones pedidas a un resultado (una fila, una lista de filas o una página)
+async def expand_result(entity: str, result, tree: dict):
+    # Nada que expandir (las respuestas propias, como las transmitidas, se devuelven sin cambios)
+    if not tree or isinstance(result, Response):
+        return result
+    # Expandir las filas de una página
+    if isinstance(result, dict) and "items" in result:
+        return {**result, "items": await expand_rows(RELATIONS, entity, result["items"], tree)}
+    # Expandir una sola fila
+    if isinstance(result, dict):
+        return (await expand_rows(RELATIONS, entity, [result], tree))[0]
+    # Expandir una lista de filas
+    return await expand_rows(RELATIONS, entity, result, tree)
\ No newline at end of file
@@ -1,90 +1,123 @@
 # Controlador para gestionar ingredientes en la base de datos
 # Importar módulos necesarios
-# Librerías para manejo de JSON, logging y excepciones HTTP
-import json 
+# Librerías para manejo de logging y excepciones HTTP
 import logging
 from fastapi import HTTPException
 from models.ingredients import Ingredient
-from utlis.database import execute_query_json
+from utlis.database import execute_query_rows, execute_bulk_insert, bulk_max_rows
+from utlis.repository import Repository
+from utlis.cache import get_cache, NOT_FOUND
+from utlis.versions import table_versions
+from utlis.search import PrefixIndex, LinkIndex
+from controllers.dishes import invalidate_dish_ingredients, dishes_by_ingredient, get_dishes_using
+from utlis.streaming import stream_rows_response
+from utlis.batch import fetch_by_ids
+from utlis.fields import select_fields
+from utlis.pagination import page_limit, cursor_after, page_response
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
 # Configurar el logger para este módulo
 logger = logging.getLogger(__name__)
 
+# Repositorio con las sentencias SQL precompiladas de la tabla de ingredientes
+repository = Repository(Ingredient, "[kitchens].[ingredients]")
+# Caché de ingredientes por ID (tamaño y TTL configurables con CACHE_INGREDIENTS_MAX_SIZE y CACHE_INGREDIENTS_TTL_SECONDS)
+cache = get_cache("ingredients")
+# Índice de prefijos de los nombres para el autocompletado
+search_index = PrefixIndex("ingredients", repository)
+# Índice inverso de los ingredientes de cada proveedor (para las búsquedas de platos por proveedor)
+ingredients_by_provider = LinkIndex(
+    "ingredients_by_provider",
+    repository.select_sql(columns=("id", "provider_id")),
+    "id",
+    "provider_id"
+)
+
+# Script SQL para obtener por categoría el número de ingredientes y de platos activos que los usan
+ingredients_stats_sql: str = """
+        select
+            i.category,
+            count(distinct i.id) as ingredients,
+            count(distinct case when di.active = 1 then di.dish_id end) as active_dishes
+        from kitchens.ingredients i
+        left join kitchens.dishes_ingredients di
+        on di.ingredient_id = i.id
+        group by i.category
+        order by i.category;
+    """
+
+# Tablas de las que dependen las estadísticas de los ingredientes
+INGREDIENTS_STATS_TABLES = ("ingredients", "dishes_ingredients")
+
 # ------------------------- Funciones CRUD para la entidad Ingrediente -------------------------
 
 # Crear un nuevo ingrediente
 async def create_ingredient(ingredient: Ingredient) -> Ingredient:
     
-    # Script SQL para insertar un nuevo ingrediente
-    sqlscript: str = """
-        insert into [kitchens].[ingredients] ([provider_id], [name], [category])
-        values (?,?,?)
-    """
-    # Parámetros para la consulta SQL
-    params = [
-        ingredient.provider_id,
-        ingredient.name,
-        ingredient.category
-    ]
-    
-    # Resultado de la inserción
-    insert_result = None
+    # Sentencia SQL y parámetros para insertar el ingrediente y devolver la fila creada en la misma consulta
+    sqlscript, params = repository.insert_statement(ingredient)
     
     # Realizar la inserción en la base de datos
     try:
-        # Ejecutar la consulta SQL para insertar el ingrediente
-        insert_result = await execute_query_json(sqlscript, params=params,needs_commit=True)
+        # Ejecutar la consulta SQL para insertar el ingrediente y obtener la fila creada
+        result_dict = await execute_query_rows(sqlscript, params=params, needs_commit=True)
     # Manejo de errores durante la inserción
     except Exception as e:
         # Registrar el error
         raise HTTPException(status_code=404, detail=f"Error al crear el ingrediente: {str(e)}")
     
-    # Obtener el ingrediente recién creado para devolverlo
-    sqlfind: str = """
-        select [id]
-            ,[provider_id]
-            ,[name]
-            ,[category]
-        from [kitchens].[ingredients]
-        where name = ?
-    """
+    # Devolver el ingrediente creado si la inserción devolvió la fila
+    if len(result_dict) > 0:
+        # Quitar la entrada negativa que pudiera tener el nuevo ID
+        cache.delete(result_dict[0]["id"])
+        # Agregar el nombre al índice de autocompletado
+        search_index.upsert(result_dict[0]["id"], result_dict[0]["name"])
+        # Agregar el ingrediente al índice de su proveedor
+        ingredients_by_provider.add((result_dict[0]["id"], result_dict[0]["provider_id"]))
+        # Devolver el ingrediente creado
+        return result_dict[0]
+    # Si no se devolvió la fila, devolver una lista vacía
+    else:
+        # Devolver una lista vacía
+        return []
+
+# Crear varios ingredientes en una sola transacción
+async def create_ingredients_bulk(ingredients: list[Ingredient]) -> list[int]:
+    
+    # Verificar el tamaño del lote
+    if len(ingredients) == 0 or len(ingredients) > bulk_max_rows:
+        # Lanzar una excepción HTTP 400 indicando que el lote es inválido
+        raise HTTPException(status_code=400, detail=f"El lote debe tener entre 1 y {bulk_max_rows} ingredientes")
     
-    # Parámetros para buscar el ingrediente recién creado
-    params = [ingredient.name]
+    # Filas a insertar en el orden recibido
+    rows = repository.bulk_rows(ingredients)
     
-    # Resultado de la búsqueda
+    # Realizar la inserción masiva en la base de datos
     try:
-        # Realizar la búsqueda en la base de datos
-        result = await execute_query_json(sqlfind, params=params)
-        # Convertir el resultado JSON a diccionario
-        result_dict = json.loads(result)
-        # Devolver el primer ingrediente encontrado
-        if len(result_dict) > 0:
-            # Devolver el primer ingrediente encontrado
-            return result_dict[0]
-        # Si no se encuentra, devolver una lista vacía
-        else:
-            # Devolver una lista vacía
-            return []
-    # Manejo de errores durante la búsqueda
+        # Insertar todas las filas en una sola transacción y obtener los IDs en el orden recibido
+        ids = await execute_bulk_insert(repository.table, list(repository.insert_columns), rows)
+    # Manejo de errores durante la inserción
     except Exception as e:
         # Registrar el error
-        raise HTTPException(status_code=404, detail=f"Error al obtener el ingrediente creado: {str(e)}")
-        
+        raise HTTPException(status_code=404, detail=f"Error al crear los ingredientes: {str(e)}")
+    
+    # Quitar las entradas negativas que pudieran tener los nuevos IDs y agregar los nombres al índice de autocompletado
+    for new_id, item in zip(ids, ingredients):
+        cache.delete(new_id)
+        search_index.upsert(new_id, item.name)
+        ingredients_by_provider.add((new_id, item.provider_id))
+    # Devolver los IDs en el orden recibido
+    return ids
+
 # Obtener un ingrediente por su ID
 async def get_one_ingredient(id: int) -> Ingredient:
     
+    # Devolver el ingrediente desde la caché si está guardado (NOT_FOUND indica que hace poco no existía)
+    cached = cache.get(id)
+    if cached is not None and cached is not NOT_FOUND:
+        return cached
+    
     # Script SQL para obtener un ingrediente por su ID
-    selectscript: str = """
-        select [id]
-            ,[provider_id]
-            ,[name]
-            ,[category]
-        from [kitchens].[ingredients]
-        where id = ?
-    """
+    selectscript: str = repository.select_one_sql
     
     # Parámetros para la consulta SQL
     params = [id]
@@ -92,19 +125,26 @@ async def get_one_ingredient(id: int) -> Ingredient:
     # Resultado de la consulta
     result_dict = []
     
+    # Versión de la tabla antes de consultar
+    versions = table_versions("ingredients")
+    
     # Realizar la búsqueda en la base de datos
     try:
-        # Ejecutar la consulta SQL para obtener el ingrediente por ID
-        result = await execute_query_json(selectscript, params=params)
-        # Convertir el resultado JSON a diccionario
-        result_dict = json.loads(result)
+        # Ejecutar la consulta SQL para obtener el ingrediente por ID (sin consultar si se sabe que no existe)
+        result_dict = [] if cached is NOT_FOUND else await execute_query_rows(selectscript, params=params)
         
         # Devolver el ingrediente si se encuentra
         if len(result_dict) > 0:
+            # Guardar el ingrediente en la caché solo si ninguna escritura cambió la tabla mientras se consultaba
+            if table_versions("ingredients") == versions:
+                cache.set(id, result_dict[0])
             # Devolver el primer ingrediente encontrado
             return result_dict[0]
         # Si no se encuentra, lanzar una excepción HTTP 404
         else:
+            # Recordar por poco tiempo que el ingrediente no existe
+            if cached is None and table_versions("ingredients") == versions:
+                cache.set_missing(id)
             # Lanzar una excepción HTTP 404 indicando que el ingrediente no fue encontrado
             raise HTTPException(status_code=404, detail=f"Ingrediente no encontrado")
     # Manejo de errores durante la búsqueda
@@ -112,27 +152,48 @@ async def get_one_ingredient(id: int) -> Ingredient:
         # Registrar el error
         raise HTTPException(status_code=404, detail=f"Error al obtener el ingrediente: {str(e)}")
     
-# Obtener todos los ingredientes
-async def get_all_ingredients() -> list[Ingredient]:
+# Obtener todos los ingredientes (con filtros y orden resueltos por la base de datos)
+async def get_all_ingredients(
+    stream_format: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+    provider_id: int | None = None,
+    category: str | None = None,
+    fields: tuple[str, ...] | None = None
+) -> list[Ingredient] | dict:
     
-    # Script SQL para obtener todos los ingredientes
-    selectscript: str = """
-        select [id]
-            ,[provider_id]
-            ,[name]
-            ,[category]
-        from [kitchens].[ingredients]
-    """
+    # Filtros del listado (columna, operador, valor); se ignoran los que no se enviaron
+    filters = [
+        ("provider_id", "=", provider_id),
+        ("category", "=", category)
+    ]
+    
+    # Paginar por clave si se pidió un límite o un cursor
+    limit = page_limit(limit, cursor)
+    # Columna de orden (el cursor guarda su valor junto con el ID para continuar en el mismo orden)
+    column = repository.key
+    # Posición de la última fila de la página anterior
+    after = cursor_after(cursor, column) if limit is not None else None
+    # Columnas a leer: las pedidas y, en una página, la clave y la columna de orden para el cursor (None para todas)
+    columns = select_fields(fields, repository.key, column) if limit is not None else fields
+    
+    # Script SQL (generado una sola vez por combinación de filtros, página y columnas) y parámetros
+    # para obtener los ingredientes; en una página se lee una fila extra para saber si hay más
+    selectscript, params = repository.select_statement(filters, None, limit + 1 if limit is not None else None, after, columns)
     
     # Resultado de la consulta
     result_dict = []
     
     # Realizar la búsqueda en la base de datos
     try:
-        # Ejecutar la consulta SQL para obtener todos los ingredientes
-        result = await execute_query_json(selectscript)
-        # Convertir el resultado JSON a diccionario
-        result_dict = json.loads(result)
+        # Devolver una página (desde la caché de resultados mientras la tabla no cambie) de ingredientes si se pidió paginar
+        if limit is not None:
+            return page_response(await execute_query_rows(selectscript, params=params, cache_result=True), limit, column=column)
+        # Transmitir los ingredientes por bloques si se pidió un formato transmitido
+        if stream_format:
+            return await stream_rows_response(selectscript, params=params, stream_format=stream_format)
+        # Ejecutar la consulta SQL para obtener todos los ingredientes (desde la caché de resultados mientras la tabla no cambie)
+        result_dict = await execute_query_rows(selectscript, params=params, cache_result=True)
         # Devolver la lista de ingredientes
         return result_dict
     # Manejo de errores durante la búsqueda
@@ -140,86 +201,64 @@ async def get_all_ingredients() -> list[Ingredient]:
         # Registrar el error
         raise HTTPException(status_code=404, detail=f"Error al obtener los ingredientes: {str(e)}")
     
-# Actualizar un ingrediente existente    
-async def update_ingredient(ingredient: Ingredient) -> Ingredient:
-    
-    # Script SQL para actualizar un ingrediente existente
-    dict = ingredient.model_dump(exclude_unset=True)
-    # Generar la parte de la consulta SQL para los campos a actualizar
-    keys = [k for k in dict.keys()]
-    # Excluir la clave "id" de los campos a actualizar
-    keys.remove("id")
-    # Generar dinámicamente las variables para la consulta SQL
-    variables = " = ?, ".join(keys) + " = ?"
-    
-    # Script SQL para la actualización
-    updatescript: str = f"""
-        update [kitchens].[ingredients]
-        set {variables}
-        where id = ?
-    """
+# Obtener varios ingredientes por sus IDs en el orden pedido (los que no existen se indican en missing)
+async def get_ingredients_by_ids(ids: list[int]) -> dict:
     
-    # Parámetros para la consulta SQL
-    params = [dict[k] for k in keys]
-    # Agregar el ID del ingrediente al final de los parámetros
-    params.append(ingredient.id)
-    
-    # Resultado de la actualización
-    update_result = None
-    
-    # Realizar la actualización en la base de datos
+    # Realizar la búsqueda en la caché y en la base de datos
     try:
-        # Ejecutar la consulta SQL para actualizar el ingrediente
-        update_result = await execute_query_json(updatescript, params=params, needs_commit=True)
-    # Manejo de errores durante la actualización
+        # Leer los ingredientes guardados en la caché y consultar el resto con una sola consulta
+        return await fetch_by_ids(repository, cache, ids)
+    # Manejo de errores durante la búsqueda
     except Exception as e:
         # Registrar el error
-        raise HTTPException(status_code=404, detail=f"Error al actualizar el ingrediente: {str(e)}")
-    
-    # Obtener el ingrediente actualizado para devolverlo
-    sqlfind: str = """
-        select [id]
-            ,[provider_id]
-            ,[name]
-            ,[category]
-        from [kitchens].[ingredients]
-        where name = ?
-    """
+        raise HTTPException(status_code=404, detail=f"Error al obtener los ingredientes: {str(e)}")
     
-    # Parámetros para buscar el ingrediente actualizado
-    params = [ingredient.name]
+# Actualizar un ingrediente existente    
+async def update_ingredient(ingredient: Ingredient) -> Ingredient:
     
-    # Resultado de la búsqueda
-    result_dict = []
+    # Sentencia SQL (generada una sola vez por conjunto de campos) y parámetros para actualizar los campos enviados
+    statement = repository.update_statement(ingredient)
+    # Verificar que se haya enviado algún campo a actualizar
+    if statement is None:
+        # Lanzar una excepción HTTP 400 indicando que no hay campos para actualizar
+        raise HTTPException(status_code=400, detail="No se enviaron campos para actualizar")
+    # Separar la sentencia y los parámetros
+    updatescript, params = statement
     
-    # Realizar la búsqueda en la base de datos
+    # Realizar la actualización en la base de datos
     try:
-        # Ejecutar la consulta SQL para obtener el ingrediente actualizado
-        result = await execute_query_json(sqlfind, params=params)
-        # Convertir el resultado JSON a diccionario
-        result_dict = json.loads(result)
-        
-        # Devolver el ingrediente actualizado si se encuentra
-        if len(result_dict) > 0:
-            # Devolver el primer ingrediente encontrado
-            return result_dict[0]
-        # Si no se encuentra, devolver una lista vacía
-        else:
-            # Devolver una lista vacía
-            return []
-    # Manejo de errores durante la búsqueda
+        # Ejecutar la consulta SQL para actualizar el ingrediente y obtener la fila actualizada
+        result_dict = await execute_query_rows(updatescript, params=params, needs_commit=True)
+    # Manejo de errores durante la actualización
     except Exception as e:
         # Registrar el error
-        raise HTTPException(status_code=404, detail=f"Error al obtener el ingrediente actualizado: {str(e)}")
+        raise HTTPException(status_code=404, detail=f"Error al actualizar el ingrediente: {str(e)}")
     
+    # Verificar que la actualización haya afectado alguna fila
+    if len(result_dict) == 0:
+        # Marcar los índices de la tabla como al día (la escritura no cambió ninguna fila)
+        search_index.mark_written()
+        ingredients_by_provider.mark_written()
+        # Lanzar una excepción HTTP 404 indicando que el ingrediente no fue encontrado
+        raise HTTPException(status_code=404, detail="Ingrediente no encontrado")
+    # Invalidar el ingrediente en la caché
+    cache.delete(ingredient.id)
+    # Actualizar el nombre en el índice de autocompletado (también marca el índice como al día con la escritura)
+    search_index.upsert(ingredient.id, result_dict[0]["name"])
+    # Mover el ingrediente al índice de su proveedor actual
+    ingredients_by_provider.discard(source=ingredient.id)
+    ingredients_by_provider.add((ingredient.id, result_dict[0]["provider_id"]))
+    # Invalidar los ingredientes en caché de los platos que lo usan si cambió el nombre o el proveedor
+    if "name" in ingredient.model_fields_set or "provider_id" in ingredient.model_fields_set:
+        invalidate_dish_ingredients("ingredient", ingredient.id)
+    # Devolver el ingrediente actualizado
+    return result_dict[0]
+
 # Eliminar un ingrediente por su ID
 async def delete_ingredient(id: int) -> str:
     
     # Script SQL para eliminar un ingrediente por su ID
-    deletescript: str = """
-        delete from [kitchens].[ingredients]
-        where id = ?
-    """
+    deletescript: str = repository.delete_sql
     
     # Parámetros para la consulta SQL
     params = [id]
@@ -227,10 +266,56 @@ async def delete_ingredient(id: int) -> str:
     # Realizar la eliminación en la base de datos
     try:
         # Ejecutar la consulta SQL para eliminar el ingrediente
-        await execute_query_json(deletescript, params=params, needs_commit=True)
+        await execute_query_rows(deletescript, params=params, needs_commit=True)
+        # Invalidar el ingrediente y los ingredientes en caché de los platos que lo usan
+        cache.delete(id)
+        # Quitar el nombre del índice de autocompletado
+        search_index.remove(id)
+        # Quitar el ingrediente del índice de su proveedor y del índice inverso de los platos
+        ingredients_by_provider.discard(source=id)
+        dishes_by_ingredient.discard(target=id)
+        invalidate_dish_ingredients("ingredient", id)
         # Devolver un mensaje de éxito
         return "Ingrediente eliminado correctamente"
     # Manejo de errores durante la eliminación
     except Exception as e:
         # Registrar el error
-        raise HTTPException(status_code=404, detail=f"Error al eliminar el ingrediente: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=404, detail=f"Error al eliminar el ingrediente: {str(e)}")
+
+# Obtener los platos que usan un ingrediente (desde el índice inverso, sin recorrer la relación plato-ingrediente)
+async def get_ingredient_dishes(id: int) -> list[dict]:
+    
+    # Verificar que el ingrediente exista (desde la caché si está guardado)
+    await get_one_ingredient(id)
+    
+    # Realizar la búsqueda en los índices y en la caché
+    try:
+        # Obtener los platos que usan el ingrediente
+        return await get_dishes_using([id])
+    # Manejo de errores durante la búsqueda
+    except Exception as e:
+        # Registrar el error
+        raise HTTPException(status_code=404, detail=f"Error al obtener los platos del ingrediente: {str(e)}")
+
+# Obtener las estadísticas de los ingredientes por categoría (agregadas por la base de datos)
+async def get_ingredients_stats() -> list[dict]:
+    
+    # Realizar la consulta de agregación
+    try:
+        # Ejecutar la consulta (desde la caché de resultados mientras las tablas no cambien)
+        return await execute_query_rows(ingredients_stats_sql, cache_result=True)
+    # Manejo de errores durante la consulta
+    except Exception as e:
+        # Registrar el error
+        raise HTTPException(status_code=404, detail=f"Error al obtener las estadísticas de los ingredientes: {str(e)}")
+
+# Cargar los ingredientes en la caché (precarga al iniciar la aplicación)
+async def warm_ingredients_cache() -> int:
+    
+    # Obtener todos los ingredientes en una sola consulta
+    rows = await execute_query_rows(repository.select_all_sql)
+    # Guardar en la caché los que caben
+    for row in rows[:cache.max_size]:
+        cache.set(row["id"], row)
+    # Devolver el número de ingredientes cargados
+    return min(len(rows), cache.max_size)
\ No newline at end of file
@@ -1,90 +1,117 @@
 # Controlador para gestionar restaurantes en la base de datos
 # Importar módulos necesarios
-# Librerías para manejo de JSON, logging y excepciones HTTP
-import json 
+# Librerías para manejo de logging y excepciones HTTP
 import logging
 from fastapi import HTTPException
 from models.providers import Provider
-from utlis.database import execute_query_json
+from utlis.database import execute_query_rows, execute_bulk_insert, bulk_max_rows
+from utlis.repository import Repository
+from utlis.cache import get_cache, NOT_FOUND
+from utlis.versions import table_versions
+from utlis.search import PrefixIndex
+from controllers.dishes import invalidate_dish_ingredients, get_dishes_using
+from controllers.ingredients import ingredients_by_provider
+from utlis.streaming import stream_rows_response
+from utlis.batch import fetch_by_ids
+from utlis.pagination import page_limit, cursor_after, page_response
+from utlis.fields import select_fields
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
 # Configurar el logger para este módulo
 logger = logging.getLogger(__name__)
 
+# Repositorio con las sentencias SQL precompiladas de la tabla de proveedores
+repository = Repository(Provider, "[kitchens].[providers]")
+# Caché de proveedores por ID (tamaño y TTL configurables con CACHE_PROVIDERS_MAX_SIZE y CACHE_PROVIDERS_TTL_SECONDS)
+cache = get_cache("providers")
+# Índice de prefijos de los nombres para el autocompletado
+search_index = PrefixIndex("providers", repository)
+
+# Script SQL para obtener por proveedor el número de ingredientes y de platos activos que los usan
+providers_stats_sql: str = """
+        select
+            p.id as provider_id,
+            p.name as provider_name,
+            count(distinct i.id) as ingredients,
+            count(distinct case when di.active = 1 then di.dish_id end) as active_dishes
+        from kitchens.providers p
+        left join kitchens.ingredients i
+        on i.provider_id = p.id
+        left join kitchens.dishes_ingredients di
+        on di.ingredient_id = i.id
+        group by p.id, p.name
+        order by p.id;
+    """
+
+# Tablas de las que dependen las estadísticas de los proveedores
+PROVIDERS_STATS_TABLES = ("providers", "ingredients", "dishes_ingredients")
+
 # ------------------------- Funciones CRUD para la entidad Proveedor -------------------------
 
 # Crear un nuevo proveedor
 async def create_provider(provider: Provider) -> Provider:
     
-    # Script SQL para insertar un nuevo proveedor
-    sqlscript: str = """
-        insert into [kitchens].[providers] ([name], [phone], [address])
-        values (?,?,?)
-    """
-    # Parámetros para la consulta SQL
-    params = [
-        provider.name,
-        provider.phone,
-        provider.address
-    ]
-    
-    # Resultado de la inserción
-    insert_result = None
+    # Sentencia SQL y parámetros para insertar el proveedor y devolver la fila creada en la misma consulta
+    sqlscript, params = repository.insert_statement(provider)
     
     # Realizar la inserción en la base de datos
     try:
-        # Ejecutar la consulta SQL para insertar el proveedor
-        insert_result = await execute_query_json(sqlscript, params=params,needs_commit=True)
+        # Ejecutar la consulta SQL para insertar el proveedor y obtener la fila creada
+        result_dict = await execute_query_rows(sqlscript, params=params, needs_commit=True)
     # Manejo de errores durante la inserción
     except Exception as e:
         # Registrar el error
         raise HTTPException(status_code=404, detail=f"Error al crear el proveedor: {str(e)}")
     
-    # Obtener el proveedor recién creado para devolverlo
-    sqlfind: str = """
-        select [id]
-            ,[name]
-            ,[phone]
-            ,[address]
-        from [kitchens].[providers]
-        where address = ?
-    """
+    # Devolver el proveedor creado si la inserción devolvió la fila
+    if len(result_dict) > 0:
+        # Quitar la entrada negativa que pudiera tener el nuevo ID
+        cache.delete(result_dict[0]["id"])
+        # Agregar el nombre al índice de autocompletado
+        search_index.upsert(result_dict[0]["id"], result_dict[0]["name"])
+        # Devolver el proveedor creado
+        return result_dict[0]
+    # Si no se devolvió la fila, devolver una lista vacía
+    else:
+        # Devolver una lista vacía
+        return []
+
+# Crear varios proveedores en una sola transacción
+async def create_providers_bulk(providers: list[Provider]) -> list[int]:
     
-    # Parámetros para buscar el proveedor recién creado
-    params = [provider.address]
+    # Verificar el tamaño del lote
+    if len(providers) == 0 or len(providers) > bulk_max_rows:
+        # Lanzar una excepción HTTP 400 indicando que el lote es inválido
+        raise HTTPException(status_code=400, detail=f"El lote debe tener entre 1 y {bulk_max_rows} proveedores")
     
-    # Resultado de la búsqueda
+    # Filas a insertar en el orden recibido
+    rows = repository.bulk_rows(providers)
+    
+    # Realizar la inserción masiva en la base de datos
     try:
-        # Realizar la búsqueda en la base de datos
-        result = await execute_query_json(sqlfind, params=params)
-        # Convertir el resultado JSON a diccionario
-        result_dict = json.loads(result)
-        # Devolver el primer proveedor encontrado
-        if len(result_dict) > 0:
-            # Retornar el primer proveedor encontrado
-            return result_dict[0]
-        # Si no se encuentra, devolver una lista vacía
-        else:
-            # Devolver una lista vacía
-            return []
-    # Manejo de errores durante la búsqueda    
+        # Insertar todas las filas en una sola transacción y obtener los IDs en el orden recibido
+        ids = await execute_bulk_insert(repository.table, list(repository.insert_columns), rows)
+    # Manejo de errores durante la inserción
     except Exception as e:
         # Registrar el error
-        raise HTTPException(status_code=404, detail=f"Error al obtener el proveedor creado: {str(e)}")
-        
+        raise HTTPException(status_code=404, detail=f"Error al crear los proveedores: {str(e)}")
+    
+    # Quitar las entradas negativas que pudieran tener los nuevos IDs y agregar los nombres al índice de autocompletado
+    for new_id, item in zip(ids, providers):
+        cache.delete(new_id)
+        search_index.upsert(new_id, item.name)
+    # Devolver los IDs en el orden recibido
+    return ids
+
 # Obtener un proveedor por su ID
 async def get_one_provider(id: int) -> Provider:
     
+    # Devolver el proveedor desde la caché si está guardado (NOT_FOUND indica que hace poco no existía)
+    cached = cache.get(id)
+    if cached is not None and cached is not NOT_FOUND:
+        return cached
+    
     # Script SQL para obtener un proveedor por su ID
-    selectscript: str = """
-        select [id]
-            ,[name]
-            ,[phone]
-            ,[address]
-        from [kitchens].[providers]
-        where id = ?
-    """
+    selectscript: str = repository.select_one_sql
     
     # Parámetros para la consulta SQL
     params = [id]
@@ -92,19 +119,26 @@ async def get_one_provider(id: int) -> Provider:
     # Resultado de la búsqueda
     result_dict = []
     
+    # Versión de la tabla antes de consultar
+    versions = table_versions("providers")
+    
     # Realizar la búsqueda en la base de datos
     try:
-        # Ejecutar la consulta SQL para obtener el proveedor por ID
-        result = await execute_query_json(selectscript, params=params)
-        # Convertir el resultado JSON a diccionario
-        result_dict = json.loads(result)
+        # Ejecutar la consulta SQL para obtener el proveedor por ID (sin consultar si se sabe que no existe)
+        result_dict = [] if cached is NOT_FOUND else await execute_query_rows(selectscript, params=params)
         
         # Retornar el proveedor si se encuentra
         if len(result_dict) > 0:
+            # Guardar el proveedor en la caché solo si ninguna escritura cambió la tabla mientras se consultaba
+            if table_versions("providers") == versions:
+                cache.set(id, result_dict[0])
             # Retornar el primer proveedor encontrado
             return result_dict[0]
         # Si no se encuentra, lanzar una excepción HTTP 404
         else:
+            # Recordar por poco tiempo que el proveedor no existe
+            if cached is None and table_versions("providers") == versions:
+                cache.set_missing(id)
             # Lanzar una excepción HTTP 404 indicando que el proveedor no fue encontrado
             raise HTTPException(status_code=404, detail=f"Proveedor no encontrado")
     # Manejo de errores durante la búsqueda    
@@ -112,27 +146,40 @@ async def get_one_provider(id: int) -> Provider:
         # Registrar el error
         raise HTTPException(status_code=404, detail=f"Error al obtener el proveedor: {str(e)}")
     
-# Obtener todos los proveedores    
-async def get_all_providers() -> list[Provider]:
+# Obtener todos los proveedores
+async def get_all_providers(
+    stream_format: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: tuple[str, ...] | None = None
+) -> list[Provider] | dict:
     
-    # Script SQL para obtener todos los proveedores
-    selectscript: str = """
-        select [id]
-            ,[name]
-            ,[phone]
-            ,[address]
-        from [kitchens].[providers]
-    """
+    # Paginar por clave si se pidió un límite o un cursor
+    limit = page_limit(limit, cursor)
+    # Columna de orden (la clave)
+    column = repository.key
+    # Posición de la última fila de la página anterior
+    after = cursor_after(cursor, column) if limit is not None else None
+    # Columnas a leer: las pedidas y, en una página, la clave para el cursor (None para todas)
+    columns = select_fields(fields, column) if limit is not None else fields
+    
+    # Script SQL (generado una sola vez por combinación de página y columnas) y parámetros para obtener
+    # los proveedores; en una página se lee una fila extra para saber si hay más
+    selectscript, params = repository.select_statement(top=limit + 1 if limit is not None else None, after=after, columns=columns)
     
     # Resultado de la búsqueda
     result_dict = []
     
     # Realizar la búsqueda en la base de datos
     try:
-        # Ejecutar la consulta SQL para obtener todos los proveedores
-        result = await execute_query_json(selectscript)
-        # Convertir el resultado JSON a diccionario
-        result_dict = json.loads(result)
+        # Devolver una página (desde la caché de resultados mientras la tabla no cambie) de proveedores si se pidió paginar
+        if limit is not None:
+            return page_response(await execute_query_rows(selectscript, params=params, cache_result=True), limit, column=column)
+        # Transmitir los proveedores por bloques si se pidió un formato transmitido
+        if stream_format:
+            return await stream_rows_response(selectscript, params=params, stream_format=stream_format)
+        # Ejecutar la consulta SQL para obtener todos los proveedores (desde la caché de resultados mientras la tabla no cambie)
+        result_dict = await execute_query_rows(selectscript, params=params, cache_result=True)
         # Devolver la lista de proveedores
         return result_dict
     # Manejo de errores durante la búsqueda
@@ -140,86 +187,60 @@ async def get_all_providers() -> list[Provider]:
         # Registrar el error
         raise HTTPException(status_code=404, detail=f"Error al obtener los proveedores: {str(e)}")
     
-# Actualizar un proveedor existente    
-async def update_provider(provider: Provider) -> Provider:
+# Obtener varios proveedores por sus IDs en el orden pedido (los que no existen se indican en missing)
+async def get_providers_by_ids(ids: list[int]) -> dict:
     
-    # Script SQL para actualizar un proveedor
-    dict = provider.model_dump(exclude_unset=True)
-    # Generar dinámicamente la parte de actualización del script SQL
-    keys = [k for k in dict.keys()]
-    # Quitar la clave 'id' de las claves a actualizar
-    keys.remove("id")
-    # Generar la cadena de variables para el SET del SQL
-    variables = " = ?, ".join(keys) + " = ?"
-    
-    # Script SQL para la actualización
-    updatescript: str = f"""
-        update [kitchens].[providers]
-        set {variables}
-        where id = ?
-    """
+    # Realizar la búsqueda en la caché y en la base de datos
+    try:
+        # Leer los proveedores guardados en la caché y consultar el resto con una sola consulta
+        return await fetch_by_ids(repository, cache, ids)
+    # Manejo de errores durante la búsqueda
+    except Exception as e:
+        # Registrar el error
+        raise HTTPException(status_code=404, detail=f"Error al obtener los proveedores: {str(e)}")
     
-    # Parámetros para la consulta SQL
-    params = [dict[k] for k in keys]
-    # Agregar el ID del proveedor al final de los parámetros
-    params.append(provider.id)
+# Actualizar un proveedor existente    
+async def update_provider(provider: Provider) -> Provider:
     
-    # Resultado de la actualización
-    update_result = None
+    # Sentencia SQL (generada una sola vez por conjunto de campos) y parámetros para actualizar los campos enviados
+    statement = repository.update_statement(provider)
+    # Verificar que se haya enviado algún campo a actualizar
+    if statement is None:
+        # Lanzar una excepción HTTP 400 indicando que no hay campos para actualizar
+        raise HTTPException(status_code=400, detail="No se enviaron campos para actualizar")
+    # Separar la sentencia y los parámetros
+    updatescript, params = statement
     
     # Realizar la actualización en la base de datos
     try:
-        # Ejecutar la consulta SQL para actualizar el proveedor
-        update_result = await execute_query_json(updatescript, params=params, needs_commit=True)
+        # Ejecutar la consulta SQL para actualizar el proveedor y obtener la fila actualizada
+        result_dict = await execute_query_rows(updatescript, params=params, needs_commit=True)
     # Manejo de errores durante la actualización
     except Exception as e:
-        # Registrar el error    
+        # Registrar el error
         raise HTTPException(status_code=404, detail=f"Error al actualizar el proveedor: {str(e)}")
     
-    # Obtener el proveedor actualizado para devolverlo
-    sqlfind: str = """
-        select [id]
-            ,[name]
-            ,[phone]
-            ,[address]
-        from [kitchens].[providers]
-        where address = ?
-    """
-    
-    # Parámetros para buscar el proveedor actualizado
-    params = [provider.address]
-    
-    # Resultado de la búsqueda
-    result_dict = []
-    
-    # Realizar la búsqueda en la base de datos
-    try:
-        # Ejecutar la consulta SQL para obtener el proveedor actualizado
-        result = await execute_query_json(sqlfind, params=params)
-        # Convertir el resultado JSON a diccionario
-        result_dict = json.loads(result)
-        
-        # Devolver el primer proveedor encontrado
-        if len(result_dict) > 0:
-            # Devolver el primer proveedor encontrado
-            return result_dict[0]
-        # Si no se encuentra, devolver una lista vacía
-        else:
-            # Devolver una lista vacía
-            return []
-    # Manejo de errores durante la búsqueda    
-    except Exception as e:
-        # Registrar el error
-        raise HTTPException(status_code=404, detail=f"Error al obtener el proveedor actualizado: {str(e)}")
-   
+    # Verificar que la actualización haya afectado alguna fila
+    if len(result_dict) == 0:
+        # Marcar el índice de autocompletado como al día (la escritura no cambió ninguna fila)
+        search_index.mark_written()
+        # Lanzar una excepción HTTP 404 indicando que el proveedor no fue encontrado
+        raise HTTPException(status_code=404, detail="Proveedor no encontrado")
+    # Invalidar el proveedor en la caché
+    cache.delete(provider.id)
+    # Actualizar el nombre en el índice de autocompletado (también marca el índice como al día con la escritura)
+    search_index.upsert(provider.id, result_dict[0]["name"])
+    # Invalidar los ingredientes en caché de los platos que lo usan si cambió el nombre
+    if "name" in provider.model_fields_set:
+        invalidate_dish_ingredients("provider", provider.id)
+    # Devolver el proveedor actualizado
+    return result_dict[0]
+
 # Eliminar un proveedor por su ID    
 async def delete_provider(id: int) -> str:
     
     # Script SQL para eliminar un proveedor por su ID
-    deletescript: str = """
-        delete from [kitchens].[providers]
-        where id = ?
-    """
+    deletescript: str = repository.delete_sql
     
     # Parámetros para la consulta SQL
     params = [id]
@@ -227,10 +248,57 @@ async def delete_provider(id: int) -> str:
     # Realizar la eliminación en la base de datos
     try:
         # Ejecutar la consulta SQL para eliminar el proveedor
-        await execute_query_json(deletescript, params=params, needs_commit=True)
+        await execute_query_rows(deletescript, params=params, needs_commit=True)
+        # Invalidar el proveedor y los ingredientes en caché de los platos que lo usan
+        cache.delete(id)
+        # Quitar el nombre del índice de autocompletado
+        search_index.remove(id)
+        # Quitar los ingredientes del proveedor del índice inverso
+        ingredients_by_provider.discard(target=id)
+        invalidate_dish_ingredients("provider", id)
         # Devolver un mensaje de éxito
         return "Proveedor eliminado correctamente"
     # Manejo de errores durante la eliminación
     except Exception as e:
         # Registrar el error
-        raise HTTPException(status_code=404, detail=f"Error al eliminar el proveedor: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=404, detail=f"Error al eliminar el proveedor: {str(e)}")
+
+# Obtener los platos que usan ingredientes de un proveedor (desde los índices inversos, sin recorrer las tablas)
+async def get_provider_dishes(id: int) -> list[dict]:
+    
+    # Verificar que el proveedor exista (desde la caché si está guardado)
+    await get_one_provider(id)
+    
+    # Realizar la búsqueda en los índices y en la caché
+    try:
+        # Ingredientes del proveedor
+        ingredient_ids = await ingredients_by_provider.lookup([id])
+        # Obtener los platos que usan alguno de esos ingredientes
+        return await get_dishes_using(ingredient_ids)
+    # Manejo de errores durante la búsqueda
+    except Exception as e:
+        # Registrar el error
+        raise HTTPException(status_code=404, detail=f"Error al obtener los platos del proveedor: {str(e)}")
+
+# Obtener las estadísticas de los proveedores (agregadas por la base de datos)
+async def get_providers_stats() -> list[dict]:
+    
+    # Realizar la consulta de agregación
+    try:
+        # Ejecutar la consulta (desde la caché de resultados mientras las tablas no cambien)
+        return await execute_query_rows(providers_stats_sql, cache_result=True)
+    # Manejo de errores durante la consulta
+    except Exception as e:
+        # Registrar el error
+        raise HTTPException(status_code=404, detail=f"Error al obtener las estadísticas de los proveedores: {str(e)}")
+
+# Cargar los proveedores en la caché (precarga al iniciar la aplicación)
+async def warm_providers_cache() -> int:
+    
+    # Obtener todos los proveedores en una sola consulta
+    rows = await execute_query_rows(repository.select_all_sql)
+    # Guardar en la caché los que caben
+    for row in rows[:cache.max_size]:
+        cache.set(row["id"], row)
+    # Devolver el número de proveedores cargados
+    return min(len(rows), cache.max_size)
\ No newline at end of file
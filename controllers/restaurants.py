@@ -1,109 +1,142 @@
 # Controlador para gestionar restaurantes en la base de datos
 # Importar módulos necesarios
-# Librerías para manejo de JSON, logging y excepciones HTTP
-import json 
+# Librerías para manejo de logging y excepciones HTTP
 import logging
 from fastapi import HTTPException
 from models.restaurants import Restaurant
-from utlis.database import execute_query_json
+from utlis.database import execute_query_rows, execute_bulk_insert, bulk_max_rows
+from utlis.repository import Repository
+from utlis.cache import get_cache, NOT_FOUND
+from utlis.versions import table_versions
+from controllers.dishes import invalidate_dish_ingredients, cache as dishes_cache
+from utlis.streaming import stream_rows_response
+from utlis.batch import fetch_by_ids
+from utlis.pagination import page_limit, cursor_after, page_response
+from utlis.fields import select_fields
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
 # Configurar el logger para este módulo
 logger = logging.getLogger(__name__)
 
+# Repositorio con las sentencias SQL precompiladas de la tabla de restaurantes
+repository = Repository(Restaurant, "[kitchens].[restaurants]")
+# Caché de restaurantes por ID (tamaño y TTL configurables con CACHE_RESTAURANTS_MAX_SIZE y CACHE_RESTAURANTS_TTL_SECONDS)
+cache = get_cache("restaurants")
+
+# Script SQL para obtener por tipo de plato de un restaurante el número de platos, sus precios y los
+# ingredientes activos (contados por plato para no repetir los precios en el join)
+restaurant_stats_sql: str = """
+        select
+            d.type,
+            count(*) as dishes,
+            min(d.price) as min_price,
+            max(d.price) as max_price,
+            avg(d.price) as avg_price,
+            sum(x.active_ingredients) as active_ingredients
+        from kitchens.dishes d
+        outer apply (
+            select count(*) as active_ingredients
+            from kitchens.dishes_ingredients di
+            where di.dish_id = d.id
+            and di.active = 1
+        ) x
+        where d.restaurant_id = ?
+        group by d.type
+        order by d.type;
+    """
+
+# Tablas de las que dependen las estadísticas de un restaurante
+RESTAURANT_STATS_TABLES = ("restaurants", "dishes", "dishes_ingredients")
+
 # ------------------------- Funciones CRUD para la entidad Restaurante -------------------------
 
 # Crear un nuevo restaurante
 async def create_restaurant(restaurant: Restaurant) -> Restaurant:
     
-    # Script SQL para insertar un nuevo restaurante
-    sqlscript: str = """
-        insert into [kitchens].[restaurants] ([name], [address], [phone])
-        values (?,?,?)
-    """
-
-    # Parámetros para la consulta SQL
-    params = [
-        restaurant.name,
-        restaurant.address,
-        restaurant.phone
-    ]
-    
-    # Resultado de la inserción
-    insert_result = None
+    # Sentencia SQL y parámetros para insertar el restaurante y devolver la fila creada en la misma consulta
+    sqlscript, params = repository.insert_statement(restaurant)
     
     # Realizar la inserción en la base de datos
     try:
-        # Ejecutar la consulta SQL para insertar el restaurante
-        insert_result = await execute_query_json(sqlscript, params=params,needs_commit=True)
+        # Ejecutar la consulta SQL para insertar el restaurante y obtener la fila creada
+        result_dict = await execute_query_rows(sqlscript, params=params, needs_commit=True)
     # Manejo de errores durante la inserción
     except Exception as e:
         # Registrar el error
         raise HTTPException(status_code=404, detail=f"Error al crear el restaurante: {str(e)}")
     
-    # Obtener el restaurante recién creado para devolverlo
-    sqlfind: str = """
-        select [id]
-            ,[name]
-            ,[address]
-            ,[phone]
-        from [kitchens].[restaurants]
-        where address = ?
-    """
+    # Devolver el restaurante creado si la inserción devolvió la fila
+    if len(result_dict) > 0:
+        # Quitar la entrada negativa que pudiera tener el nuevo ID
+        cache.delete(result_dict[0]["id"])
+        # Devolver el restaurante creado
+        return result_dict[0]
+    # Si no se devolvió la fila, devolver una lista vacía
+    else:
+        # Devolver una lista vacía
+        return []
+
+# Crear varios restaurantes en una sola transacción
+async def create_restaurants_bulk(restaurants: list[Restaurant]) -> list[int]:
     
-    # Parámetros para buscar el restaurante recién creado
-    params = [restaurant.address]
+    # Verificar el tamaño del lote
+    if len(restaurants) == 0 or len(restaurants) > bulk_max_rows:
+        # Lanzar una excepción HTTP 400 indicando que el lote es inválido
+        raise HTTPException(status_code=400, detail=f"El lote debe tener entre 1 y {bulk_max_rows} restaurantes")
     
-    # Resultado de la búsqueda
+    # Filas a insertar en el orden recibido
+    rows = repository.bulk_rows(restaurants)
+    
+    # Realizar la inserción masiva en la base de datos
     try:
-        result = await execute_query_json(sqlfind, params=params)
-        # Convertir el resultado JSON a diccionario
-        result_dict = json.loads(result)
-        # Devolver el primer restaurante encontrado
-        if len(result_dict) > 0:
-            # Devolver el primer restaurante encontrado
-            return result_dict[0]
-        # Si no se encuentra, devolver una lista vacía
-        else:
-            # Devolver una lista vacía
-            return []
-    # Manejo de errores durante la búsqueda
+        # Insertar todas las filas en una sola transacción y obtener los IDs en el orden recibido
+        ids = await execute_bulk_insert(repository.table, list(repository.insert_columns), rows)
+    # Manejo de errores durante la inserción
     except Exception as e:
         # Registrar el error
-        raise HTTPException(status_code=404, detail=f"Error al obtener el restaurante creado: {str(e)}")
-        
+        raise HTTPException(status_code=404, detail=f"Error al crear los restaurantes: {str(e)}")
+    
+    # Quitar las entradas negativas que pudieran tener los nuevos IDs
+    for new_id in ids:
+        cache.delete(new_id)
+    # Devolver los IDs en el orden recibido
+    return ids
+
 # Obtener un restaurante por su ID
 async def get_one_restaurant(id: int) -> Restaurant:
     
+    # Devolver el restaurante desde la caché si está guardado (NOT_FOUND indica que hace poco no existía)
+    cached = cache.get(id)
+    if cached is not None and cached is not NOT_FOUND:
+        return cached
+    
     # Script SQL para seleccionar un restaurante por su ID
-    selectscript: str = """
-        select [id]
-            ,[name]
-            ,[address]
-            ,[phone]
-        from [kitchens].[restaurants]
-        where id = ?
-    """
+    selectscript: str = repository.select_one_sql
     # Parámetros para la consulta SQL
     params = [id]
     
     # Resultado de la búsqueda
     result_dict = []
     
+    # Versión de la tabla antes de consultar
+    versions = table_versions("restaurants")
+    
     # Realizar la búsqueda en la base de datos
     try:
-        # Ejecutar la consulta SQL para obtener el restaurante por ID
-        result = await execute_query_json(selectscript, params=params)
-        # Convertir el resultado JSON a diccionario
-        result_dict = json.loads(result)
+        # Ejecutar la consulta SQL para obtener el restaurante por ID (sin consultar si se sabe que no existe)
+        result_dict = [] if cached is NOT_FOUND else await execute_query_rows(selectscript, params=params)
         
         # Devolver el restaurante encontrado o lanzar una excepción si no se encuentra
         if len(result_dict) > 0:
+            # Guardar el restaurante en la caché solo si ninguna escritura cambió la tabla mientras se consultaba
+            if table_versions("restaurants") == versions:
+                cache.set(id, result_dict[0])
             # Devolver el primer restaurante encontrado
             return result_dict[0]
         # Si no se encuentra, lanzar una excepción HTTP 404
         else:
+            # Recordar por poco tiempo que el restaurante no existe
+            if cached is None and table_versions("restaurants") == versions:
+                cache.set_missing(id)
             # Lanzar una excepción HTTP 404 indicando que el restaurante no fue encontrado
             raise HTTPException(status_code=404, detail=f"Restaurante no encontrado")
     # Manejo de errores durante la búsqueda
@@ -112,26 +145,39 @@ async def get_one_restaurant(id: int) -> Restaurant:
         raise HTTPException(status_code=404, detail=f"Error al obtener el restaurante: {str(e)}")
     
 # Obtener todos los restaurantes
-async def get_all_restaurants() -> list[Restaurant]:
-    
-    # Script SQL para seleccionar todos los restaurantes
-    selectscript: str = """
-        select [id]
-            ,[name]
-            ,[address]
-            ,[phone]
-        from [kitchens].[restaurants]
-    """
+async def get_all_restaurants(
+    stream_format: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: tuple[str, ...] | None = None
+) -> list[Restaurant] | dict:
+    
+    # Paginar por clave si se pidió un límite o un cursor
+    limit = page_limit(limit, cursor)
+    # Columna de orden (la clave)
+    column = repository.key
+    # Posición de la última fila de la página anterior
+    after = cursor_after(cursor, column) if limit is not None else None
+    # Columnas a leer: las pedidas y, en una página, la clave para el cursor (None para todas)
+    columns = select_fields(fields, column) if limit is not None else fields
+    
+    # Script SQL (generado una sola vez por combinación de página y columnas) y parámetros para obtener
+    # los restaurantes; en una página se lee una fila extra para saber si hay más
+    selectscript, params = repository.select_statement(top=limit + 1 if limit is not None else None, after=after, columns=columns)
     
     # Resultado de la búsqueda
     result_dict = []
     
     # Realizar la búsqueda en la base de datos
     try:
-        # Ejecutar la consulta SQL para obtener todos los restaurantes
-        result = await execute_query_json(selectscript)
-        # Convertir el resultado JSON a diccionario
-        result_dict = json.loads(result)
+        # Devolver una página (desde la caché de resultados mientras la tabla no cambie) de restaurantes si se pidió paginar
+        if limit is not None:
+            return page_response(await execute_query_rows(selectscript, params=params, cache_result=True), limit, column=column)
+        # Transmitir los restaurantes por bloques si se pidió un formato transmitido
+        if stream_format:
+            return await stream_rows_response(selectscript, params=params, stream_format=stream_format)
+        # Ejecutar la consulta SQL para obtener todos los restaurantes (desde la caché de resultados mientras la tabla no cambie)
+        result_dict = await execute_query_rows(selectscript, params=params, cache_result=True)
         # Devolver la lista de restaurantes encontrados
         return result_dict
     # Manejo de errores durante la búsqueda
@@ -139,86 +185,56 @@ async def get_all_restaurants() -> list[Restaurant]:
         # Registrar el error
         raise HTTPException(status_code=404, detail=f"Error al obtener los restaurantes: {str(e)}")
     
-# Actualizar un restaurante existente    
-async def update_restaurant(restaurant: Restaurant) -> Restaurant:
+# Obtener varios restaurantes por sus IDs en el orden pedido (los que no existen se indican en missing)
+async def get_restaurants_by_ids(ids: list[int]) -> dict:
     
-    # Script SQL para actualizar un restaurante existente
-    dict = restaurant.model_dump(exclude_unset=True)
-    # Generar dinámicamente la parte de actualización del script SQL
-    keys = [k for k in dict.keys()]
-    # Excluir la clave "id" de la actualización
-    keys.remove("id")
-    # Crear la cadena de variables para la consulta SQL
-    variables = " = ?, ".join(keys) + " = ?"
-    
-    # Script SQL de actualización
-    updatescript: str = f"""
-        update [kitchens].[restaurants]
-        set {variables}
-        where id = ?
-    """
+    # Realizar la búsqueda en la caché y en la base de datos
+    try:
+        # Leer los restaurantes guardados en la caché y consultar el resto con una sola consulta
+        return await fetch_by_ids(repository, cache, ids)
+    # Manejo de errores durante la búsqueda
+    except Exception as e:
+        # Registrar el error
+        raise HTTPException(status_code=404, detail=f"Error al obtener los restaurantes: {str(e)}")
     
-    # Parámetros para la consulta SQL
-    params = [dict[k] for k in keys]
-    # Agregar el ID del restaurante al final de los parámetros
-    params.append(restaurant.id)
+# Actualizar un restaurante existente    
+async def update_restaurant(restaurant: Restaurant) -> Restaurant:
     
-    # Resultado de la actualización
-    update_result = None
+    # Sentencia SQL (generada una sola vez por conjunto de campos) y parámetros para actualizar los campos enviados
+    statement = repository.update_statement(restaurant)
+    # Verificar que se haya enviado algún campo a actualizar
+    if statement is None:
+        # Lanzar una excepción HTTP 400 indicando que no hay campos para actualizar
+        raise HTTPException(status_code=400, detail="No se enviaron campos para actualizar")
+    # Separar la sentencia y los parámetros
+    updatescript, params = statement
     
     # Realizar la actualización en la base de datos
     try:
-        # Ejecutar la consulta SQL para actualizar el restaurante
-        update_result = await execute_query_json(updatescript, params=params, needs_commit=True)
+        # Ejecutar la consulta SQL para actualizar el restaurante y obtener la fila actualizada
+        result_dict = await execute_query_rows(updatescript, params=params, needs_commit=True)
     # Manejo de errores durante la actualización
     except Exception as e:
         # Registrar el error
         raise HTTPException(status_code=404, detail=f"Error al actualizar el restaurante: {str(e)}")
     
-    # Obtener el restaurante actualizado para devolverlo
-    sqlfind: str = """
-        select [id]
-            ,[name]
-            ,[address]
-            ,[phone]
-        from [kitchens].[restaurants]
-        where address = ?
-    """
-    
-    # Parámetros para buscar el restaurante actualizado
-    params = [restaurant.address]
-    
-    # Resultado de la búsqueda
-    result_dict = []
-    
-    # Realizar la búsqueda en la base de datos
-    try:
-        # Ejecutar la consulta SQL para obtener el restaurante actualizado
-        result = await execute_query_json(sqlfind, params=params)
-        # Convertir el resultado JSON a diccionario
-        result_dict = json.loads(result)
-        
-        # Devolver el primer restaurante encontrado
-        if len(result_dict) > 0:
-            # Devolver el primer restaurante encontrado
-            return result_dict[0]
-        # Si no se encuentra, devolver una lista vacía
-        else:
-            # Devolver una lista vacía
-            return []
-    # Manejo de errores durante la búsqueda
-    except Exception as e:
-        # Registrar el error
-        raise HTTPException(status_code=404, detail=f"Error al obtener el restaurante actualizado: {str(e)}")
+    # Verificar que la actualización haya afectado alguna fila
+    if len(result_dict) == 0:
+        # Lanzar una excepción HTTP 404 indicando que el restaurante no fue encontrado
+        raise HTTPException(status_code=404, detail="Restaurante no encontrado")
+    # Invalidar el restaurante en la caché
+    cache.delete(restaurant.id)
+    # Invalidar los ingredientes en caché de los platos que lo usan si cambió el nombre
+    if "name" in restaurant.model_fields_set:
+        invalidate_dish_ingredients("restaurant", restaurant.id)
+    # Devolver el restaurante actualizado
+    return result_dict[0]
 
 # Eliminar un restaurante por su ID    
 async def delete_restaurant(id: int) -> str:
     
     # Script SQL para eliminar un restaurante por su ID
-    deletescript: str = """
-        delete from [kitchens].[restaurants]
-        where id = ?
-    """
+    deletescript: str = repository.delete_sql
     
     # Parámetros para la consulta SQL
     params = [id]
@@ -226,10 +242,49 @@ async def delete_restaurant(id: int) -> str:
     # Realizar la eliminación en la base de datos
     try:
         # Ejecutar la consulta SQL para eliminar el restaurante
-        await execute_query_json(deletescript, params=params, needs_commit=True)
+        # (el borrado en cascada también quita sus platos y los ingredientes de esos platos)
+        await execute_query_rows(deletescript, params=params, needs_commit=True, tables=("dishes", "dishes_ingredients"))
+        # Invalidar el restaurante y los ingredientes en caché de los platos que lo usan
+        cache.delete(id)
+        invalidate_dish_ingredients("restaurant", id)
+        # Vaciar la caché de platos (no se sabe qué platos guardados eran del restaurante)
+        dishes_cache.clear()
         # Devolver un mensaje de éxito
         return "Restaurante eliminado correctamente"
     # Manejo de errores durante la eliminación
     except Exception as e:
         # Registrar el error
-        raise HTTPException(status_code=404, detail=f"Error al eliminar el restaurante: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=404, detail=f"Error al eliminar el restaurante: {str(e)}")
+
+# Obtener las estadísticas de los platos de un restaurante por tipo (agregadas por la base de datos)
+async def get_restaurant_stats(id: int) -> dict:
+    
+    # Verificar que el restaurante exista (desde la caché si está guardado)
+    await get_one_restaurant(id)
+    
+    # Realizar la consulta de agregación
+    try:
+        # Ejecutar la consulta (desde la caché de resultados mientras las tablas no cambien)
+        by_type = await execute_query_rows(restaurant_stats_sql, params=[id], cache_result=True)
+    # Manejo de errores durante la consulta
+    except Exception as e:
+        # Registrar el error
+        raise HTTPException(status_code=404, detail=f"Error al obtener las estadísticas del restaurante: {str(e)}")
+    
+    # Devolver los totales del restaurante y el detalle por tipo de plato
+    return {
+        "restaurant_id": id,
+        "dishes": sum(row["dishes"] for row in by_type),
+        "by_type": by_type
+    }
+
+# Cargar los restaurantes en la caché (precarga al iniciar la aplicación)
+async def warm_restaurants_cache() -> int:
+    
+    # Obtener todos los restaurantes en una sola consulta
+    rows = await execute_query_rows(repository.select_all_sql)
+    # Guardar en la caché los que caben
+    for row in rows[:cache.max_size]:
+        cache.set(row["id"], row)
+    # Devolver el número de restaurantes cargados
+    return min(len(rows), cache.max_size)
\ No newline at end of file
@@ -1,21 +1,55 @@
 # Main punto de entrada para la API de KITCHENS_API
 # Configura y ejecuta la aplicación FastAPI, incluyendo las rutas necesarias.
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from utlis.database import init_db, close_db
+from utlis.log import setup_logging, shutdown_logging
+from utlis.warmup import cache_warmup, warm_up
+from controllers.restaurants import warm_restaurants_cache
+from controllers.providers import warm_providers_cache
+from controllers.ingredients import warm_ingredients_cache
+from controllers.dishes import warm_dishes_cache
 # Importar routers de las diferentes rutas
 from routes.restaurants import router as router_restaurant
 from routes.dishes import router as router_dish
 from routes.ingredients import router as router_ingredient
 from routes.providers import router as router_provider
+from routes.search import router as router_search
+from routes.metrics import router as router_metrics
+
+# Ciclo de vida de la aplicación: crear y cerrar los recursos compartidos
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Iniciar el logging no bloqueante antes que el resto de los recursos
+    setup_logging()
+    # Crear el pool de hilos y el pool de conexiones a la base de datos al iniciar
+    init_db()
+    # Precargar las cachés antes de recibir peticiones si está activado (CACHE_WARMUP)
+    if cache_warmup:
+        await warm_up({
+            "restaurants": warm_restaurants_cache,
+            "providers": warm_providers_cache,
+            "ingredients": warm_ingredients_cache,
+            "dishes": warm_dishes_cache
+        })
+    # Ejecutar la aplicación
+    yield
+    # Detener el pool de hilos y cerrar el pool de conexiones al detener la aplicación
+    close_db()
+    # Escribir los registros pendientes y detener el logging
+    shutdown_logging()
 
 # Crear la instancia de la aplicación FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Incluir los routers en la aplicación
 app.include_router(router_restaurant)
 app.include_router(router_dish)
 app.include_router(router_ingredient)
 app.include_router(router_provider)
+app.include_router(router_search)
+app.include_router(router_metrics)
 
 # Definir la ruta raíz para verificar que la API está funcionando
 @app.get("/")
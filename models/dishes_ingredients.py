@@ -68,4 +68,14 @@ class DishIngredient(BaseModel):
     active: Optional[bool] = Field(
         default=None,
         description="Indica si el ingrediente está activo para el plato"
+    )
+
+# Definir el modelo Pydantic para agregar varios ingredientes a un plato
+class DishIngredientsBulk(BaseModel):
+    # Los IDs de los ingredientes a agregar al plato
+    ingredient_ids: list[int] = Field(
+        description="Los IDs de los ingredientes a agregar al plato",
+        min_length=1,
+        max_length=1000,
+        examples=[[1, 2, 3]]
     )
\ No newline at end of file
@@ -3,20 +3,30 @@
 # Importar FastAPI APIRouter y status
 # Librerías para manejo de modelos y controladores
 # Importar modelos y controladores
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Query, Request, Response, status
 from models.dishes import Dish
-from models.dishes_ingredients import DishIngredient
+from models.dishes_ingredients import DishIngredient, DishIngredientsBulk
+from utlis.streaming import resolve_stream_format
+from utlis.pagination import max_page_size
+from utlis.batch import parse_ids
+from utlis.etag import not_modified, with_etag
+from utlis.fields import parse_fields, select_fields, pick_fields
+from controllers.expansions import expansion, expansion_columns, expand_result
 from controllers.dishes import(
     create_dish,
+    create_dishes_bulk,
     update_dish,
     get_one_dish,
     get_all_dishes,
+    get_dishes_by_ids,
     delete_dish,
     add_ingredient_to_dish,
+    add_ingredients_to_dish,
     update_ingredient,
     get_one_ingredient,
     get_all_ingredients,
-    remove_ingredient
+    remove_ingredient,
+    DISH_INGREDIENT_TABLES
 )
 
 # Crear enrutador de FastAPI para dishes
@@ -33,23 +43,80 @@ async def create_new_dish(dish_data: Dish):
     # Devolver el resultado de la creación del dish
     return result
 
+# Definir ruta para crear varios dishes en una sola transacción
+@router.post("/bulk", tags=["Dishes"], status_code=status.HTTP_201_CREATED)
+# Definir función para crear varios dishes en una sola transacción
+async def create_dishes_bulk_route(dish_data: list[Dish]):
+    # Llamar a la función del controlador para crear los dishes
+    result = await create_dishes_bulk(dish_data)
+    # Devolver los IDs creados en el orden recibido
+    return result
+
 # Definir ruta para obtener un dish por ID
 @router.get("/{id}", tags=["Dishes"], status_code=status.HTTP_200_OK)
 # Definir función para obtener un dish por ID
-async def get_one_dish_route(id: int):
+async def get_one_dish_route(
+    id: int,
+    request: Request,
+    response: Response,
+    expand: str | None = Query(default=None, description="Relaciones a incluir en la respuesta, por ejemplo restaurant,ingredients.provider"),
+    fields: str | None = Query(default=None, description="Campos a devolver separados por comas, por ejemplo id,name")
+):
+    # Relaciones pedidas y tablas de las que dependen
+    tree, tables = expansion("dishes", expand)
+    # Campos pedidos (None para todos)
+    columns = parse_fields(Dish, fields)
+    # Responder 304 si el cliente ya tiene la versión actual (sin consultar la base de datos)
+    unchanged = not_modified(request, response, "dishes", *tables)
+    if unchanged:
+        return unchanged
     # Llamar a la función del controlador para obtener el dish
     result: Dish = await get_one_dish(id)
-    # Devolver el dish obtenido
-    return result
+    # Agregar las relaciones pedidas (una consulta por nivel)
+    result = await expand_result("dishes", result, tree)
+    # Devolver el dish obtenido con los campos pedidos
+    return pick_fields(result, columns, *tree)
 
 # Definir ruta para obtener todos los dishes
 @router.get("/", tags=["Dishes"], status_code=status.HTTP_200_OK)
 # Definir función para obtener todos los dishes
-async def get_all_dishes_route():
+async def get_all_dishes_route(
+    request: Request,
+    response: Response,
+    stream: str | None = Query(default=None, pattern="^(ndjson|json)$", description="Transmitir el listado por bloques en formato ndjson o json"),
+    limit: int | None = Query(default=None, ge=1, le=max_page_size, description="Número máximo de elementos por página"),
+    cursor: str | None = Query(default=None, description="Cursor opaco devuelto como next_cursor por la página anterior"),
+    restaurant_id: int | None = Query(default=None, description="Solo los platos de este restaurante"),
+    dish_type: str | None = Query(default=None, alias="type", pattern="^(entrada|plato principal|postre|bebida)$", description="Solo los platos de este tipo"),
+    min_price: float | None = Query(default=None, ge=0.0, description="Precio mínimo"),
+    max_price: float | None = Query(default=None, ge=0.0, description="Precio máximo"),
+    sort: str | None = Query(default=None, pattern="^-?(id|name|price|type|restaurant_id)$", description="Columna de orden; con '-' delante el orden es descendente"),
+    expand: str | None = Query(default=None, description="Relaciones a incluir en la respuesta, por ejemplo restaurant,ingredients.provider"),
+    ids: str | None = Query(default=None, pattern=r"^\d+(,\d+)*$", description="Lista de IDs separados por comas; devuelve los elementos en ese orden e indica los que no existen"),
+    fields: str | None = Query(default=None, description="Campos a devolver separados por comas, por ejemplo id,name")
+):
+    # Relaciones pedidas y tablas de las que dependen
+    tree, tables = expansion("dishes", expand)
+    # Campos pedidos (None para todos)
+    columns = parse_fields(Dish, fields)
+    # Responder 304 si el cliente ya tiene la versión actual (sin consultar ni serializar)
+    unchanged = not_modified(request, response, "dishes", *tables)
+    if unchanged:
+        return unchanged
+    # Obtener solo los IDs pedidos si se envió una lista (una sola consulta para todos)
+    if ids:
+        result = await get_dishes_by_ids(parse_ids(ids))
+        # Agregar las relaciones pedidas (una consulta por nivel) y recortar a los campos pedidos
+        return pick_fields(await expand_result("dishes", result, tree), columns, *tree)
+    # Determinar si el cliente pidió una respuesta transmitida (parámetro stream o cabecera Accept);
+    # un listado con relaciones expandidas se devuelve como documento completo
+    stream_format = None if tree else resolve_stream_format(request, stream)
     # Llamar a la función del controlador para obtener todos los dishes
-    result = await get_all_dishes()
-    # Devolver la lista de dishes obtenida
-    return result
+    result = await get_all_dishes(stream_format, limit, cursor, restaurant_id, dish_type, min_price, max_price, sort, select_fields(columns, *expansion_columns("dishes", tree)))
+    # Agregar las relaciones pedidas (una consulta por nivel)
+    result = await expand_result("dishes", result, tree)
+    # Devolver la lista de dishes obtenida con los campos pedidos
+    return with_etag(pick_fields(result, columns, *tree), response)
 
 # Definir ruta para actualizar un dish existente
 @router.put("/{id}", tags=["Dishes"], status_code=status.HTTP_200_OK)
@@ -82,23 +149,57 @@ async def add_ingredient_to_dish_route(id: int, ingredient_data: DishIngredient)
     # Devolver el resultado de la adición del ingrediente al plato
     return result 
 
+# Definir ruta para agregar varios ingredientes a un plato
+@router.post("/{id}/ingredients/bulk", tags=["Dishes"], status_code=status.HTTP_201_CREATED)
+# Definir función para agregar varios ingredientes a un plato
+async def add_ingredients_to_dish_route(id: int, ingredients_data: DishIngredientsBulk):
+    # Llamar a la función del controlador para agregar los ingredientes al plato
+    result = await add_ingredients_to_dish(id, ingredients_data.ingredient_ids)
+    # Devolver los ingredientes agregados y los IDs ya vinculados o inválidos
+    return result
+
 # Definir ruta para obtener un ingrediente específico de un plato
 @router.get("/{id}/ingredients/{ingredient_id}", tags=["Dishes"], status_code=status.HTTP_200_OK)
 # Definir función para obtener un ingrediente específico de un plato
-async def get_one_ingredient_route(id: int, ingredient_id: int):
+async def get_one_ingredient_route(
+    id: int,
+    ingredient_id: int,
+    request: Request,
+    response: Response,
+    fields: str | None = Query(default=None, description="Campos a devolver separados por comas, por ejemplo ingredient_name,active")
+):
+    # Campos pedidos (None para todos)
+    columns = parse_fields(DishIngredient, fields)
+    # Responder 304 si el cliente ya tiene la versión actual de las tablas del join
+    unchanged = not_modified(request, response, *DISH_INGREDIENT_TABLES)
+    if unchanged:
+        return unchanged
     # Llamar a la función del controlador para obtener el ingrediente del plato
     result = await get_one_ingredient(id, ingredient_id)
-    # Devolver el ingrediente obtenido
-    return result
+    # Devolver el ingrediente obtenido con los campos pedidos
+    return pick_fields(result, columns)
 
 # Definir ruta para obtener todos los ingredientes de un plato
 @router.get("/{id}/ingredients/", tags=["Dishes"], status_code=status.HTTP_200_OK)
 # Definir función para obtener todos los ingredientes de un plato
-async def get_all_ingredients_route(id: int):
+async def get_all_ingredients_route(
+    id: int,
+    request: Request,
+    response: Response,
+    limit: int | None = Query(default=None, ge=1, le=max_page_size, description="Número máximo de elementos por página"),
+    cursor: str | None = Query(default=None, description="Cursor opaco devuelto como next_cursor por la página anterior"),
+    fields: str | None = Query(default=None, description="Campos a devolver separados por comas, por ejemplo ingredient_name,active")
+):
+    # Campos pedidos (None para todos)
+    columns = parse_fields(DishIngredient, fields)
+    # Responder 304 si el cliente ya tiene la versión actual de las tablas del join
+    unchanged = not_modified(request, response, *DISH_INGREDIENT_TABLES)
+    if unchanged:
+        return unchanged
     # Llamar a la función del controlador para obtener todos los ingredientes del plato
-    result = await get_all_ingredients(id)
-    # Devolver la lista de ingredientes obtenida
-    return result
+    result = await get_all_ingredients(id, limit, cursor)
+    # Devolver la lista de ingredientes obtenida con los campos pedidos
+    return pick_fields(result, columns)
 
 # Definir ruta para actualizar un ingrediente de un plato
 @router.put("/{id}/ingredients/{ingredient_id}", tags=["Dishes"], status_code=status.HTTP_200_OK)
@@ -3,13 +3,24 @@
 # Importar FastAPI APIRouter y status
 # Librerías para manejo de modelos y controladores
 # Importar modelos y controladores
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Query, Request, Response, status
 from models.ingredients import Ingredient
+from utlis.streaming import resolve_stream_format
+from utlis.pagination import max_page_size
+from utlis.batch import parse_ids
+from utlis.etag import not_modified, with_etag
+from utlis.fields import parse_fields, pick_fields
+from controllers.expansions import expansion, expand_result
 from controllers.ingredients import(
     create_ingredient,
+    create_ingredients_bulk,
     update_ingredient,
     get_one_ingredient,
     get_all_ingredients,
+    get_ingredients_by_ids,
+    get_ingredient_dishes,
+    get_ingredients_stats,
+    INGREDIENTS_STATS_TABLES,
     delete_ingredient
 )
 
@@ -27,23 +38,99 @@ async def create_new_ingredient(ingredient_data: Ingredient):
     # Devolver el resultado de la creación del ingredient
     return result
 
+# Definir ruta para crear varios ingredients en una sola transacción
+@router.post("/bulk", tags=["Ingredients"], status_code=status.HTTP_201_CREATED)
+# Definir función para crear varios ingredients en una sola transacción
+async def create_ingredients_bulk_route(ingredient_data: list[Ingredient]):
+    # Llamar a la función del controlador para crear los ingredients
+    result = await create_ingredients_bulk(ingredient_data)
+    # Devolver los IDs creados en el orden recibido
+    return result
+
+# Definir ruta para obtener las estadísticas de los ingredients (declarada antes de /{id} para que no se confunda con un ID)
+@router.get("/stats", tags=["Ingredients"], status_code=status.HTTP_200_OK)
+# Definir función para obtener el número de ingredients y de platos activos por categoría
+async def get_ingredients_stats_route(request: Request, response: Response):
+    # Responder 304 si el cliente ya tiene la versión actual de las tablas agregadas
+    unchanged = not_modified(request, response, *INGREDIENTS_STATS_TABLES)
+    if unchanged:
+        return unchanged
+    # Llamar a la función del controlador para obtener las estadísticas
+    result = await get_ingredients_stats()
+    # Devolver las estadísticas
+    return result
+
 # Definir ruta para obtener un ingredient por ID
 @router.get("/{id}", tags=["Ingredients"], status_code=status.HTTP_200_OK)
 # Definir función para obtener un ingredient por ID
-async def get_one_ingredient_route(id: int):
+async def get_one_ingredient_route(
+    id: int,
+    request: Request,
+    response: Response,
+    fields: str | None = Query(default=None, description="Campos a devolver separados por comas, por ejemplo id,name")
+):
+    # Campos pedidos (None para todos)
+    columns = parse_fields(Ingredient, fields)
+    # Responder 304 si el cliente ya tiene la versión actual (sin consultar la base de datos)
+    unchanged = not_modified(request, response, "ingredients")
+    if unchanged:
+        return unchanged
     # Llamar a la función del controlador para obtener el ingredient
     result: Ingredient = await get_one_ingredient(id)
-    # Devolver el ingredient obtenido
-    return result
+    # Devolver el ingredient obtenido con los campos pedidos
+    return pick_fields(result, columns)
+
+# Definir ruta para obtener los dishes que usan un ingredient
+@router.get("/{id}/dishes", tags=["Ingredients"], status_code=status.HTTP_200_OK)
+# Definir función para obtener los dishes que usan un ingredient
+async def get_ingredient_dishes_route(
+    id: int,
+    request: Request,
+    response: Response,
+    expand: str | None = Query(default=None, description="Relaciones de los platos a incluir, por ejemplo restaurant")
+):
+    # Relaciones pedidas y tablas de las que dependen
+    tree, tables = expansion("dishes", expand)
+    # Responder 304 si el cliente ya tiene la versión actual de las tablas de la relación
+    unchanged = not_modified(request, response, "ingredients", "dishes_ingredients", "dishes", *tables)
+    if unchanged:
+        return unchanged
+    # Llamar a la función del controlador para obtener los dishes (desde el índice inverso)
+    result = await get_ingredient_dishes(id)
+    # Devolver los dishes con las relaciones pedidas
+    return await expand_result("dishes", result, tree)
 
 # Definir ruta para obtener todos los ingredients
 @router.get("/", tags=["Ingredients"], status_code=status.HTTP_200_OK)
 # Definir función para obtener todos los ingredients
-async def get_all_ingredients_route():
+async def get_all_ingredients_route(
+    request: Request,
+    response: Response,
+    stream: str | None = Query(default=None, pattern="^(ndjson|json)$", description="Transmitir el listado por bloques en formato ndjson o json"),
+    limit: int | None = Query(default=None, ge=1, le=max_page_size, description="Número máximo de elementos por página"),
+    cursor: str | None = Query(default=None, description="Cursor opaco devuelto como next_cursor por la página anterior"),
+    provider_id: int | None = Query(default=None, description="Solo los ingredientes de este proveedor"),
+    category: str | None = Query(default=None, pattern="^(vegetal|lácteo|carne|grano|fruta|otro)$", description="Solo los ingredientes de esta categoría"),
+    ids: str | None = Query(default=None, pattern=r"^\d+(,\d+)*$", description="Lista de IDs separados por comas; devuelve los elementos en ese orden e indica los que no existen"),
+    fields: str | None = Query(default=None, description="Campos a devolver separados por comas, por ejemplo id,name")
+):
+    # Campos pedidos (None para todos)
+    columns = parse_fields(Ingredient, fields)
+    # Responder 304 si el cliente ya tiene la versión actual (sin consultar ni serializar)
+    unchanged = not_modified(request, response, "ingredients")
+    if unchanged:
+        return unchanged
+    # Obtener solo los IDs pedidos si se envió una lista (una sola consulta para todos)
+    if ids:
+        result = await get_ingredients_by_ids(parse_ids(ids))
+        # Devolver los elementos en el orden pedido, recortados a los campos pedidos
+        return pick_fields(result, columns)
+    # Determinar si el cliente pidió una respuesta transmitida (parámetro stream o cabecera Accept)
+    stream_format = resolve_stream_format(request, stream)
     # Llamar a la función del controlador para obtener todos los ingredients
-    result = await get_all_ingredients()
-    # Devolver la lista de ingredients obtenida
-    return result
+    result = await get_all_ingredients(stream_format, limit, cursor, provider_id, category, columns)
+    # Devolver la lista de ingredients obtenida con los campos pedidos
+    return with_etag(pick_fields(result, columns), response)
 
 # Definir ruta para actualizar un ingredient existente
 @router.put("/{id}", tags=["Ingredients"], status_code=status.HTTP_200_OK)
@@ -0,0 +1,33 @@
+# Rutas relacionadas con las métricas internas de la API
+# Importar las librerías necesarias
+# Importar FastAPI APIRouter y status
+# Librerías para obtener las estadísticas de los componentes
+from fastapi import APIRouter, status
+from utlis.database import get_pool_stats, get_executor_stats, get_stream_executor_stats, get_coalescing_stats
+from utlis.repository import get_repository_stats
+from utlis.log import get_logging_stats
+from utlis.cache import get_cache_stats
+from utlis.versions import get_table_versions
+from utlis.search import get_search_stats
+
+# Crear enrutador de FastAPI para métricas
+router = APIRouter(prefix="/metrics")
+
+# --------------------------- METRICS ROUTES --------------------------- #
+
+# Definir ruta para obtener las métricas de la API
+@router.get("/", tags=["Metrics"], status_code=status.HTTP_200_OK)
+# Definir función para obtener las métricas de la API
+async def get_metrics_route():
+    # Devolver las estadísticas de cada componente
+    return {
+        "pool": get_pool_stats(),
+        "executor": get_executor_stats(),
+        "stream_executor": get_stream_executor_stats(),
+        "coalescing": get_coalescing_stats(),
+        "repositories": get_repository_stats(),
+        "logging": get_logging_stats(),
+        "caches": get_cache_stats(),
+        "search": get_search_stats(),
+        "versions": get_table_versions()
+    }
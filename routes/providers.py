@@ -3,13 +3,24 @@
 # Importar FastAPI APIRouter y status
 # Librerías para manejo de modelos y controladores
 # Importar modelos y controladores
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Query, Request, Response, status
 from models.providers import Provider
+from utlis.streaming import resolve_stream_format
+from utlis.pagination import max_page_size
+from utlis.batch import parse_ids
+from utlis.etag import not_modified, with_etag
+from utlis.fields import parse_fields, pick_fields
+from controllers.expansions import expansion, expand_result
 from controllers.providers import(
     create_provider,
+    create_providers_bulk,
     update_provider,
     get_one_provider,
     get_all_providers,
+    get_providers_by_ids,
+    get_provider_dishes,
+    get_providers_stats,
+    PROVIDERS_STATS_TABLES,
     delete_provider
 )
 
@@ -27,23 +38,97 @@ async def create_new_provider(provider_data: Provider):
     # Devolver el resultado de la creación del provider
     return result
 
+# Definir ruta para crear varios providers en una sola transacción
+@router.post("/bulk", tags=["Providers"], status_code=status.HTTP_201_CREATED)
+# Definir función para crear varios providers en una sola transacción
+async def create_providers_bulk_route(provider_data: list[Provider]):
+    # Llamar a la función del controlador para crear los providers
+    result = await create_providers_bulk(provider_data)
+    # Devolver los IDs creados en el orden recibido
+    return result
+
+# Definir ruta para obtener las estadísticas de los providers (declarada antes de /{id} para que no se confunda con un ID)
+@router.get("/stats", tags=["Providers"], status_code=status.HTTP_200_OK)
+# Definir función para obtener el número de ingredientes y de platos activos de cada provider
+async def get_providers_stats_route(request: Request, response: Response):
+    # Responder 304 si el cliente ya tiene la versión actual de las tablas agregadas
+    unchanged = not_modified(request, response, *PROVIDERS_STATS_TABLES)
+    if unchanged:
+        return unchanged
+    # Llamar a la función del controlador para obtener las estadísticas
+    result = await get_providers_stats()
+    # Devolver las estadísticas
+    return result
+
 # Definir ruta para obtener un provider por ID
 @router.get("/{id}", tags=["Providers"], status_code=status.HTTP_200_OK)
 # Definir función para obtener un provider por ID
-async def get_one_provider_route(id: int):
+async def get_one_provider_route(
+    id: int,
+    request: Request,
+    response: Response,
+    fields: str | None = Query(default=None, description="Campos a devolver separados por comas, por ejemplo id,name")
+):
+    # Campos pedidos (None para todos)
+    columns = parse_fields(Provider, fields)
+    # Responder 304 si el cliente ya tiene la versión actual (sin consultar la base de datos)
+    unchanged = not_modified(request, response, "providers")
+    if unchanged:
+        return unchanged
     # Llamar a la función del controlador para obtener el provider
     result: Provider = await get_one_provider(id)
-    # Devolver el provider obtenido
-    return result
+    # Devolver el provider obtenido con los campos pedidos
+    return pick_fields(result, columns)
+
+# Definir ruta para obtener los dishes que usan los ingredients de un provider
+@router.get("/{id}/dishes", tags=["Providers"], status_code=status.HTTP_200_OK)
+# Definir función para obtener los dishes que usan los ingredients de un provider
+async def get_provider_dishes_route(
+    id: int,
+    request: Request,
+    response: Response,
+    expand: str | None = Query(default=None, description="Relaciones de los platos a incluir, por ejemplo restaurant")
+):
+    # Relaciones pedidas y tablas de las que dependen
+    tree, tables = expansion("dishes", expand)
+    # Responder 304 si el cliente ya tiene la versión actual de las tablas de la relación
+    unchanged = not_modified(request, response, "providers", "ingredients", "dishes_ingredients", "dishes", *tables)
+    if unchanged:
+        return unchanged
+    # Llamar a la función del controlador para obtener los dishes (desde el índice inverso)
+    result = await get_provider_dishes(id)
+    # Devolver los dishes con las relaciones pedidas
+    return await expand_result("dishes", result, tree)
 
 # Definir ruta para obtener todos los providers
 @router.get("/", tags=["Providers"], status_code=status.HTTP_200_OK)
 # Definir función para obtener todos los providers
-async def get_all_providers_route():
+async def get_all_providers_route(
+    request: Request,
+    response: Response,
+    stream: str | None = Query(default=None, pattern="^(ndjson|json)$", description="Transmitir el listado por bloques en formato ndjson o json"),
+    limit: int | None = Query(default=None, ge=1, le=max_page_size, description="Número máximo de elementos por página"),
+    cursor: str | None = Query(default=None, description="Cursor opaco devuelto como next_cursor por la página anterior"),
+    ids: str | None = Query(default=None, pattern=r"^\d+(,\d+)*$", description="Lista de IDs separados por comas; devuelve los elementos en ese orden e indica los que no existen"),
+    fields: str | None = Query(default=None, description="Campos a devolver separados por comas, por ejemplo id,name")
+):
+    # Campos pedidos (None para todos)
+    columns = parse_fields(Provider, fields)
+    # Responder 304 si el cliente ya tiene la versión actual (sin consultar ni serializar)
+    unchanged = not_modified(request, response, "providers")
+    if unchanged:
+        return unchanged
+    # Obtener solo los IDs pedidos si se envió una lista (una sola consulta para todos)
+    if ids:
+        result = await get_providers_by_ids(parse_ids(ids))
+        # Devolver los elementos en el orden pedido, recortados a los campos pedidos
+        return pick_fields(result, columns)
+    # Determinar si el cliente pidió una respuesta transmitida (parámetro stream o cabecera Accept)
+    stream_format = resolve_stream_format(request, stream)
     # Llamar a la función del controlador para obtener todos los providers
-    result = await get_all_providers()
-    # Devolver la lista de providers obtenida
-    return result
+    result = await get_all_providers(stream_format, limit, cursor, columns)
+    # Devolver la lista de providers obtenida con los campos pedidos
+    return with_etag(pick_fields(result, columns), response)
 
 # Definir ruta para actualizar un provider existente
 @router.put("/{id}", tags=["Providers"], status_code=status.HTTP_200_OK)
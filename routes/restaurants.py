@@ -3,13 +3,23 @@
 # Importar FastAPI APIRouter y status
 # Librerías para manejo de modelos y controladores
 # Importar modelos y controladores
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Query, Request, Response, status
 from models.restaurants import Restaurant
+from utlis.streaming import resolve_stream_format
+from utlis.pagination import max_page_size
+from utlis.batch import parse_ids
+from utlis.etag import not_modified, with_etag
+from utlis.fields import parse_fields, select_fields, pick_fields
+from controllers.expansions import expansion, expansion_columns, expand_result
 from controllers.restaurants import(
     create_restaurant,
+    create_restaurants_bulk,
     update_restaurant,
     get_one_restaurant,
     get_all_restaurants,
+    get_restaurants_by_ids,
+    get_restaurant_stats,
+    RESTAURANT_STATS_TABLES,
     delete_restaurant
 )
 
@@ -27,23 +37,88 @@ async def create_new_restaurant(restaurant_data: Restaurant):
     # Devolver el resultado de la creación del restaurante
     return result
 
+# Definir ruta para crear varios restaurantes en una sola transacción
+@router.post("/bulk", tags=["Restaurants"], status_code=status.HTTP_201_CREATED)
+# Definir función para crear varios restaurantes en una sola transacción
+async def create_restaurants_bulk_route(restaurant_data: list[Restaurant]):
+    # Llamar a la función del controlador para crear los restaurantes
+    result = await create_restaurants_bulk(restaurant_data)
+    # Devolver los IDs creados en el orden recibido
+    return result
+
+# Definir ruta para obtener las estadísticas de los platos de un restaurante
+@router.get("/{id}/stats", tags=["Restaurants"], status_code=status.HTTP_200_OK)
+# Definir función para obtener el número de platos, sus precios y sus ingredientes activos por tipo
+async def get_restaurant_stats_route(id: int, request: Request, response: Response):
+    # Responder 304 si el cliente ya tiene la versión actual de las tablas agregadas
+    unchanged = not_modified(request, response, *RESTAURANT_STATS_TABLES)
+    if unchanged:
+        return unchanged
+    # Llamar a la función del controlador para obtener las estadísticas del restaurante
+    result = await get_restaurant_stats(id)
+    # Devolver las estadísticas
+    return result
+
 # Definir ruta para obtener un restaurante por ID
 @router.get("/{id}", tags=["Restaurants"], status_code=status.HTTP_200_OK)
 # Definir función para obtener un restaurante por ID
-async def get_one_restaurant_route(id: int):
+async def get_one_restaurant_route(
+    id: int,
+    request: Request,
+    response: Response,
+    expand: str | None = Query(default=None, description="Relaciones a incluir en la respuesta, por ejemplo dishes.ingredients.provider"),
+    fields: str | None = Query(default=None, description="Campos a devolver separados por comas, por ejemplo id,name")
+):
+    # Relaciones pedidas y tablas de las que dependen
+    tree, tables = expansion("restaurants", expand)
+    # Campos pedidos (None para todos)
+    columns = parse_fields(Restaurant, fields)
+    # Responder 304 si el cliente ya tiene la versión actual (sin consultar la base de datos)
+    unchanged = not_modified(request, response, "restaurants", *tables)
+    if unchanged:
+        return unchanged
     # Llamar a la función del controlador para obtener el restaurante
     result: Restaurant = await get_one_restaurant(id)
-    # Devolver el restaurante obtenido
-    return result
+    # Agregar las relaciones pedidas (una consulta por nivel)
+    result = await expand_result("restaurants", result, tree)
+    # Devolver el restaurante obtenido con los campos pedidos
+    return pick_fields(result, columns, *tree)
 
 # Definir ruta para obtener todos los restaurantes
 @router.get("/", tags=["Restaurants"], status_code=status.HTTP_200_OK)
 # Definir función para obtener todos los restaurantes
-async def get_all_restaurants_route():
+async def get_all_restaurants_route(
+    request: Request,
+    response: Response,
+    stream: str | None = Query(default=None, pattern="^(ndjson|json)$", description="Transmitir el listado por bloques en formato ndjson o json"),
+    limit: int | None = Query(default=None, ge=1, le=max_page_size, description="Número máximo de elementos por página"),
+    cursor: str | None = Query(default=None, description="Cursor opaco devuelto como next_cursor por la página anterior"),
+    expand: str | None = Query(default=None, description="Relaciones a incluir en la respuesta, por ejemplo dishes.ingredients.provider"),
+    ids: str | None = Query(default=None, pattern=r"^\d+(,\d+)*$", description="Lista de IDs separados por comas; devuelve los elementos en ese orden e indica los que no existen"),
+    fields: str | None = Query(default=None, description="Campos a devolver separados por comas, por ejemplo id,name")
+):
+    # Relaciones pedidas y tablas de las que dependen
+    tree, tables = expansion("restaurants", expand)
+    # Campos pedidos (None para todos)
+    columns = parse_fields(Restaurant, fields)
+    # Responder 304 si el cliente ya tiene la versión actual (sin consultar ni serializar)
+    unchanged = not_modified(request, response, "restaurants", *tables)
+    if unchanged:
+        return unchanged
+    # Obtener solo los IDs pedidos si se envió una lista (una sola consulta para todos)
+    if ids:
+        result = await get_restaurants_by_ids(parse_ids(ids))
+        # Agregar las relaciones pedidas (una consulta por nivel) y recortar a los campos pedidos
+        return pick_fields(await expand_result("restaurants", result, tree), columns, *tree)
+    # Determinar si el cliente pidió una respuesta transmitida (parámetro stream o cabecera Accept);
+    # un listado con relaciones expandidas se devuelve como documento completo
+    stream_format = None if tree else resolve_stream_format(request, stream)
     # Llamar a la función del controlador para obtener todos los restaurantes
-    result = await get_all_restaurants()
-    # Devolver la lista de restaurantes obtenida 
-    return result
+    result = await get_all_restaurants(stream_format, limit, cursor, select_fields(columns, *expansion_columns("restaurants", tree)))
+    # Agregar las relaciones pedidas (una consulta por nivel)
+    result = await expand_result("restaurants", result, tree)
+    # Devolver la lista de restaurantes obtenida con los campos pedidos
+    return with_etag(pick_fields(result, columns, *tree), response)
 
 # Definir ruta para actualizar un restaurante existente
 @router.put("/{id}", tags=["Restaurants"], status_code=status.HTTP_200_OK)
@@ -0,0 +1,34 @@
+# Rutas relacionadas con la búsqueda
+# Importar las librerías necesarias
+# Importar FastAPI APIRouter y status
+# Librerías para los índices de autocompletado de los controladores
+from fastapi import APIRouter, Query, status
+from utlis.search import search_max_results
+from controllers.ingredients import search_index as ingredients_index
+from controllers.dishes import search_index as dishes_index
+from controllers.providers import search_index as providers_index
+
+# Crear enrutador de FastAPI para la búsqueda
+router = APIRouter(prefix="/search")
+
+# Índice de autocompletado de cada entidad
+SEARCH_INDEXES = {
+    "ingredient": ingredients_index,
+    "dish": dishes_index,
+    "provider": providers_index
+}
+
+# --------------------------- SEARCH ROUTES --------------------------- #
+
+# Definir ruta para autocompletar nombres
+@router.get("/autocomplete", tags=["Search"], status_code=status.HTTP_200_OK)
+# Definir función para autocompletar nombres de ingredientes, platos o proveedores
+async def autocomplete_route(
+    entity: str = Query(pattern="^(ingredient|dish|provider)$", description="Entidad a buscar: ingredient, dish o provider"),
+    q: str = Query(min_length=1, max_length=100, description="Prefijo a buscar (sin distinguir acentos ni mayúsculas)"),
+    limit: int = Query(default=10, ge=1, le=search_max_results, description="Número máximo de sugerencias")
+):
+    # Buscar el prefijo en el índice en memoria de la entidad
+    result = await SEARCH_INDEXES[entity].search(q, limit)
+    # Devolver las sugerencias (ID y nombre)
+    return result
\ No newline at end of file
@@ -0,0 +1,28 @@
+-- Índices recomendados para los filtros y órdenes de los listados (SQL Server).
+-- Cada índice empieza por la columna filtrada u ordenada y termina con el ID, que es el desempate del orden y
+-- de la paginación por clave; INCLUDE agrega el resto de columnas para que el listado no tenga que volver a la tabla.
+-- El script se puede ejecutar varias veces: solo crea los índices que no existen.
+
+-- GET /dishes/?restaurant_id=...
+if not exists (select 1 from sys.indexes where name = 'ix_dishes_restaurant_id' and object_id = object_id('[kitchens].[dishes]'))
+    create index ix_dishes_restaurant_id on [kitchens].[dishes] ([restaurant_id], [id]) include ([name], [price], [type]);
+
+-- GET /dishes/?type=...
+if not exists (select 1 from sys.indexes where name = 'ix_dishes_type' and object_id = object_id('[kitchens].[dishes]'))
+    create index ix_dishes_type on [kitchens].[dishes] ([type], [id]) include ([restaurant_id], [name], [price]);
+
+-- GET /dishes/?min_price=...&max_price=... y GET /dishes/?sort=price (o -price)
+if not exists (select 1 from sys.indexes where name = 'ix_dishes_price' and object_id = object_id('[kitchens].[dishes]'))
+    create index ix_dishes_price on [kitchens].[dishes] ([price], [id]) include ([restaurant_id], [name], [type]);
+
+-- GET /dishes/?sort=name (o -name)
+if not exists (select 1 from sys.indexes where name = 'ix_dishes_name' and object_id = object_id('[kitchens].[dishes]'))
+    create index ix_dishes_name on [kitchens].[dishes] ([name], [id]) include ([restaurant_id], [price], [type]);
+
+-- GET /ingredients/?provider_id=...
+if not exists (select 1 from sys.indexes where name = 'ix_ingredients_provider_id' and object_id = object_id('[kitchens].[ingredients]'))
+    create index ix_ingredients_provider_id on [kitchens].[ingredients] ([provider_id], [id]) include ([name], [category]);
+
+-- GET /ingredients/?category=...
+if not exists (select 1 from sys.indexes where name = 'ix_ingredients_category' and object_id = object_id('[kitchens].[ingredients]'))
+    create index ix_ingredients_category on [kitchens].[ingredients] ([category], [id]) include ([provider_id], [name]);
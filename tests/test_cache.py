@@ -0,0 +1,83 @@
+# Pruebas de la caché en memoria: LRU, tiempo de vida, entradas negativas y etiquetas.
+# Importar librerías necesarias
+import pytest
+from utlis import cache as cache_module
+from utlis.cache import MemoryCache, NOT_FOUND
+
+# Reloj controlado por la prueba
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+# Al superar el tamaño máximo se desaloja el elemento usado hace más tiempo
+def test_lru_eviction():
+    cache = MemoryCache("t", max_size=2, ttl=60)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    assert cache.get(1) == "a"
+    cache.set(3, "c")
+    assert cache.get(2) is None
+    assert cache.get(1) == "a" and cache.get(3) == "c"
+    assert cache.stats()["evictions"] == 1
+
+# Los elementos vencen con el TTL de la caché o con el indicado al guardarlos
+def test_ttl(clock):
+    cache = MemoryCache("t", max_size=10, ttl=60)
+    cache.set(1, "a")
+    cache.set(2, "b", ttl=5)
+    clock[0] += 10
+    assert cache.get(2) is None
+    assert cache.get(1) == "a"
+    clock[0] += 60
+    assert cache.get(1) is None
+    assert cache.stats()["expirations"] == 2
+
+# La marca de clave inexistente vence con el TTL negativo
+def test_set_missing(clock):
+    cache = MemoryCache("t", max_size=10, ttl=60, negative_ttl=5)
+    cache.set_missing(1)
+    assert cache.get(1) is NOT_FOUND
+    clock[0] += 6
+    assert cache.get(1) is None
+    MemoryCache("off", max_size=10, ttl=60, negative_ttl=0).set_missing(1)
+
+# Invalidar una etiqueta quita todos sus elementos y solo esos
+def test_invalidate_tag():
+    cache = MemoryCache("t", max_size=10, ttl=60)
+    cache.set(1, "a", tags=("provider:1", "restaurant:1"))
+    cache.set(2, "b", tags=("provider:2", "restaurant:1"))
+    cache.set(3, "c", tags=("provider:2",))
+    cache.invalidate_tag("restaurant:1")
+    assert cache.get(1) is None and cache.get(2) is None
+    assert cache.get(3) == "c"
+    assert cache.stats()["tags"] == 1
+
+# Reemplazar un elemento quita las etiquetas anteriores
+def test_set_replaces_tags():
+    cache = MemoryCache("t", max_size=10, ttl=60)
+    cache.set(1, "a", tags=("old",))
+    cache.set(1, "b", tags=("new",))
+    cache.invalidate_tag("old")
+    assert cache.get(1) == "b"
+    cache.invalidate_tag("new")
+    assert cache.get(1) is None
+
+# Una caché de tamaño 0 está desactivada
+def test_disabled_cache():
+    cache = MemoryCache("t", max_size=0, ttl=60)
+    cache.set(1, "a")
+    assert cache.get(1) is None
+
+# Borrar y vaciar cuentan como invalidaciones
+def test_delete_and_clear():
+    cache = MemoryCache("t", max_size=10, ttl=60)
+    cache.set(1, "a")
+    cache.set(2, "b", tags=("x",))
+    cache.delete(1)
+    cache.delete(1)
+    cache.clear()
+    stats = cache.stats()
+    assert stats["size"] == 0 and stats["tags"] == 0
+    assert stats["invalidations"] == 2
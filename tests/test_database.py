@@ -0,0 +1,77 @@
+# Pruebas de la capa de datos con conexiones de prueba en lugar del driver.
+# Importar librerías necesarias
+import asyncio
+import pytest
+
+# El módulo importa el driver ODBC, que necesita sus librerías del sistema instaladas
+database = pytest.importorskip("utlis.database", exc_type=ImportError)
+from utlis.pool import ConnectionPool
+from utlis.executor import DBExecutor
+from utlis import versions
+
+# Cursor de prueba que devuelve dos filas
+class FakeCursor:
+    description = [("id", int)]
+    def execute(self, sql, params=None):
+        self.rows = [(1,), (2,)]
+    def nextset(self):
+        return False
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+    def close(self):
+        pass
+
+# Conexión de prueba
+class FakeConnection:
+    def cursor(self):
+        return FakeCursor()
+    def commit(self):
+        pass
+    def rollback(self):
+        pass
+    def close(self):
+        pass
+
+# Pool de conexiones y pools de hilos del mismo tamaño
+@pytest.fixture
+def db(monkeypatch):
+    size = 2
+    pool = ConnectionPool("", min_size=0, max_size=size, acquire_timeout=2)
+    monkeypatch.setattr(pool, "_connect", FakeConnection)
+    monkeypatch.setattr(database, "_pool", pool)
+    monkeypatch.setattr(database, "_executor", DBExecutor(size))
+    monkeypatch.setattr(database, "stream_max_concurrent", size)
+    monkeypatch.setattr(database, "_stream_executor", None)
+    monkeypatch.setattr(database, "_stream_slots", None)
+    monkeypatch.setattr(database, "coalesce_reads", False)
+    yield size
+    database.close_executor()
+
+# Transmisiones que ocupan todas las conexiones y consultas que ocupan todos los hilos esperándolas terminan todas
+def test_streams_progress_while_queries_wait_for_connections(db):
+    async def main():
+        streams = [database.stream_query_rows("select id from t", chunk_size=1) for _ in range(db)]
+        # Cada transmisión lee su primer bloque y conserva su conexión
+        first = [await anext(stream) for stream in streams]
+        # Las consultas ocupan todos los hilos generales esperando una conexión
+        queries = [asyncio.ensure_future(database.execute_query_rows("select id from t", [i])) for i in range(db)]
+        await asyncio.sleep(0.1)
+        # Las transmisiones siguen leyendo en sus propios hilos y devuelven sus conexiones al terminar
+        rest = [[rows async for rows in stream] for stream in streams]
+        return first, rest, await asyncio.gather(*queries)
+    first, rest, results = asyncio.run(asyncio.wait_for(main(), 5))
+    assert first == [[{"id": 1}]] * db and rest == [[[{"id": 2}]]] * db
+    assert results == [[{"id": 1}, {"id": 2}]] * db
+    assert database.get_pool_stats()["in_use"] == 0
+
+# Una escritura incrementa la versión de la tabla de la sentencia y de las tablas indicadas (borrado en cascada)
+def test_write_bumps_the_given_tables(db, monkeypatch):
+    monkeypatch.setattr(versions, "_versions", {})
+    monkeypatch.setattr(versions, "_local", {})
+    sql = "delete from [kitchens].[restaurants] where [id] = ?"
+    asyncio.run(database.execute_query_rows(sql, [1], needs_commit=True, tables=("dishes", "restaurants")))
+    assert versions.table_versions("restaurants", "dishes", "providers") == (1, 1, 0)
@@ -0,0 +1,58 @@
+# Pruebas de las peticiones condicionales con ETag.
+# Importar librerías necesarias
+import importlib
+import pytest
+from fastapi import Response
+from starlette.requests import Request
+from utlis import etag, versions
+
+# Crear una petición de prueba con las cabeceras indicadas
+def make_request(headers: dict | None = None) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/dishes/",
+        "query_string": b"limit=5",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    })
+
+# Recargar el módulo con el valor de ETAG_ENABLED indicado (y restaurarlo al terminar)
+@pytest.fixture
+def reload_etag(monkeypatch):
+    def reload(value: str | None):
+        if value is None:
+            monkeypatch.delenv("ETAG_ENABLED", raising=False)
+        else:
+            monkeypatch.setenv("ETAG_ENABLED", value)
+        return importlib.reload(etag).conditional_requests
+    yield reload
+    monkeypatch.delenv("ETAG_ENABLED", raising=False)
+    importlib.reload(etag)
+
+# Sin definir se sigue a las versiones compartidas; true y false lo fuerzan
+def test_etag_enabled_setting(reload_etag):
+    assert reload_etag(None) is versions.shared_versions
+    assert reload_etag("true") is True
+    assert reload_etag("false") is False
+
+# Con ETag activo, el mismo ETag responde 304 hasta que se escribe en la tabla
+def test_not_modified_until_the_table_changes(monkeypatch):
+    monkeypatch.setattr(etag, "conditional_requests", True)
+    monkeypatch.setattr(versions, "_versions", {})
+    monkeypatch.setattr(versions, "_local", {})
+    response = Response()
+    assert etag.not_modified(make_request(), response, "dishes") is None
+    tag = response.headers["ETag"]
+    assert etag.not_modified(make_request({"If-None-Match": tag}), Response(), "dishes").status_code == 304
+    assert etag.not_modified(make_request({"If-None-Match": "W/" + tag}), Response(), "dishes").status_code == 304
+    versions.bump("dishes")
+    response = Response()
+    assert etag.not_modified(make_request({"If-None-Match": tag}), response, "dishes") is None
+    assert response.headers["ETag"] != tag
+
+# Con ETag desactivado no se envía la cabecera ni se responde 304
+def test_disabled_sends_no_etag(monkeypatch):
+    monkeypatch.setattr(etag, "conditional_requests", False)
+    response = Response()
+    assert etag.not_modified(make_request({"If-None-Match": "*"}), response, "dishes") is None
+    assert "ETag" not in response.headers
@@ -0,0 +1,39 @@
+# Pruebas del pool de hilos de base de datos: contadores de la cola y de ejecución.
+# Importar librerías necesarias
+import asyncio
+import time
+import pytest
+from utlis.executor import DBExecutor
+
+# Las tareas terminadas dejan la cola y los hilos activos en cero
+def test_counts_completed_tasks():
+    executor = DBExecutor(2)
+    async def main():
+        return await asyncio.gather(*(executor.run(pow, 2, i) for i in range(4)))
+    assert asyncio.run(main()) == [1, 2, 4, 8]
+    stats = executor.stats()
+    assert stats["submitted"] == stats["completed"] == 4
+    assert stats["queued"] == 0 and stats["active"] == 0
+    executor.shutdown()
+
+# Una tarea cancelada mientras espera un hilo sale de la cola
+def test_cancelled_queued_task_leaves_the_queue():
+    executor = DBExecutor(1)
+    async def main():
+        running = asyncio.ensure_future(executor.run(time.sleep, 0.1))
+        queued = asyncio.ensure_future(executor.run(time.sleep, 0.1))
+        await asyncio.sleep(0.02)
+        assert executor.stats()["queued"] == 1
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        await running
+        await asyncio.sleep(0.15)
+    asyncio.run(main())
+    assert executor.stats()["queued"] == 0
+    executor.shutdown()
+
+# El número de hilos debe ser positivo
+def test_rejects_invalid_size():
+    with pytest.raises(ValueError):
+        DBExecutor(0)
@@ -0,0 +1,35 @@
+# Pruebas de los formateadores y del manejador de la cola de registros.
+# Importar librerías necesarias
+import json
+import logging
+import queue
+import sys
+from utlis.log import JsonFormatter, TextFormatter, _StatsQueueHandler
+
+# Crear un registro de prueba con una excepción capturada
+def make_record(**kwargs) -> logging.LogRecord:
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        exc_info = sys.exc_info()
+    return logging.LogRecord("test", logging.ERROR, __file__, 1, "fallo %s", ("x",), exc_info, **kwargs)
+
+# El formato JSON incluye la traza, la pila y los campos estructurados
+def test_json_formatter_keeps_traceback_and_stack():
+    record = make_record(sinfo="Stack (most recent call last):\n  frame")
+    record.query_id = 7
+    data = json.loads(JsonFormatter().format(record))
+    assert data["msg"] == "fallo x" and data["query_id"] == 7
+    assert "ValueError: boom" in data["exc"]
+    assert "frame" in data["stack"]
+
+# El registro encolado conserva el mensaje sin la traza y la traza como texto en su propio campo
+def test_queued_record_keeps_traceback_apart():
+    handler = _StatsQueueHandler(queue.Queue())
+    handler.emit(make_record())
+    record = handler.queue.get_nowait()
+    assert record.exc_info is None and record.args is None
+    data = json.loads(JsonFormatter().format(record))
+    assert data["msg"] == "fallo x"
+    assert "ValueError: boom" in data["exc"]
+    assert "ValueError: boom" in TextFormatter().format(record)
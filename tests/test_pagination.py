@@ -0,0 +1,54 @@
+# Pruebas de la paginación por clave: cursores opacos, límites y respuesta de cada página.
+# Importar librerías necesarias
+import pytest
+from fastapi import HTTPException
+from utlis.pagination import (
+    FIRST_KEY, max_page_size, default_page_size,
+    encode_cursor, decode_cursor, page_limit, cursor_key, cursor_after, page_response
+)
+
+# El cursor se decodifica a la misma posición y es apto para URL
+def test_cursor_round_trip():
+    position = {"id": 42, "name": "Crème brûlée/ñ?"}
+    cursor = encode_cursor(position)
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+    assert decode_cursor(cursor) == position
+
+# Un cursor mal formado o que no es un objeto responde 400
+@pytest.mark.parametrize("cursor", ["%%%", "bm90IGpzb24", encode_cursor([1, 2])])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+# Sin límite ni cursor no se pagina; el límite nunca supera el máximo
+def test_page_limit():
+    assert page_limit(None, None) is None
+    assert page_limit(None, "x") == default_page_size
+    assert page_limit(5, None) == 5
+    assert page_limit(max_page_size + 1, None) == max_page_size
+
+# La clave del cursor es la última devuelta o FIRST_KEY en la primera página
+def test_cursor_key():
+    assert cursor_key(None) == FIRST_KEY
+    assert cursor_key(encode_cursor({"ingredient_id": 7}), "ingredient_id") == 7
+    with pytest.raises(HTTPException):
+        cursor_key(encode_cursor({"id": "7"}))
+
+# La posición incluye el valor de la columna de orden (también NULL) y exige que el cursor sea del mismo orden
+def test_cursor_after():
+    assert cursor_after(None, "price") is None
+    assert cursor_after(encode_cursor({"id": 3, "price": 2.5}), "price") == (2.5, 3)
+    assert cursor_after(encode_cursor({"id": 3, "price": None}), "price") == (None, 3)
+    with pytest.raises(HTTPException):
+        cursor_after(encode_cursor({"id": 3, "price": 2.5}), "name")
+    with pytest.raises(HTTPException):
+        cursor_after(encode_cursor({"id": 3, "price": [1]}), "price")
+
+# La fila extra indica que hay otra página y el cursor apunta a la última fila devuelta
+def test_page_response():
+    rows = [{"id": i, "price": i * 1.5} for i in range(1, 5)]
+    page = page_response(rows, 3, column="price")
+    assert page["items"] == rows[:3]
+    assert decode_cursor(page["next_cursor"]) == {"id": 3, "price": 4.5}
+    assert page_response(rows, 4)["next_cursor"] is None
@@ -0,0 +1,50 @@
+# Pruebas del pool de conexiones con conexiones de prueba en lugar del driver.
+# Importar librerías necesarias
+import pytest
+
+# El módulo importa el driver ODBC, que necesita sus librerías del sistema instaladas
+pool_module = pytest.importorskip("utlis.pool", exc_type=ImportError)
+
+# Conexión de prueba que cuenta las verificaciones
+class FakeConnection:
+    # Inicializar la conexión
+    def __init__(self):
+        self.checks = 0
+        self.closed = False
+    # La verificación abre un cursor
+    def cursor(self):
+        self.checks += 1
+        return self
+    def execute(self, sql):
+        pass
+    def fetchall(self):
+        return [(1,)]
+    def rollback(self):
+        pass
+    def close(self):
+        self.closed = True
+
+# Pool con conexiones de prueba
+def make_pool(monkeypatch, **kwargs):
+    pool = pool_module.ConnectionPool("", min_size=0, max_size=2, **kwargs)
+    monkeypatch.setattr(pool, "_connect", FakeConnection)
+    return pool
+
+# Solo los errores con SQLSTATE de clase 08 indican una conexión cortada
+def test_is_disconnect():
+    assert pool_module.is_disconnect(pool_module.pyodbc.Error("08S01", "Communication link failure"))
+    assert not pool_module.is_disconnect(pool_module.pyodbc.Error("42S02", "Invalid object name"))
+    assert not pool_module.is_disconnect(pool_module.pyodbc.Error())
+
+# Una conexión usada hace poco se reutiliza sin verificarla; con intervalo 0 se verifica en cada obtención
+@pytest.mark.parametrize("interval, checks", [(30, 0), (0, 2)])
+def test_health_check_interval(monkeypatch, interval, checks):
+    pool = make_pool(monkeypatch, health_check_interval=interval)
+    first = pool.acquire()
+    pool.release(first)
+    for _ in range(2):
+        pooled = pool.acquire()
+        assert pooled is first
+        pool.release(pooled)
+    assert first.conn.checks == checks
+    assert pool.stats()["checkouts"] == 3
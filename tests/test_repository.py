@@ -0,0 +1,107 @@
+# Pruebas del repositorio genérico: generación de sentencias y condiciones de la paginación por clave.
+# Las condiciones de página se ejecutan sobre SQLite, que también ordena los NULL primero en orden ascendente
+# y al final en orden descendente, igual que SQL Server.
+# Importar librerías necesarias
+import sqlite3
+from typing import Optional
+import pytest
+from pydantic import BaseModel
+from utlis.repository import Repository
+
+# Modelo de prueba
+class Item(BaseModel):
+    id: Optional[int] = None
+    name: Optional[str] = None
+    price: Optional[float] = None
+
+# Repositorio de prueba
+repository = Repository(Item, "[items]")
+
+# Filas de prueba (con precios repetidos y NULL)
+ROWS = [(1, "a", 5.0), (2, "b", None), (3, "c", 2.0), (4, "d", 5.0), (5, "e", None), (6, "f", 1.0), (7, "g", 2.0)]
+
+# Base SQLite con las filas de prueba
+@pytest.fixture
+def db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("create table [items] ([id] integer primary key, [name] text, [price] real)")
+    conn.executemany("insert into [items] values (?, ?, ?)", ROWS)
+    yield conn
+    conn.close()
+
+# Ejecutar una sentencia del repositorio en SQLite (TOP se convierte en LIMIT al final)
+def run(conn, sql: str, params: list) -> list[tuple]:
+    if "top (?) " in sql:
+        sql = sql.replace("top (?) ", "") + " limit ?"
+        params = params[1:] + params[:1]
+    return conn.execute(sql, params).fetchall()
+
+# Leer todas las páginas de un listado ordenado
+def all_pages(conn, sort: str | None, size: int) -> list[int]:
+    column = (sort or "id").removeprefix("-")
+    ids, after = [], None
+    while True:
+        sql, params = repository.select_statement(sort=sort, top=size, after=after)
+        rows = run(conn, sql, params)
+        ids.extend(row[0] for row in rows)
+        if len(rows) < size:
+            return ids
+        last = dict(zip(repository.columns, rows[-1]))
+        after = (last[column], last["id"])
+
+# Las sentencias fijas se generan una vez al crear el repositorio
+def test_fixed_statements():
+    assert "insert into [items] ([name], [price])" in repository.insert_sql
+    assert "output inserted.[id]" in repository.insert_sql
+    assert "where [id] = ?" in repository.select_one_sql
+    assert "delete from [items]" in repository.delete_sql
+
+# La sentencia UPDATE se genera una vez por conjunto de campos y sin campos no hay sentencia
+def test_update_sql_is_generated_once_per_field_set():
+    sql, params = repository.update_statement(Item(id=3, price=1.5))
+    assert "set [price] = ?" in sql
+    assert params == [1.5, 3]
+    assert repository.update_statement(Item(id=3, price=2.5))[0] is sql
+    assert repository.update_statement(Item(id=3)) is None
+
+# La sentencia SELECT se genera una vez por forma de consulta
+def test_select_sql_is_cached_per_shape():
+    first = repository.select_sql((("price", ">="),), "-price", "first")
+    assert repository.select_sql((("price", ">="),), "-price", "first") is first
+    assert "where [price] >= ?" in first
+    assert "order by [price] desc, [id] desc" in first
+
+# Los nombres se escriben en la sentencia, así que solo se aceptan columnas y operadores conocidos
+def test_select_sql_rejects_unknown_columns_and_operators():
+    with pytest.raises(ValueError):
+        repository.select_sql((("secret", "="),))
+    with pytest.raises(ValueError):
+        repository.select_sql((("price", "<>"),))
+    with pytest.raises(ValueError):
+        repository.select_sql(sort="secret")
+    with pytest.raises(ValueError):
+        repository.select_in_template("secret")
+
+# Los filtros sin valor no forman parte de la sentencia
+def test_select_statement_ignores_missing_filters(db):
+    sql, params = repository.select_statement([("price", ">=", 2.0), ("name", "=", None)], sort="id")
+    assert params == [2.0]
+    assert [row[0] for row in run(db, sql, params)] == [1, 3, 4, 7]
+
+# Se leen solo las columnas pedidas
+def test_select_statement_reads_only_requested_columns(db):
+    sql, params = repository.select_statement(columns=("id", "name"))
+    assert run(db, sql, params)[0] == (1, "a")
+
+# Recorrer todas las páginas devuelve las mismas filas y en el mismo orden que la consulta completa
+@pytest.mark.parametrize("sort", [None, "id", "-id", "price", "-price", "name", "-name"])
+@pytest.mark.parametrize("size", [1, 2, 3, 10])
+def test_keyset_pages_match_a_full_sort(db, sort, size):
+    sql, params = repository.select_statement(sort=sort or "id")
+    expected = [row[0] for row in run(db, sql, params)]
+    assert all_pages(db, sort, size) == expected
+
+# Los NULL van primero en orden ascendente y al final en orden descendente
+def test_keyset_pages_place_nulls_like_sql_server(db):
+    assert all_pages(db, "price", 2) == [2, 5, 6, 3, 7, 1, 4]
+    assert all_pages(db, "-price", 2) == [4, 1, 7, 3, 6, 5, 2]
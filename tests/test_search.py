@@ -0,0 +1,77 @@
+# Pruebas de los índices en memoria: autocompletado por prefijo e índice inverso de una relación.
+# Las filas de cada índice se leen con una función de prueba en lugar de la base de datos.
+# Importar librerías necesarias
+import asyncio
+import pytest
+
+# El módulo importa la capa de datos, que necesita el driver ODBC instalado
+search = pytest.importorskip("utlis.search", exc_type=ImportError)
+from utlis import versions
+from utlis.repository import Repository
+from models.providers import Provider
+
+# Filas que devuelve la consulta de construcción
+@pytest.fixture
+def rows(monkeypatch):
+    data = []
+    async def fake_query(sql, *args, **kwargs):
+        return list(data)
+    monkeypatch.setattr(search, "execute_query_rows", fake_query)
+    return data
+
+# Índice de prefijos sobre una tabla de prueba
+@pytest.fixture
+def index(rows):
+    rows.extend([{"id": 1, "name": "Queso Manchego"}, {"id": 2, "name": "Crème Brûlée"}, {"id": 3, "name": "Queso Azul"}])
+    return search.PrefixIndex("test_providers", Repository(Provider, "[kitchens].[test_providers]"))
+
+# El texto se normaliza sin acentos, sin mayúsculas y con espacios simples
+def test_normalize_text():
+    assert search.normalize_text("  Crème   BRÛLÉE ") == "creme brulee"
+
+# Un prefijo encuentra nombres por el comienzo de cualquier palabra, sin repetir elementos
+def test_prefix_search(index):
+    assert asyncio.run(index.search("que")) == [{"id": 3, "name": "Queso Azul"}, {"id": 1, "name": "Queso Manchego"}]
+    assert asyncio.run(index.search("MANCH")) == [{"id": 1, "name": "Queso Manchego"}]
+    assert asyncio.run(index.search("brul")) == [{"id": 2, "name": "Crème Brûlée"}]
+    assert asyncio.run(index.search("queso", limit=1)) == [{"id": 3, "name": "Queso Azul"}]
+    assert asyncio.run(index.search("x")) == []
+
+# Los cambios locales se aplican sin reconstruir el índice
+def test_prefix_upsert_and_remove(index):
+    asyncio.run(index.search("q"))
+    versions.bump("test_providers")
+    index.upsert(3, "Azul de Cabra")
+    index.remove(1)
+    assert asyncio.run(index.search("que")) == []
+    assert asyncio.run(index.search("cab")) == [{"id": 3, "name": "Azul de Cabra"}]
+    assert index.stats()["builds"] == 1
+
+# El índice inverso responde los valores relacionados con uno o varios destinos
+def test_link_index(rows):
+    rows.extend([{"dish_id": 1, "ingredient_id": 10}, {"dish_id": 2, "ingredient_id": 10}, {"dish_id": 2, "ingredient_id": 11}])
+    index = search.LinkIndex("test_links", "select dish_id, ingredient_id from kitchens.test_links", "dish_id", "ingredient_id")
+    assert asyncio.run(index.lookup([10])) == [1, 2]
+    index.add((3, 11))
+    index.discard(source=2)
+    assert asyncio.run(index.lookup([10, 11])) == [1, 3]
+    index.discard(target=10)
+    assert asyncio.run(index.lookup([10])) == []
+    assert index.stats()["builds"] == 1
+
+# Una escritura de otro proceso (que este no aplicó) obliga a reconstruir aunque luego haya una escritura local
+def test_foreign_write_forces_rebuild(index, rows, monkeypatch):
+    asyncio.run(index.search("q"))
+    # Escritura de otro proceso: sube la versión sin pasar por bump
+    monkeypatch.setitem(versions._versions, "test_providers", versions._versions.get("test_providers", 0) + 1)
+    rows.append({"id": 4, "name": "Queso Fresco"})
+    # Escritura local posterior
+    versions.bump("test_providers")
+    index.upsert(1, "Queso Manchego")
+    assert {"id": 4, "name": "Queso Fresco"} in asyncio.run(index.search("queso f"))
+    assert index.stats()["builds"] == 2
+
+# Un índice sin las operaciones de carga y tamaño no se puede crear
+def test_table_index_is_abstract():
+    with pytest.raises(TypeError):
+        search._TableIndex("x", "select 1 from x")
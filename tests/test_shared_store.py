@@ -0,0 +1,42 @@
+# Pruebas del almacén compartido: valores guardados como JSON y directorio privado del usuario.
+# Importar librerías necesarias
+import os
+from datetime import date, datetime, time
+import pytest
+from utlis.cache import SharedCache, NOT_FOUND
+from utlis.shared_store import SharedStore, dump_value, load_value
+
+# Almacén en un directorio temporal
+@pytest.fixture
+def store(tmp_path):
+    return SharedStore(str(tmp_path / "private" / "cache.sqlite3"))
+
+# Las fechas y horas vuelven con su tipo; las tuplas vuelven como listas
+def test_json_round_trip():
+    value = {"at": datetime(2024, 5, 1, 12, 30), "on": date(2024, 5, 1), "time": time(8, 15), "ids": (1, 2), "price": 9.5}
+    assert load_value(dump_value(value)) == {**value, "ids": [1, 2]}
+    with pytest.raises(TypeError):
+        dump_value({"obj": object()})
+
+# La caché compartida guarda valores, marcas de clave inexistente y etiquetas
+def test_shared_cache(store):
+    cache = SharedCache("t", max_size=10, ttl=60, negative_ttl=5, store=store)
+    cache.set(1, {"id": 1, "name": "a"}, tags=("provider:1",))
+    cache.set_missing(2)
+    assert cache.get(1) == {"id": 1, "name": "a"}
+    assert cache.get(2) is NOT_FOUND
+    cache.invalidate_tag("provider:1")
+    assert cache.get(1) is None
+
+# El directorio de la base se crea con permisos 0700
+def test_private_directory(store):
+    store.versions(("a",))
+    assert os.stat(os.path.dirname(store.path)).st_mode & 0o777 == 0o700
+
+# Un directorio que otros usuarios pueden usar se rechaza
+def test_rejects_shared_directory(tmp_path):
+    directory = tmp_path / "open"
+    directory.mkdir()
+    directory.chmod(0o777)
+    with pytest.raises(PermissionError):
+        SharedStore(str(directory / "cache.sqlite3")).versions(("a",))
@@ -0,0 +1,62 @@
+# Pruebas del agrupamiento de llamadas idénticas concurrentes.
+# Importar librerías necesarias
+import asyncio
+import pytest
+from utlis.singleflight import SingleFlight
+
+# Las llamadas con la misma clave comparten una sola ejecución; las de otra clave no
+def test_coalesces_identical_calls():
+    calls = []
+    async def load(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return [value]
+    async def main():
+        group = SingleFlight()
+        results = await asyncio.gather(*(group.do("a", load, 1) for _ in range(5)), group.do("b", load, 2))
+        return group, results
+    group, results = asyncio.run(main())
+    assert calls == [1, 2]
+    assert results == [[1]] * 5 + [[2]]
+    stats = group.stats()
+    assert stats["executed"] == 2 and stats["coalesced"] == 4 and stats["max_waiters"] == 5
+    assert stats["in_flight"] == 0
+
+# Una llamada posterior a la que terminó vuelve a ejecutar la función
+def test_finished_calls_are_not_reused():
+    calls = []
+    async def load():
+        calls.append(1)
+        return len(calls)
+    async def main():
+        group = SingleFlight()
+        return await group.do("a", load), await group.do("a", load)
+    assert asyncio.run(main()) == (1, 2)
+
+# Todas las llamadas agrupadas reciben la misma excepción
+def test_shares_exceptions():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+    async def main():
+        group = SingleFlight()
+        return await asyncio.gather(group.do("a", fail), group.do("a", fail), return_exceptions=True), group
+    results, group = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert group.stats()["executed"] == 1
+
+# Cancelar una de las llamadas no cancela la ejecución compartida
+def test_cancelling_a_waiter_keeps_the_shared_call():
+    async def load():
+        await asyncio.sleep(0.02)
+        return "ok"
+    async def main():
+        group = SingleFlight()
+        first = asyncio.ensure_future(group.do("a", load))
+        second = asyncio.ensure_future(group.do("a", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+    assert asyncio.run(main()) == "ok"
@@ -0,0 +1,44 @@
+# Pruebas de los cuerpos de las respuestas transmitidas.
+# Importar librerías necesarias
+import asyncio
+import json
+import pytest
+
+# El módulo importa la capa de datos, que necesita el driver ODBC instalado
+streaming = pytest.importorskip("utlis.streaming", exc_type=ImportError)
+
+# Consulta transmitida de prueba que registra si se cerró
+def fake_chunks(closed: list):
+    async def chunks():
+        try:
+            yield [{"id": 1}]
+            yield [{"id": 2}]
+        finally:
+            closed.append(True)
+    return chunks()
+
+# Leer un cuerpo completo
+async def read_all(body) -> str:
+    return "".join([part async for part in body])
+
+# Los dos formatos entregan todas las filas y cierran la consulta al terminar
+def test_bodies_read_every_chunk():
+    closed = []
+    text = asyncio.run(read_all(streaming._ndjson_body([{"id": 0}], fake_chunks(closed))))
+    assert [json.loads(line)["id"] for line in text.splitlines()] == [0, 1, 2]
+    text = asyncio.run(read_all(streaming._json_array_body([{"id": 0}], fake_chunks(closed))))
+    assert json.loads(text) == [{"id": 0}, {"id": 1}, {"id": 2}]
+    assert closed == [True, True]
+
+# Cerrar el cuerpo antes de terminar (cliente desconectado) cierra también la consulta transmitida
+@pytest.mark.parametrize("make_body", [streaming._ndjson_body, streaming._json_array_body])
+def test_closing_the_body_closes_the_stream(make_body):
+    closed = []
+    async def main():
+        chunks = fake_chunks(closed)
+        body = make_body(await anext(chunks), chunks)
+        await anext(body)
+        await body.aclose()
+        # Sin esperar a que el event loop finalice los generadores pendientes
+        assert closed == [True]
+    asyncio.run(main())
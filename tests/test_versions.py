@@ -0,0 +1,70 @@
+# Pruebas de las versiones de las tablas: tablas leídas y escritas por cada sentencia y sus contadores.
+# Importar librerías necesarias
+import sqlite3
+import pytest
+from utlis import versions
+from utlis.versions import tables_written, tables_read, normalize_sql, bump, table_versions, local_versions
+
+# Tablas modificadas por cada tipo de escritura (con o sin esquema y corchetes)
+@pytest.mark.parametrize("sql, expected", [
+    ("insert into [kitchens].[dishes] ([name]) values (?)", ("dishes",)),
+    ("update kitchens.Providers set name = ? where id = ?", ("providers",)),
+    ("delete from [ingredients] where [id] = ?", ("ingredients",)),
+    ("merge into [kitchens].[dishes_ingredients] as t using #rows as s on 1 = 0", ("dishes_ingredients",)),
+    ("merge into [kitchens].[dishes] as t using #rows as s on t.id = s.id when matched then update set t.name = s.name;", ("dishes",)),
+    ("set nocount on; update [kitchens].[dishes] set [price] = ?; update [kitchens].[dishes] set [type] = ?", ("dishes",)),
+    ("select [id] from [kitchens].[dishes]", ()),
+])
+def test_tables_written(sql, expected):
+    assert tables_written(sql) == expected
+
+# Las tablas temporales y variables de tabla no cuentan como escrituras del esquema
+def test_tables_written_ignores_temporary_tables():
+    assert tables_written("insert into #bulk_rows values (?)") == ()
+    assert tables_written("insert into @ids values (?)") == ()
+
+# Tablas leídas por una consulta con joins y subconsultas
+def test_tables_read():
+    sql = """
+        select d.id from [kitchens].[dishes] d
+        join kitchens.dishes_ingredients di on di.dish_id = d.id
+        left join [kitchens].[Ingredients] i on i.id = di.ingredient_id
+        where exists (select 1 from kitchens.dishes x where x.id = d.id)
+    """
+    assert tables_read(sql) == ("dishes", "dishes_ingredients", "ingredients")
+
+# Dos textos que solo difieren en espacios se normalizan igual
+def test_normalize_sql():
+    assert normalize_sql("select  *\r\n   from t\n") == normalize_sql("select * from t") == "select * from t"
+
+# Cada escritura incrementa la versión de sus tablas y los contadores propios del proceso
+def test_bump(monkeypatch):
+    monkeypatch.setattr(versions, "_versions", {})
+    monkeypatch.setattr(versions, "_local", {})
+    epoch = versions.write_epoch()
+    bump("a", "b")
+    bump("a")
+    assert table_versions("a", "b", "c") == (2, 1, 0)
+    assert local_versions("a", "b", "c") == (2, 1, 0)
+    assert versions.write_epoch() == epoch + 2
+
+# Almacén compartido que siempre está ocupado
+class BusyStore:
+    def versions(self, names):
+        raise sqlite3.OperationalError("database is locked")
+    def instance_id(self):
+        raise sqlite3.OperationalError("database is locked")
+    def all_versions(self):
+        raise sqlite3.OperationalError("database is locked")
+
+# Si el almacén está ocupado, las versiones son desconocidas: negativas y distintas en cada lectura
+def test_busy_shared_store_gives_unknown_versions(monkeypatch):
+    monkeypatch.setattr(versions, "shared_versions", True)
+    monkeypatch.setattr(versions, "_instance_id", None)
+    monkeypatch.setattr(versions, "get_shared_store", BusyStore)
+    first = table_versions("a", "b")
+    assert all(v < 0 for v in first)
+    assert table_versions("a", "b") != first
+    assert versions.write_epoch() != versions.write_epoch()
+    assert versions.versions_id() == versions.boot_id
+    assert versions.get_table_versions()["tables"] is None
@@ -0,0 +1,68 @@
+# Módulo para obtener varios elementos por una lista de IDs (?ids=1,2,3).
+# Los elementos se leen primero de la caché de la entidad y el resto con una sola consulta IN (u openjson para
+# listas largas); el resultado respeta el orden pedido e indica los IDs que no existen.
+# Importar librerías necesarias
+# Librerías para entorno, excepciones HTTP, cachés y consultas por lotes
+import os
+from fastapi import HTTPException
+from utlis.cache import NOT_FOUND
+from utlis.expand import select_in
+from utlis.pagination import max_page_size
+from utlis.versions import tables_read, table_versions
+
+# Número máximo de IDs por petición
+batch_max_ids: int = int(os.getenv("BATCH_MAX_IDS", str(max_page_size)))
+
+# Función para convertir el parámetro ids ("1,2,3") en una lista de enteros
+def parse_ids(ids: str) -> list[int]:
+    # Convertir cada ID
+    values = [int(value) for value in ids.split(",") if value.strip()]
+    # Verificar el número de IDs
+    if not values or len(values) > batch_max_ids:
+        # Lanzar una excepción HTTP 400 indicando que la lista es inválida
+        raise HTTPException(status_code=400, detail=f"La lista de IDs debe tener entre 1 y {batch_max_ids} elementos")
+    # Devolver los IDs
+    return values
+
+# Función para obtener varios elementos de un repositorio por sus IDs
+# Devuelve items (un elemento o None por cada ID pedido, en el mismo orden) y missing (los IDs que no existen).
+async def fetch_by_ids(repository, cache, ids: list[int]) -> dict:
+    # Elementos encontrados por ID
+    found: dict = {}
+    # IDs que hay que consultar
+    pending = []
+    # Buscar cada ID distinto en la caché
+    for id in dict.fromkeys(ids):
+        cached = cache.get(id)
+        # Se sabe que no existe
+        if cached is NOT_FOUND:
+            continue
+        # Está en la caché
+        if cached is not None:
+            found[id] = cached
+        # Hay que consultarlo
+        else:
+            pending.append(id)
+    # Consultar el resto con una sola consulta
+    if pending:
+        # Tablas de la consulta y su versión antes de consultar
+        tables = tables_read(repository.select_one_sql)
+        versions = table_versions(*tables)
+        # Ejecutar la consulta IN por la clave
+        rows = await select_in(repository.select_in_template(repository.key), pending)
+        # Guardar en la caché solo si ninguna escritura cambió las tablas mientras se consultaba
+        unchanged = table_versions(*tables) == versions
+        # Guardar en la caché los elementos encontrados
+        for row in rows:
+            found[row[repository.key]] = row
+            if unchanged:
+                cache.set(row[repository.key], row)
+        # Recordar por poco tiempo los IDs que no existen
+        for id in pending:
+            if id not in found and unchanged:
+                cache.set_missing(id)
+    # Devolver los elementos en el orden pedido y los IDs que no existen
+    return {
+        "items": [found.get(id) for id in ids],
+        "missing": [id for id in dict.fromkeys(ids) if id not in found]
+    }
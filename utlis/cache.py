@@ -0,0 +1,319 @@
+# Módulo para la caché en memoria de las entidades.
+# Cada entidad tiene su propia caché LRU con tiempo de vida (TTL), acotada en número de elementos; los
+# controladores la leen antes de ir a la base de datos y la invalidan al actualizar o eliminar.
+# Los elementos pueden llevar etiquetas para invalidar de una vez todos los que dependen de otro dato.
+# Con CACHE_BACKEND=shared las cachés viven en un almacén compartido por todos los workers del host.
+# Importar librerías necesarias
+# Librerías para entorno, logging, SQLite, hilos, diccionarios ordenados y medición de tiempos
+from collections import OrderedDict
+import logging
+import os
+import sqlite3
+import threading
+import time
+from utlis.shared_store import SharedStore, get_shared_store, retry_later
+
+# Configurar el logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Configuración por defecto de las cachés desde variables de entorno
+# (cada entidad puede sobrescribirla con CACHE_<ENTIDAD>_MAX_SIZE y CACHE_<ENTIDAD>_TTL_SECONDS)
+default_cache_max_size: int = int(os.getenv("CACHE_MAX_SIZE", "1000"))
+default_cache_ttl: float = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+# Tiempo de vida de las entradas negativas (claves que no existen en la base de datos)
+default_negative_ttl: float = float(os.getenv("CACHE_NEGATIVE_TTL_SECONDS", "5"))
+# Tipo de caché: "memory" (propia de cada proceso) o "shared" (compartida entre procesos)
+cache_backend: str = os.getenv("CACHE_BACKEND", "memory").lower()
+
+# Marca guardada en la caché para una clave que no existe en la base de datos
+# (la caché compartida la guarda como NOT_FOUND_VALUE y la recupera como esta misma marca, así se compara con "is")
+class _NotFound:
+    # Representación legible
+    def __repr__(self):
+        return "NOT_FOUND"
+
+# Marca de clave inexistente
+NOT_FOUND = _NotFound()
+# Valor JSON con el que la caché compartida guarda la marca de clave inexistente
+NOT_FOUND_VALUE: dict = {"$t": "not_found"}
+
+# Caché LRU con tiempo de vida, segura para hilos
+class MemoryCache:
+    # Inicializar la caché con su configuración
+    def __init__(self, name: str, max_size: int, ttl: float, negative_ttl: float = default_negative_ttl):
+        # Guardar la configuración (max_size 0 desactiva la caché)
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # Elementos guardados como clave -> (momento de vencimiento, valor, etiquetas); el más reciente al final
+        self._data: OrderedDict = OrderedDict()
+        # Claves de los elementos de cada etiqueta
+        self._tags: dict[str, set] = {}
+        # Bloqueo para los elementos y contadores
+        self._lock = threading.Lock()
+        # Contadores para las estadísticas
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    # Obtener un valor de la caché (None si no está o venció)
+    # El valor devuelto se comparte entre peticiones y no debe modificarse.
+    def get(self, key):
+        # Buscar el elemento
+        with self._lock:
+            entry = self._data.get(key)
+            # Contar el fallo si no está
+            if entry is None:
+                self._misses += 1
+                return None
+            # Descartar el elemento si venció
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            # Marcar el elemento como el más reciente y contar el acierto
+            self._data.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    # Guardar un valor en la caché (con el TTL de la caché si no se indica otro) junto con sus etiquetas
+    def set(self, key, value, ttl: float | None = None, tags: tuple[str, ...] = ()):
+        # No guardar nada si la caché está desactivada
+        if self.max_size <= 0:
+            return
+        # Calcular el vencimiento
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        # Guardar el elemento como el más reciente
+        with self._lock:
+            # Quitar las etiquetas del valor anterior
+            if key in self._data:
+                self._remove(key)
+            # Guardar el elemento y registrar sus etiquetas
+            self._data[key] = (expires_at, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            # Desalojar los elementos menos usados si se superó el tamaño máximo
+            while len(self._data) > self.max_size:
+                self._remove(next(iter(self._data)))
+                self._evictions += 1
+
+    # Recordar por poco tiempo que una clave no existe (se borra con delete al insertarla)
+    def set_missing(self, key):
+        # Guardar la marca con el TTL negativo
+        if self.negative_ttl > 0:
+            self.set(key, NOT_FOUND, ttl=self.negative_ttl)
+
+    # Eliminar un valor de la caché
+    def delete(self, key):
+        # Quitar el elemento si existe
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+                self._invalidations += 1
+
+    # Eliminar todos los valores que llevan una etiqueta
+    def invalidate_tag(self, tag: str):
+        # Quitar cada elemento de la etiqueta
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self._invalidations += 1
+
+    # Vaciar la caché
+    def clear(self):
+        # Quitar todos los elementos
+        with self._lock:
+            self._invalidations += len(self._data)
+            self._data.clear()
+            self._tags.clear()
+
+    # Quitar un elemento y sus etiquetas (se llama con el bloqueo tomado)
+    def _remove(self, key):
+        # Quitar el elemento
+        entry = self._data.pop(key)
+        # Quitar la clave de cada etiqueta y las etiquetas que quedan vacías
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    # Obtener las estadísticas de la caché
+    def stats(self) -> dict:
+        # Leer los contadores de forma consistente
+        with self._lock:
+            # Número de lecturas
+            lookups = self._hits + self._misses
+            # Devolver las estadísticas
+            return {
+                "backend": "memory",
+                "size": len(self._data),
+                "tags": len(self._tags),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "negative_ttl_seconds": self.negative_ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations
+            }
+
+# Caché guardada en el almacén compartido entre procesos
+# Tiene la misma interfaz que MemoryCache; los valores se guardan como JSON (las tuplas vuelven como listas) y
+# cualquier proceso que escriba o invalide afecta a todos. Los elementos más antiguos se desalojan primero y los
+# contadores son del proceso. Si la base está ocupada, una lectura o un guardado cuentan como fallo de caché y
+# una invalidación se reintenta fuera del event loop (nunca se convierten en un error de la petición).
+class SharedCache:
+    # Inicializar la caché con su configuración
+    def __init__(self, name: str, max_size: int, ttl: float, negative_ttl: float = default_negative_ttl, store: SharedStore | None = None):
+        # Guardar la configuración (max_size 0 desactiva la caché)
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # Almacén compartido
+        self._store = store or get_shared_store()
+        # Bloqueo para los contadores
+        self._lock = threading.Lock()
+        # Contadores para las estadísticas (de este proceso)
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    # Obtener un valor de la caché (None si no está o venció)
+    def get(self, key):
+        # Leer el valor del almacén (un error cuenta como fallo de caché)
+        try:
+            value = self._store.get(self.name, repr(key)) if self.max_size > 0 else None
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo leer la caché compartida {self.name}: {e}")
+            value = None
+        # Recuperar la marca de clave inexistente
+        if value == NOT_FOUND_VALUE:
+            value = NOT_FOUND
+        # Contar el acierto o el fallo
+        with self._lock:
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        # Devolver el valor
+        return value
+
+    # Guardar un valor en la caché (con el TTL de la caché si no se indica otro) junto con sus etiquetas
+    def set(self, key, value, ttl: float | None = None, tags: tuple[str, ...] = ()):
+        # No guardar nada si la caché está desactivada
+        if self.max_size <= 0:
+            return
+        # Guardar el valor y desalojar los más antiguos (si no se puede, el valor simplemente no queda guardado)
+        try:
+            evicted = self._store.set(
+                self.name, repr(key), NOT_FOUND_VALUE if value is NOT_FOUND else value,
+                self.ttl if ttl is None else ttl, tags, self.max_size
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo guardar en la caché compartida {self.name}: {e}")
+            return
+        # Contar los desalojos
+        with self._lock:
+            self._evictions += evicted
+
+    # Recordar por poco tiempo que una clave no existe (se borra con delete al insertarla)
+    def set_missing(self, key):
+        # Guardar la marca con el TTL negativo
+        if self.negative_ttl > 0:
+            self.set(key, NOT_FOUND, ttl=self.negative_ttl)
+
+    # Eliminar un valor de la caché (en todos los procesos)
+    def delete(self, key):
+        # Quitar el valor del almacén
+        self._delete(key=repr(key))
+
+    # Eliminar todos los valores que llevan una etiqueta (en todos los procesos)
+    def invalidate_tag(self, tag: str):
+        # Quitar los valores de la etiqueta
+        self._delete(tag=tag)
+
+    # Vaciar la caché (en todos los procesos)
+    def clear(self):
+        # Quitar todos los valores
+        self._delete()
+
+    # Quitar valores del almacén por clave, por etiqueta o todos (si la base está ocupada se reintenta en otro hilo)
+    def _delete(self, key: str | None = None, tag: str | None = None):
+        # Intentar quitar los valores
+        try:
+            removed = self._store.delete(self.name, key=key, tag=tag)
+        # Reintentar fuera del event loop
+        except sqlite3.Error as e:
+            logger.warning(f"Invalidación de la caché compartida {self.name} pospuesta: {e}")
+            retry_later("delete", self.name, key=key, tag=tag)
+            return
+        # Contar las invalidaciones
+        with self._lock:
+            self._invalidations += removed
+
+    # Obtener las estadísticas de la caché
+    def stats(self) -> dict:
+        # Contar los elementos del almacén (sin conteos si la base está ocupada)
+        try:
+            size, tags = self._store.size(self.name)
+        except sqlite3.Error:
+            size, tags = None, None
+        # Leer los contadores de forma consistente
+        with self._lock:
+            # Número de lecturas
+            lookups = self._hits + self._misses
+            # Devolver las estadísticas
+            return {
+                "backend": "shared",
+                "size": size,
+                "tags": tags,
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "negative_ttl_seconds": self.negative_ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations
+            }
+
+# Tipos de caché disponibles por nombre (se pueden registrar otros con la misma interfaz)
+cache_backends: dict = {
+    "memory": MemoryCache,
+    "shared": SharedCache
+}
+
+# Cachés creadas por nombre
+_caches: dict[str, MemoryCache | SharedCache] = {}
+# Bloqueo para crear las cachés
+_caches_lock = threading.Lock()
+
+# Función para obtener la caché de una entidad (se crea la primera vez con su configuración del entorno)
+def get_cache(name: str) -> MemoryCache | SharedCache:
+    # Crear la caché solo si no existe
+    with _caches_lock:
+        if name not in _caches:
+            # Leer la configuración propia de la entidad o la de por defecto
+            prefix = f"CACHE_{name.upper()}_"
+            max_size = int(os.getenv(prefix + "MAX_SIZE", str(default_cache_max_size)))
+            ttl = float(os.getenv(prefix + "TTL_SECONDS", str(default_cache_ttl)))
+            negative_ttl = float(os.getenv(prefix + "NEGATIVE_TTL_SECONDS", str(default_negative_ttl)))
+            # Crear la caché con el tipo configurado
+            _caches[name] = cache_backends[cache_backend](name, max_size, ttl, negative_ttl)
+        # Devolver la caché
+        return _caches[name]
+
+# Función para obtener las estadísticas de todas las cachés
+def get_cache_stats() -> dict:
+    # Devolver las estadísticas de cada caché
+    return {name: cache.stats() for name, cache in _caches.items()}
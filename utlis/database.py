@@ -8,12 +8,20 @@ import pyodbc
 import logging
 import json
 import asyncio
+import functools
+import time
+import anyio
+from decimal import Decimal
+from utlis.pool import ConnectionPool, PooledConnection, is_disconnect
+from utlis.executor import DBExecutor
+from utlis.log import new_query_id, log_query, log_query_error
+from utlis.versions import tables_written, tables_read, normalize_sql, table_versions, bump, write_epoch
+from utlis.cache import get_cache
+from utlis.singleflight import SingleFlight
 
 # Cargar  de entorno
 load_dotenv()
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 # Configurar el logger para este módulo
 logger = logging.getLogger(__name__)
 
@@ -27,18 +35,152 @@ password: str = os.getenv("SQL_PASSWORD")
 # Construir la cadena de conexión
 connection_string = f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}'
 
-# Función para obtener una conexión a la base de datos
-async def get_db_connection():
-    # Intentar conectar a la base de datos
+# Configuración del pool de conexiones desde variables de entorno
+pool_min_size: int = int(os.getenv("SQL_POOL_MIN_SIZE", "1"))
+pool_max_size: int = int(os.getenv("SQL_POOL_MAX_SIZE", "10"))
+pool_max_idle: float = float(os.getenv("SQL_POOL_MAX_IDLE_SECONDS", "300"))
+pool_max_lifetime: float = float(os.getenv("SQL_POOL_MAX_LIFETIME_SECONDS", "1800"))
+pool_acquire_timeout: float = float(os.getenv("SQL_POOL_TIMEOUT_SECONDS", "30"))
+# Las conexiones libres usadas hace menos de este tiempo se entregan sin la consulta de verificación
+# (0 verifica en cada obtención); si una de ellas resulta cortada, la consulta se repite una vez con otra conexión
+pool_health_check_interval: float = float(os.getenv("SQL_POOL_HEALTH_CHECK_SECONDS", "30"))
+connect_timeout: int = int(os.getenv("SQL_CONNECT_TIMEOUT", "5"))
+# Número de hilos para el trabajo de base de datos (nunca mayor que el máximo de conexiones)
+executor_max_workers: int = min(int(os.getenv("SQL_EXECUTOR_MAX_WORKERS", str(pool_max_size))), pool_max_size)
+# Número máximo de consultas transmitidas a la vez (nunca mayor que el máximo de conexiones)
+# Las transmisiones leen en su propio pool de hilos de ese tamaño: una transmisión conserva su conexión entre
+# bloques, así que si compartiera los hilos con las consultas que esperan una conexión podría no avanzar nunca.
+stream_max_concurrent: int = min(int(os.getenv("SQL_STREAM_MAX_CONCURRENT", str(pool_max_size))), pool_max_size)
+# Número de filas que se leen por bloque en las consultas transmitidas
+stream_chunk_size: int = int(os.getenv("SQL_STREAM_CHUNK_SIZE", "500"))
+# Número máximo de filas aceptadas por una inserción masiva
+bulk_max_rows: int = int(os.getenv("SQL_BULK_MAX_ROWS", "1000"))
+# Agrupar las lecturas idénticas concurrentes en una sola consulta
+coalesce_reads: bool = os.getenv("SQL_COALESCE_READS", "true").lower() in ("1", "true", "yes")
+
+# Pool de conexiones compartido por toda la aplicación
+_pool: ConnectionPool | None = None
+# Pool de hilos donde se ejecutan todas las llamadas al driver
+_executor: DBExecutor | None = None
+# Pool de hilos propio de las consultas transmitidas y lugares disponibles para ellas (uno por hilo)
+_stream_executor: DBExecutor | None = None
+_stream_slots: asyncio.Semaphore | None = None
+# Lecturas en curso que comparten su resultado con las peticiones idénticas
+_reads = SingleFlight()
+# Caché de resultados de las consultas que la piden (cache_result=True), etiquetada por tabla leída
+# (tamaño y TTL configurables con CACHE_QUERY_RESULTS_MAX_SIZE y CACHE_QUERY_RESULTS_TTL_SECONDS)
+_results = get_cache("query_results")
+
+# Función para crear el pool de conexiones (se llama al iniciar la aplicación)
+def init_pool() -> ConnectionPool:
+    global _pool
+    # Crear el pool solo si no existe
+    if _pool is None:
+        # Crear el pool con la configuración del entorno
+        _pool = ConnectionPool(
+            connection_string,
+            min_size=pool_min_size,
+            max_size=pool_max_size,
+            max_idle=pool_max_idle,
+            max_lifetime=pool_max_lifetime,
+            acquire_timeout=pool_acquire_timeout,
+            connect_timeout=connect_timeout,
+            health_check_interval=pool_health_check_interval
+        )
+        # Abrir las conexiones mínimas
+        _pool.open()
+    # Devolver el pool
+    return _pool
+
+# Función para cerrar el pool de conexiones (se llama al detener la aplicación)
+def close_pool():
+    global _pool
+    # Cerrar el pool si existe
+    if _pool is not None:
+        # Cerrar todas las conexiones
+        _pool.close()
+        _pool = None
+
+# Función para crear el pool de hilos de base de datos (se llama al iniciar la aplicación)
+def init_executor() -> DBExecutor:
+    global _executor
+    # Crear el pool de hilos solo si no existe
+    if _executor is None:
+        # Crear el pool de hilos acotado al número de conexiones
+        _executor = DBExecutor(executor_max_workers)
+    # Devolver el pool de hilos
+    return _executor
+
+# Función para crear el pool de hilos de las consultas transmitidas
+def init_stream_executor() -> DBExecutor:
+    global _stream_executor, _stream_slots
+    # Crear el pool de hilos solo si no existe
+    if _stream_executor is None:
+        # Crear el pool de hilos y un lugar por hilo
+        _stream_executor = DBExecutor(stream_max_concurrent, name="db-stream")
+        _stream_slots = asyncio.Semaphore(stream_max_concurrent)
+    # Devolver el pool de hilos
+    return _stream_executor
+
+# Función para detener el pool de hilos de base de datos (se llama al detener la aplicación)
+def close_executor():
+    global _executor, _stream_executor, _stream_slots
+    # Detener el pool de hilos si existe
+    if _executor is not None:
+        # Esperar a que terminen las tareas en curso
+        _executor.shutdown()
+        _executor = None
+    # Detener el pool de hilos de las transmisiones si existe
+    if _stream_executor is not None:
+        # Esperar a que terminen las tareas en curso
+        _stream_executor.shutdown()
+        _stream_executor = None
+        _stream_slots = None
+
+# Función para crear los recursos de base de datos al iniciar la aplicación
+def init_db():
+    # Crear los pools de hilos y el pool de conexiones
+    init_executor()
+    init_stream_executor()
+    init_pool()
+
+# Función para liberar los recursos de base de datos al detener la aplicación
+def close_db():
+    # Detener primero los hilos para no cerrar conexiones en uso
+    close_executor()
+    close_pool()
+
+# Función para obtener las estadísticas del pool de conexiones
+def get_pool_stats() -> dict:
+    # Devolver las estadísticas o un pool vacío si no se ha creado
+    return _pool.stats() if _pool is not None else {"size": 0, "in_use": 0, "idle": 0}
+
+# Función para obtener las estadísticas del pool de hilos
+def get_executor_stats() -> dict:
+    # Devolver las estadísticas o un pool vacío si no se ha creado
+    return _executor.stats() if _executor is not None else {"max_workers": executor_max_workers, "queued": 0, "active": 0}
+
+# Función para obtener las estadísticas del pool de hilos de las consultas transmitidas
+def get_stream_executor_stats() -> dict:
+    # Devolver las estadísticas o un pool vacío si no se ha creado
+    return _stream_executor.stats() if _stream_executor is not None else {"max_workers": stream_max_concurrent, "queued": 0, "active": 0}
+
+# Función para obtener las estadísticas de las lecturas agrupadas
+def get_coalescing_stats() -> dict:
+    # Devolver las estadísticas junto con la configuración
+    return {"enabled": coalesce_reads, **_reads.stats()}
+
+# Función para ejecutar una función bloqueante del driver en el pool de hilos
+async def run_in_db_executor(fn, *args, **kwargs):
+    # Ejecutar la función fuera del event loop (se crea el pool de hilos si aún no existe)
+    return await init_executor().run(fn, *args, **kwargs)
+
+# Función para obtener una conexión del pool (se ejecuta dentro de un hilo de base de datos)
+def _acquire_connection() -> PooledConnection:
+    # Intentar obtener una conexión
     try:
-        # Registrar intento de conexión
-        logger.info("Conectando con la base de datos...")
-        # Establecer conexión
-        conn = pyodbc.connect(connection_string, timeout=5)
-        # Registrar éxito de conexión
-        logger.info("Conectado a la base de datos exitosamente.")
-        # Devolver la conexión
-        return conn
+        # Obtener la conexión del pool (se crea el pool si aún no existe)
+        return init_pool().acquire()
     # Manejo de errores de conexión
     except pyodbc.Error as e:
         # Registrar error de pyodbc
@@ -52,22 +194,211 @@ async def get_db_connection():
         # Relanzar la excepción
         raise
 
+# Función para obtener una conexión del pool sin bloquear el event loop
+# (por defecto en el pool de hilos general; las transmisiones pasan el suyo)
+async def get_db_connection(executor: DBExecutor | None = None) -> PooledConnection:
+    # Pool de hilos donde se obtiene (y, si hace falta, se devuelve) la conexión
+    executor = executor or init_executor()
+    # Obtener la conexión desde un hilo de base de datos en una tarea propia
+    task = asyncio.ensure_future(executor.run(_acquire_connection))
+    # Esperar la conexión sin cancelar la obtención si esta petición se cancela
+    try:
+        return await asyncio.shield(task)
+    # Devolver al pool la conexión que llegue después de la cancelación
+    except asyncio.CancelledError:
+        task.add_done_callback(functools.partial(_release_abandoned, executor))
+        raise
+
+# Función para devolver al pool una conexión obtenida para una petición que ya se canceló
+def _release_abandoned(executor: DBExecutor, task: asyncio.Future):
+    # Nada que devolver si la obtención falló o se canceló
+    if task.cancelled() or task.exception() is not None:
+        return
+    # Devolver la conexión desde un hilo de base de datos (el rollback es bloqueante)
+    asyncio.ensure_future(executor.run(release_db_connection, task.result()))
+
+# Función para devolver una conexión al pool
+def release_db_connection(pooled: PooledConnection, discard: bool = False):
+    # Devolver la conexión al pool si todavía existe
+    if _pool is not None:
+        # Devolver la conexión
+        _pool.release(pooled, discard=discard)
+    # Cerrar la conexión si el pool ya fue cerrado
+    else:
+        # Cerrar la conexión
+        pooled.conn.close()
+
+# Función para registrar las tablas modificadas por una escritura confirmada
+def _tables_changed(tables: tuple[str, ...]):
+    # Incrementar la versión de las tablas
+    bump(*tables)
+    # Quitar los resultados en caché que leen de esas tablas
+    for table in tables:
+        _results.invalidate_tag(f"table:{table}")
+
+# Función para leer un resultado desde la caché de resultados o cargarlo y guardarlo
+async def _read_through(sql_template, params, variant, load):
+    # Tablas de las que lee la consulta
+    tables = tables_read(sql_template)
+    # Clave del resultado: texto normalizado, parámetros y formato
+    key = (normalize_sql(sql_template), tuple(params or ()), variant)
+    # Devolver el resultado desde la caché si está guardado
+    result = _results.get(key)
+    if result is not None:
+        return result
+    # Versión de las tablas antes de consultar
+    versions = table_versions(*tables)
+    # Cargar el resultado
+    result = await load()
+    # Guardar solo si ninguna escritura cambió las tablas mientras se consultaba
+    if table_versions(*tables) == versions:
+        _results.set(key, result, tags=tuple(f"table:{table}" for table in tables))
+    # Devolver el resultado
+    return result
+
 # Función para ejecutar una consulta SQL y devolver los resultados en formato JSON
-async def execute_query_json(sql_template, params=None, needs_commit=False):
+# Con cache_result=True la lectura se guarda en la caché de resultados hasta que se escriba en sus tablas.
+# tables indica otras tablas que cambia una escritura sin nombrarlas (por ejemplo, por un borrado en cascada).
+async def execute_query_json(sql_template, params=None, needs_commit=False, cache_result=False, tables=()):
+    # Leer a través de la caché de resultados si se pidió
+    if cache_result and not needs_commit:
+        return await _read_through(
+            sql_template, params, "json",
+            lambda: run_in_db_executor(_execute_query_sync, sql_template, params, False, _fetch_json)
+        )
+    # Ejecutar la consulta completa en un hilo de base de datos
+    return await run_in_db_executor(_execute_query_sync, sql_template, params, needs_commit, _fetch_json, tables)
+
+# Función para ejecutar una consulta SQL y devolver las filas con tipos nativos de Python
+# Devuelve una lista de diccionarios (o de tuplas si as_dict es False); las fechas se mantienen como
+# datetime/date y los decimales se convierten a float para que FastAPI los serialice una sola vez.
+# Con cache_result=True la lectura se guarda en la caché de resultados hasta que se escriba en sus tablas.
+# tables indica otras tablas que cambia una escritura sin nombrarlas (por ejemplo, por un borrado en cascada).
+async def execute_query_rows(sql_template, params=None, needs_commit=False, as_dict=True, cache_result=False, tables=()):
+    # Leer a través de la caché de resultados si se pidió
+    if cache_result and not needs_commit:
+        rows = await _read_through(
+            sql_template, params, "dicts" if as_dict else "tuples",
+            lambda: execute_query_rows(sql_template, params, as_dict=as_dict)
+        )
+        # Copiar la lista para que cada petición pueda ordenarla o recortarla sin afectar a las demás
+        return list(rows)
+    # Elegir el procesador de filas según el formato pedido
+    process = _fetch_dicts if as_dict else _fetch_tuples
+    # Compartir la lectura con las peticiones idénticas que lleguen mientras está en curso
+    # (la clave incluye el número de escrituras para no entregar datos anteriores a una escritura ya confirmada)
+    if coalesce_reads and not needs_commit:
+        # Clave de la lectura
+        key = (sql_template, tuple(params or ()), as_dict, write_epoch())
+        # Ejecutar la consulta o esperar la que está en curso
+        rows = await _reads.do(key, run_in_db_executor, _execute_query_sync, sql_template, params, needs_commit, process)
+        # Copiar la lista para que cada petición pueda ordenarla o recortarla sin afectar a las demás
+        return list(rows)
+    # Ejecutar la consulta completa en un hilo de base de datos
+    return await run_in_db_executor(_execute_query_sync, sql_template, params, needs_commit, process, tables)
+
+# Convertir un valor que no tiene una representación nativa adecuada
+def _native_value(value):
+    # Convertir decimales a float
+    if isinstance(value, Decimal):
+        return float(value)
+    # Convertir datos binarios a texto
+    if isinstance(value, (bytes, bytearray)):
+        return str(value)
+    # Devolver el valor sin cambios
+    return value
+
+# Obtener los índices de las columnas cuyos valores requieren conversión
+def _columns_to_convert(cursor) -> list[int]:
+    # Revisar el tipo de cada columna informado por el driver
+    return [i for i, column in enumerate(cursor.description) if column[1] in (Decimal, bytes, bytearray)]
+
+# Convertir una fila a tupla aplicando las conversiones necesarias
+def _native_row(row, convert: list[int]) -> tuple:
+    # Copiar la fila sin conversiones si no hay columnas que convertir
+    if not convert:
+        return tuple(row)
+    # Convertir solo las columnas que lo requieren
+    values = list(row)
+    for i in convert:
+        values[i] = _native_value(values[i])
+    return tuple(values)
+
+# Procesar los resultados del cursor como lista de diccionarios
+def _fetch_dicts(cursor) -> list[dict]:
+    # Devolver una lista vacía si la consulta no devolvió columnas
+    if not cursor.description:
+        return []
+    # Obtener nombres de columnas y columnas a convertir
+    columns = [column[0] for column in cursor.description]
+    convert = _columns_to_convert(cursor)
+    # Construir los diccionarios directamente desde las filas
+    return [dict(zip(columns, _native_row(row, convert))) for row in cursor.fetchall()]
+
+# Procesar los resultados del cursor como lista de tuplas
+def _fetch_tuples(cursor) -> list[tuple]:
+    # Devolver una lista vacía si la consulta no devolvió columnas
+    if not cursor.description:
+        return []
+    # Obtener las columnas a convertir
+    convert = _columns_to_convert(cursor)
+    # Construir las tuplas directamente desde las filas
+    return [_native_row(row, convert) for row in cursor.fetchall()]
+
+# Procesar los resultados del cursor como texto JSON
+def _fetch_json(cursor) -> str:
+    # Procesar los resultados
+    results = []
+    # Verificar si la consulta devolvió columnas
+    if cursor.description:
+        # Obtener nombres de columnas
+        columns = [column[0] for column in cursor.description]
+        # Iterar sobre las filas devueltas
+        for row in cursor.fetchall():
+            # Procesar cada fila para convertir tipos de datos no serializables
+            processed_row = [str(item) if isinstance(item, (bytes, bytearray)) else item for item in row]
+            # Agregar fila procesada a resultados como diccionario
+            results.append(dict(zip(columns, processed_row)))
+    # Devolver resultados en formato JSON
+    return json.dumps(results, default=str)
+
+# Excepción interna lanzada cuando la conexión se cortó antes de confirmar y la consulta puede repetirse
+class _ConnectionLost(Exception):
+    pass
+
+# Función que ejecuta la consulta de forma bloqueante (se ejecuta dentro de un hilo de base de datos)
+# Si la conexión se cortó antes de confirmar (por ejemplo, una conexión libre que se entregó sin verificar),
+# la consulta se repite una vez con otra conexión; el servidor ya deshizo la transacción de la conexión cortada.
+def _execute_query_sync(sql_template, params, needs_commit, process, tables=()):
+    # Intentar la consulta
+    try:
+        return _execute_query_once(sql_template, params, needs_commit, process, tables, retry=True)
+    # Repetir una sola vez con otra conexión
+    except _ConnectionLost:
+        # Registrar el reintento
+        logger.warning("Conexión del pool cortada; se repite la consulta con otra conexión.")
+        return _execute_query_once(sql_template, params, needs_commit, process, tables, retry=False)
+
+# Función que ejecuta la consulta una vez con una conexión del pool
+def _execute_query_once(sql_template, params, needs_commit, process, tables, retry: bool):
 
     # Inicializar variables
+    pooled = None
     conn = None
-    cursor = None
+    # Indica si la conexión debe descartarse en lugar de devolverse al pool
+    discard = False
+    # Indica si ya se pidió el commit (a partir de ahí la consulta no se repite)
+    committing = False
+    # ID de la consulta para relacionar sus registros y momento de inicio
+    query_id = new_query_id()
+    start = time.perf_counter()
     # Iniciar bloque try
     try:
-        # Obtener conexión y cursor
-        conn = await get_db_connection()
-        # Obtener cursor
-        cursor = conn.cursor()
-        # Registrar la consulta que se va a ejecutar
-        param_info = "(sin parámetros)" if not params else f"(con {len(params)} parámetros)"
-        # Registrar la consulta SQL
-        logger.info(f"Ejecutando consulta {param_info}: {sql_template}")
+        # Obtener conexión del pool y cursor
+        pooled = _acquire_connection()
+        conn = pooled.conn
+        # Obtener el cursor reutilizable de la conexión (permite reutilizar la sentencia preparada)
+        cursor = pooled.cursor()
         
         # Ejecutar la consulta con o sin parámetros
         if params:
@@ -77,70 +408,249 @@ async def execute_query_json(sql_template, params=None, needs_commit=False):
         else:
             # Ejecutar sin parámetros
             cursor.execute(sql_template)
+        # Avanzar hasta el primer conjunto de resultados con columnas (lotes con varias sentencias)
+        while cursor.description is None and cursor.nextset():
+            pass
             
-        # Procesar los resultados
-        results = []
-        # Verificar si la consulta devolvió columnas
-        if cursor.description:
-            # Obtener nombres de columnas
-            columns = [column[0] for column in cursor.description]
-            # Registrar las columnas obtenidas
-            logger.info(f"Columnas obtenidas: {columns}")
-            # Iterar sobre las filas devueltas
-            for row in cursor.fetchall():
-                # Procesar cada fila para convertir tipos de datos no serializables
-                processed_row = [str(item) if isinstance(item, (bytes, bytearray)) else item for item in row]
-                # Agregar fila procesada a resultados como diccionario
-                results.append(dict(zip(columns, processed_row)))
-        # Si no hay columnas devueltas
-        else:
-            # Registrar que no se devolvieron columnas
-             logger.info("La consulta no devolvió columnas (posiblemente INSERT/UPDATE/DELETE).")
+        # Procesar los resultados con el formato pedido
+        results = process(cursor)
 
         # Realizar commit si es necesario
         if needs_commit:
-            # Registrar commit
-            logger.info("Realizando commit de la transacción.")
             # Realizar commit
+            committing = True
             conn.commit()
+            # Registrar las tablas modificadas, las nombradas en la sentencia y las indicadas (versiones y caché de resultados)
+            _tables_changed(tuple(dict.fromkeys((*tables_written(sql_template), *tables))))
         
-        # Devolver resultados en formato JSON
-        return json.dumps(results, default=str)
+        # Registrar la consulta con su duración y número de filas
+        log_query(query_id, "query", sql_template, len(params or ()), time.perf_counter() - start, len(results) if isinstance(results, list) else None)
+        # Devolver los resultados procesados
+        return results
 
     # Manejo de errores de pyodbc
     except pyodbc.Error as e:
         # Registrar error de pyodbc
-        logger.error(f"Error ejecutando la consulta (SQLSTATE: {e.args[0]}): {str(e)}")
-        # Hacer rollback si es necesario
-        if conn and needs_commit:
+        log_query_error(query_id, "query", sql_template, time.perf_counter() - start, e)
+        # Descartar el cursor reutilizable porque pudo quedar con resultados pendientes
+        if pooled:
+            pooled.reset_cursor()
+        # Descartar la conexión cortada y repetir la consulta si todavía no se pidió el commit
+        if conn and is_disconnect(e):
+            # No devolver la conexión al pool
+            discard = True
+            # Repetir la consulta con otra conexión
+            if retry and not committing:
+                raise _ConnectionLost(str(e)) from e
+        # Hacer rollback para devolver la conexión limpia al pool
+        elif conn:
             # Intentar hacer rollback
             try:
-                # Registrar intento de rollback
-                logger.warning("Realizando rollback debido a error.")
                 # Hacer rollback
                 conn.rollback()
             # Manejo de errores durante el rollback    
             except pyodbc.Error as rb_e:
                 # Registrar error durante el rollback
-                 logger.error(f"Error durante el rollback: {rb_e}")
+                logger.error(f"Error durante el rollback: {rb_e}", extra={"query_id": query_id})
+                # Descartar la conexión porque quedó en un estado inválido
+                discard = True
 
         # Relanzar excepción con mensaje personalizado
         raise Exception(f"Error ejecutando consulta: {str(e)}") from e
     # Manejo de errores inesperados
     except Exception as e:
         # Registrar error inesperado
-        logger.error(f"Error inesperado durante la ejecución de la consulta: {str(e)}")
+        logger.error(f"Error inesperado durante la ejecución de la consulta: {str(e)}", extra={"query_id": query_id})
         # Relanzar la excepción
         raise
-    # Asegurar el cierre de cursor y conexión
+    # Asegurar la devolución de la conexión (el cursor se conserva con la conexión para reutilizarlo)
     finally:
-        # Cerrar cursor y conexión si existen
-        if cursor:
-            # Cerrar cursor
+        # Devolver la conexión al pool
+        if pooled:
+            # Devolver la conexión
+            release_db_connection(pooled, discard=discard)
+
+# Función para ejecutar una consulta SQL y transmitir las filas por bloques
+# Es un generador asíncrono que entrega listas de hasta chunk_size diccionarios leídos con fetchmany,
+# de modo que la memoria usada por la consulta no depende del tamaño de la tabla.
+# Todas sus llamadas al driver van al pool de hilos de las transmisiones, con un hilo por transmisión en curso.
+async def stream_query_rows(sql_template, params=None, chunk_size: int | None = None):
+    # Usar el tamaño de bloque configurado si no se indica otro
+    chunk_size = chunk_size or stream_chunk_size
+    # Pool de hilos de las transmisiones y sus lugares
+    executor = init_stream_executor()
+    slots = _stream_slots
+    # Esperar un lugar libre para transmitir (así cada transmisión tiene siempre un hilo disponible)
+    await slots.acquire()
+    # Obtener una conexión del pool
+    try:
+        pooled = await get_db_connection(executor)
+    # Liberar el lugar si no se obtuvo la conexión
+    except BaseException:
+        slots.release()
+        raise
+    # Inicializar variables
+    cursor = None
+    # Indica si la conexión debe descartarse en lugar de devolverse al pool
+    discard = False
+    # ID de la consulta, momento de inicio y número de filas entregadas
+    query_id = new_query_id()
+    start = time.perf_counter()
+    total = 0
+    # Iniciar bloque try
+    try:
+        # Ejecutar la consulta en un hilo de base de datos
+        cursor = await executor.run(_open_cursor, pooled.conn, sql_template, params)
+        # Terminar si la consulta no devolvió columnas
+        if not cursor.description:
+            return
+        # Obtener nombres de columnas y columnas a convertir
+        columns = [column[0] for column in cursor.description]
+        convert = _columns_to_convert(cursor)
+        # Leer y entregar las filas por bloques
+        while True:
+            # Leer el siguiente bloque en un hilo de base de datos
+            rows = await executor.run(cursor.fetchmany, chunk_size)
+            # Terminar cuando no queden filas
+            if not rows:
+                break
+            # Contar las filas entregadas
+            total += len(rows)
+            # Entregar el bloque convertido a diccionarios
+            yield [dict(zip(columns, _native_row(row, convert))) for row in rows]
+        # Registrar la consulta transmitida con su duración total y número de filas
+        log_query(query_id, "stream", sql_template, len(params or ()), time.perf_counter() - start, total)
+    # Manejo de errores de pyodbc
+    except pyodbc.Error as e:
+        # Registrar error de pyodbc
+        log_query_error(query_id, "stream", sql_template, time.perf_counter() - start, e)
+        # Descartar la conexión porque pudo quedar con resultados pendientes
+        discard = True
+        # Relanzar excepción con mensaje personalizado
+        raise Exception(f"Error ejecutando consulta: {str(e)}") from e
+    # Asegurar el cierre de cursor y la devolución de la conexión
+    finally:
+        # Proteger la limpieza de la cancelación (por ejemplo, si el cliente se desconecta a mitad de la respuesta)
+        with anyio.CancelScope(shield=True):
+            # Cerrar el cursor y devolver la conexión en un hilo de base de datos (el rollback es bloqueante)
+            try:
+                await executor.run(_close_stream, pooled, cursor, discard)
+            # Liberar el lugar de la transmisión
+            finally:
+                slots.release()
+
+# Función que cierra el cursor de una consulta transmitida y devuelve su conexión al pool
+# (se ejecuta dentro de un hilo de base de datos)
+def _close_stream(pooled: PooledConnection, cursor, discard: bool):
+    # Cerrar el cursor (puede cancelar filas pendientes)
+    if cursor:
+        # Intentar cerrar el cursor
+        try:
             cursor.close()
-        # Cerrar conexión
+        # Descartar la conexión si el cursor no se pudo cerrar
+        except pyodbc.Error as e:
+            # Registrar el error
+            logger.warning(f"Error al cerrar el cursor de una consulta transmitida: {e}")
+            discard = True
+    # Devolver la conexión al pool
+    release_db_connection(pooled, discard=discard)
+
+# Función que abre un cursor y ejecuta la consulta (se ejecuta dentro de un hilo de base de datos)
+def _open_cursor(conn, sql_template, params=None):
+    # Obtener cursor
+    cursor = conn.cursor()
+    # Ejecutar la consulta con o sin parámetros
+    if params:
+        cursor.execute(sql_template, params)
+    else:
+        cursor.execute(sql_template)
+    # Devolver el cursor listo para leer
+    return cursor
+
+# Función para insertar muchas filas en una sola transacción y devolver sus IDs en el orden de entrada
+# Las filas se cargan con fast_executemany en una tabla temporal y se pasan a la tabla destino con un
+# MERGE que devuelve el ID generado junto con la posición original de cada fila.
+async def execute_bulk_insert(table: str, columns: list[str], rows: list[list]) -> list[int]:
+    # Ejecutar la inserción completa en un hilo de base de datos
+    return await run_in_db_executor(_execute_bulk_insert_sync, table, columns, rows)
+
+# Función que ejecuta la inserción masiva de forma bloqueante (se ejecuta dentro de un hilo de base de datos)
+def _execute_bulk_insert_sync(table: str, columns: list[str], rows: list[list]) -> list[int]:
+    # Nada que insertar
+    if not rows:
+        return []
+    # Preparar las listas de columnas
+    column_list = ", ".join(f"[{c}]" for c in columns)
+    source_list = ", ".join(f"s.[{c}]" for c in columns)
+    placeholders = ",".join("?" for _ in range(len(columns) + 1))
+    # Inicializar variables
+    pooled = None
+    conn = None
+    cursor = None
+    # Indica si la conexión debe descartarse en lugar de devolverse al pool
+    discard = False
+    # ID de la operación y momento de inicio
+    query_id = new_query_id()
+    start = time.perf_counter()
+    # Iniciar bloque try
+    try:
+        # Obtener conexión del pool y cursor
+        pooled = _acquire_connection()
+        conn = pooled.conn
+        cursor = conn.cursor()
+        # Crear la tabla temporal con las mismas columnas que la tabla destino
+        cursor.execute(f"drop table if exists #bulk_rows; select top 0 {column_list} into #bulk_rows from {table};")
+        # Agregar la columna con la posición original de cada fila
+        cursor.execute("alter table #bulk_rows add [bulk_ord] int not null;")
+        # Cargar las filas en la tabla temporal en un solo envío
+        cursor.fast_executemany = True
+        cursor.executemany(
+            f"insert into #bulk_rows ({column_list}, [bulk_ord]) values ({placeholders})",
+            [list(row) + [position] for position, row in enumerate(rows)]
+        )
+        cursor.fast_executemany = False
+        # Pasar las filas a la tabla destino devolviendo la posición y el ID generado
+        merge_script = f"""
+            merge into {table} as t
+            using #bulk_rows as s on 1 = 0
+            when not matched then insert ({column_list}) values ({source_list})
+            output s.[bulk_ord], inserted.[id];
+        """
+        cursor.execute(merge_script)
+        # Ordenar los IDs según la posición original
+        ids = [row[1] for row in sorted(cursor.fetchall(), key=lambda row: row[0])]
+        # Eliminar la tabla temporal
+        cursor.execute("drop table #bulk_rows;")
+        # Confirmar la transacción
+        conn.commit()
+        # Registrar la tabla destino como modificada (versiones y caché de resultados)
+        _tables_changed(tables_written(merge_script))
+        # Registrar la inserción masiva con su duración y número de filas
+        log_query(query_id, "bulk", f"bulk insert into {table}", len(columns), time.perf_counter() - start, len(ids))
+        # Devolver los IDs en el orden de entrada
+        return ids
+    # Manejo de errores de pyodbc
+    except pyodbc.Error as e:
+        # Registrar error de pyodbc
+        log_query_error(query_id, "bulk", f"bulk insert into {table}", time.perf_counter() - start, e)
+        # Deshacer la transacción (también elimina la tabla temporal creada en ella)
         if conn:
-            # Cerrar conexión
-            conn.close()
-            # Registrar cierre de conexión
-            logger.info("Conexión cerrada.")
\ No newline at end of file
+            # Intentar hacer rollback
+            try:
+                conn.rollback()
+            # Manejo de errores durante el rollback
+            except pyodbc.Error as rb_e:
+                # Registrar error durante el rollback
+                logger.error(f"Error durante el rollback: {rb_e}", extra={"query_id": query_id})
+                # Descartar la conexión porque quedó en un estado inválido
+                discard = True
+        # Relanzar excepción con mensaje personalizado
+        raise Exception(f"Error en la inserción masiva: {str(e)}") from e
+    # Asegurar el cierre de cursor y la devolución de la conexión
+    finally:
+        # Cerrar cursor
+        if cursor:
+            cursor.close()
+        # Devolver la conexión al pool
+        if pooled:
+            release_db_connection(pooled, discard=discard)
@@ -0,0 +1,65 @@
+# Módulo para las peticiones condicionales (ETag / If-None-Match).
+# El ETag de una respuesta se calcula a partir de la versión de las tablas de las que depende y de la
+# petición (ruta, parámetros y formato), sin consultar la base de datos ni serializar el contenido.
+# Se controla con ETAG_ENABLED. Por defecto solo se usa con CACHE_BACKEND=shared: con versiones locales y varios
+# workers, uno que no atendió una escritura seguiría respondiendo 304 con un ETag anterior. Con un único worker
+# (uvicorn sin --workers, como en la imagen Docker) las versiones locales son exactas y ETAG_ENABLED=true es seguro.
+# Las versiones solo cuentan las escrituras hechas por esta API; otra aplicación que escriba en las mismas tablas
+# debe desactivar el backend compartido o incrementar las versiones por su cuenta.
+# Importar librerías necesarias
+# Librerías para hashes, entorno y respuestas de FastAPI
+import hashlib
+import os
+from fastapi import Request, Response, status
+from utlis.versions import versions_id, table_versions, shared_versions
+
+# Responder peticiones condicionales: ETAG_ENABLED=true/false; sin definir, solo si las versiones de las tablas
+# son compartidas por todos los workers
+etag_enabled: str = os.getenv("ETAG_ENABLED", "").lower()
+conditional_requests: bool = etag_enabled in ("1", "true", "yes") if etag_enabled else shared_versions
+
+# Calcular el ETag fuerte de una petición que depende de las tablas indicadas
+def make_etag(request: Request, tables: tuple[str, ...]) -> str:
+    # Datos que identifican el contenido de la respuesta
+    key = "|".join((
+        versions_id(),
+        ",".join(f"{table}:{version}" for table, version in zip(tables, table_versions(*tables))),
+        request.url.path,
+        str(request.query_params),
+        request.headers.get("accept", "")
+    ))
+    # Devolver el hash entre comillas
+    return '"' + hashlib.sha1(key.encode("utf-8")).hexdigest() + '"'
+
+# Verificar si el cliente ya tiene la versión actual
+def _etag_matches(request: Request, etag: str) -> bool:
+    # Leer la cabecera If-None-Match
+    header = request.headers.get("if-none-match")
+    # No hay cabecera
+    if not header:
+        return False
+    # Comparar contra cada ETag enviado (ignorando el prefijo de ETag débil)
+    return any(tag.strip() in ("*", etag) or tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+# Preparar una respuesta condicional
+# Devuelve una respuesta 304 si el cliente ya tiene la versión actual; si no, agrega el ETag a la respuesta.
+def not_modified(request: Request, response: Response, *tables: str) -> Response | None:
+    # Responder siempre completo si las peticiones condicionales están desactivadas
+    if not conditional_requests:
+        return None
+    # Calcular el ETag antes de consultar (una escritura concurrente solo puede invalidarlo, nunca volverlo obsoleto)
+    etag = make_etag(request, tables)
+    # Responder 304 sin consultar ni serializar
+    if _etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    # Agregar el ETag a la respuesta
+    response.headers["ETag"] = etag
+    return None
+
+# Copiar el ETag a un resultado que ya es una respuesta (por ejemplo, una respuesta transmitida)
+def with_etag(result, response: Response):
+    # Copiar la cabecera si el resultado es una respuesta propia
+    if isinstance(result, Response) and "ETag" in response.headers:
+        result.headers["ETag"] = response.headers["ETag"]
+    # Devolver el resultado
+    return result
@@ -0,0 +1,105 @@
+# Módulo para ejecutar las llamadas bloqueantes del driver fuera del event loop.
+# Usa un pool de hilos dedicado y acotado, y registra la profundidad de la cola y el tiempo de espera.
+# Importar librerías necesarias
+# Librerías para asincronía, hilos, logging y medición de tiempos
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import logging
+import threading
+import time
+
+# Configurar el logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Pool de hilos acotado para el trabajo de base de datos
+class DBExecutor:
+    # Inicializar el pool de hilos
+    def __init__(self, max_workers: int, name: str = "db"):
+        # Validar el número de hilos
+        if max_workers < 1:
+            # Lanzar error si la configuración es inválida
+            raise ValueError(f"Número de hilos inválido: {max_workers}")
+        # Guardar la configuración
+        self.max_workers = max_workers
+        self.name = name
+        # Crear el pool de hilos
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        # Bloqueo para los contadores
+        self._lock = threading.Lock()
+        # Tareas esperando un hilo libre (una marca por tarea, así una tarea cancelada en la cola se descuenta una sola vez)
+        self._queued: set = set()
+        # Tareas ejecutándose
+        self._active = 0
+        # Contadores para las estadísticas
+        self._submitted = 0
+        self._completed = 0
+        self._queue_depth_max = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    # Ejecutar una función bloqueante en el pool de hilos y esperar su resultado
+    async def run(self, fn, *args, **kwargs):
+        # Marca de la tarea en la cola
+        token = object()
+        # Registrar la tarea en la cola
+        with self._lock:
+            self._submitted += 1
+            self._queued.add(token)
+            self._queue_depth_max = max(self._queue_depth_max, len(self._queued))
+        # Enviar la tarea al pool de hilos
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self._executor,
+                functools.partial(self._call, token, time.monotonic(), fn, args, kwargs)
+            )
+        # Quitar la tarea de la cola si se canceló antes de llegar a un hilo
+        finally:
+            with self._lock:
+                self._queued.discard(token)
+
+    # Ejecutar la tarea dentro del hilo registrando su tiempo de espera
+    def _call(self, token, submitted_at: float, fn, args, kwargs):
+        # Calcular el tiempo que la tarea esperó en la cola
+        waited = time.monotonic() - submitted_at
+        # Pasar la tarea de la cola a ejecución
+        with self._lock:
+            self._queued.discard(token)
+            self._active += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+        # Ejecutar la función
+        try:
+            return fn(*args, **kwargs)
+        # Registrar la finalización de la tarea
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+
+    # Detener el pool de hilos
+    def shutdown(self):
+        # Esperar a que terminen las tareas en curso
+        self._executor.shutdown(wait=True)
+        # Registrar el cierre
+        logger.info(f"Pool de hilos de base de datos detenido ({self.name}).")
+
+    # Obtener las estadísticas del pool de hilos
+    def stats(self) -> dict:
+        # Leer los contadores de forma consistente
+        with self._lock:
+            # Número de tareas que ya empezaron a ejecutarse
+            started = self._completed + self._active
+            # Devolver las estadísticas
+            return {
+                "max_workers": self.max_workers,
+                "queued": len(self._queued),
+                "active": self._active,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "queue_depth_max": self._queue_depth_max,
+                "wait_time_total_ms": round(self._wait_time_total * 1000, 3),
+                "wait_time_avg_ms": round(self._wait_time_total * 1000 / started, 3) if started else 0.0,
+                "wait_time_max_ms": round(self._wait_time_max * 1000, 3)
+            }
@@ -0,0 +1,147 @@
+# Módulo para expandir relaciones anidadas en las respuestas (?expand=).
+# Cada nivel de la expansión se resuelve con una sola consulta por lotes (where ... in (...)) para todas las
+# filas del nivel anterior, en lugar de una consulta por fila.
+# Importar librerías necesarias
+# Librerías para asincronía, JSON, entorno, caché de funciones y excepciones HTTP
+import asyncio
+import json
+import os
+from functools import lru_cache
+from fastapi import HTTPException
+from utlis.database import execute_query_rows
+
+# Número máximo de valores por consulta IN (SQL Server admite hasta 2100 parámetros)
+in_max_params: int = int(os.getenv("SQL_IN_MAX_PARAMS", "1000"))
+# A partir de este número de valores la lista se envía como un solo parámetro JSON (openjson)
+in_json_threshold: int = int(os.getenv("SQL_IN_JSON_THRESHOLD", "200"))
+# Profundidad máxima de una expansión (por ejemplo, dishes.ingredients.provider tiene profundidad 3)
+expand_max_depth: int = int(os.getenv("EXPAND_MAX_DEPTH", "4"))
+
+# Relación expandible de una entidad hacia otra
+class Relation:
+    # Inicializar la relación
+    # template es una sentencia con {values} en el lugar de la lista IN; local es la columna de la fila origen y
+    # remote la columna de las filas relacionadas que se compara con ella; many indica si se devuelve una lista.
+    def __init__(self, entity: str, template: str, local: str, remote: str, many: bool, tables: tuple[str, ...]):
+        # Entidad relacionada (para expandir sus propias relaciones)
+        self.entity = entity
+        # Sentencia de las filas relacionadas
+        self.template = template
+        # Columnas que unen las dos entidades
+        self.local = local
+        self.remote = remote
+        # Relación a muchos (lista) o a uno (objeto o None)
+        self.many = many
+        # Tablas de las que dependen las filas relacionadas (para el ETag)
+        self.tables = tables
+
+# Obtener la sentencia IN con un número fijo de marcadores (se genera una sola vez por tamaño)
+@lru_cache(maxsize=256)
+def _in_sql(template: str, count: int) -> str:
+    # Reemplazar la lista por los marcadores
+    return template.replace("{values}", ",".join("?" for _ in range(count)))
+
+# Obtener la sentencia que lee la lista de valores de un solo parámetro JSON (para listas largas)
+@lru_cache(maxsize=64)
+def _in_json_sql(template: str) -> str:
+    # Reemplazar la lista por la lectura del arreglo JSON
+    return template.replace("{values}", "select [value] from openjson(?)")
+
+# Redondear el número de valores a la siguiente potencia de dos (limita las sentencias distintas en la base de datos)
+def _in_size(count: int) -> int:
+    # Potencia de dos mayor o igual, sin superar el máximo
+    return min(1 << (count - 1).bit_length(), in_max_params)
+
+# Función para leer las filas cuya columna está en una lista de valores
+# Una lista corta se envía como parámetros de la lista IN (en lotes de in_max_params); una lista de más de
+# in_json_threshold valores se envía como un solo arreglo JSON que SQL Server lee con openjson.
+async def select_in(template: str, values: list) -> list[dict]:
+    # Lista larga: un solo parámetro JSON
+    if len(values) > in_json_threshold:
+        return await execute_query_rows(_in_json_sql(template), params=[json.dumps(list(values))], cache_result=True)
+    # Filas leídas
+    rows = []
+    # Consultar cada lote
+    for start in range(0, len(values), in_max_params):
+        chunk = list(values[start:start + in_max_params])
+        # Completar el lote repitiendo el último valor hasta el tamaño redondeado
+        size = _in_size(len(chunk))
+        chunk.extend([chunk[-1]] * (size - len(chunk)))
+        # Ejecutar la consulta del lote (desde la caché de resultados mientras las tablas no cambien)
+        rows.extend(await execute_query_rows(_in_sql(template, size), params=chunk, cache_result=True))
+    # Devolver las filas
+    return rows
+
+# Función para convertir el parámetro expand ("dishes.ingredients.provider,...") en un árbol de relaciones
+# Lanza un error HTTP 400 si alguna relación no existe o se supera la profundidad máxima.
+def parse_expand(relations: dict, entity: str, expand: str | None) -> dict:
+    # Árbol de relaciones pedidas
+    tree: dict = {}
+    # Nada que expandir
+    if not expand:
+        return tree
+    # Recorrer cada ruta pedida
+    for path in expand.split(","):
+        names = [name.strip() for name in path.split(".") if name.strip()]
+        # Verificar la profundidad
+        if len(names) > expand_max_depth:
+            raise HTTPException(status_code=400, detail=f"La expansión '{path}' supera la profundidad máxima de {expand_max_depth}")
+        # Agregar cada nivel verificando que la relación exista
+        node, current = tree, entity
+        for name in names:
+            relation = relations.get(current, {}).get(name)
+            if relation is None:
+                allowed = ", ".join(relations.get(current, {})) or "ninguna"
+                raise HTTPException(status_code=400, detail=f"Relación '{name}' no válida para {current} (permitidas: {allowed})")
+            node = node.setdefault(name, {})
+            current = relation.entity
+    # Devolver el árbol
+    return tree
+
+# Función para obtener las tablas de las que depende una expansión
+def expand_tables(relations: dict, entity: str, tree: dict) -> tuple[str, ...]:
+    # Tablas sin repetir
+    tables: dict = {}
+    # Agregar las tablas de cada relación y de sus relaciones anidadas
+    for name, subtree in tree.items():
+        relation = relations[entity][name]
+        tables.update(dict.fromkeys(relation.tables))
+        tables.update(dict.fromkeys(expand_tables(relations, relation.entity, subtree)))
+    # Devolver las tablas
+    return tuple(tables)
+
+# Función para agregar a las filas las relaciones pedidas
+# Devuelve copias de las filas (las filas recibidas pueden venir de una caché y no se modifican); las posiciones
+# sin fila (None) se mantienen.
+async def expand_rows(relations: dict, entity: str, rows: list[dict | None], tree: dict) -> list[dict | None]:
+    # Copiar las filas
+    rows = [dict(row) if row is not None else None for row in rows]
+    # Nada que expandir
+    if not tree or not rows:
+        return rows
+
+    # Cargar una relación para todas las filas
+    async def load(name: str, subtree: dict):
+        relation = relations[entity][name]
+        # Valores de la columna local sin repetir
+        values = list(dict.fromkeys(row[relation.local] for row in rows if row and row.get(relation.local) is not None))
+        # Leer las filas relacionadas en lotes y expandir sus propias relaciones
+        related = await select_in(relation.template, values) if values else []
+        related = await expand_rows(relations, relation.entity, related, subtree)
+        # Ordenar por ID para devolver siempre el mismo orden
+        related.sort(key=lambda row: row["id"])
+        # Agrupar las filas relacionadas por la columna remota
+        groups: dict = {}
+        for row in related:
+            groups.setdefault(row[relation.remote], []).append(row)
+        # Agregar la relación a cada fila
+        for row in rows:
+            if row is None:
+                continue
+            group = groups.get(row.get(relation.local), [])
+            row[name] = group if relation.many else (group[0] if group else None)
+
+    # Cargar las relaciones del mismo nivel a la vez
+    await asyncio.gather(*(load(name, subtree) for name, subtree in tree.items()))
+    # Devolver las filas expandidas
+    return rows
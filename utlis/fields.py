@@ -0,0 +1,58 @@
+# Módulo para las respuestas con un subconjunto de campos (?fields=).
+# Los campos pedidos se verifican contra los del modelo, se usan para reducir las columnas de la consulta y
+# para recortar la respuesta.
+# Importar librerías necesarias
+# Librerías para excepciones y respuestas HTTP
+from fastapi import HTTPException, Response
+
+# Función para convertir el parámetro fields ("id,name") en una tupla de campos del modelo (None si no se envió)
+# Lanza un error HTTP 400 si algún campo no existe en el modelo.
+def parse_fields(model, fields: str | None) -> tuple[str, ...] | None:
+    # Se piden todos los campos
+    if not fields:
+        return None
+    # Campos pedidos sin repetir
+    names = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    # Verificar que cada campo exista en el modelo
+    unknown = [name for name in names if name not in model.model_fields]
+    if unknown or not names:
+        # Lanzar una excepción HTTP 400 indicando los campos permitidos
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos no válidos: {', '.join(unknown) or fields} (permitidos: {', '.join(model.model_fields)})"
+        )
+    # Devolver los campos
+    return names
+
+# Función para agregar a los campos pedidos las columnas que se necesitan para responder (clave, orden, relaciones)
+def select_fields(fields: tuple[str, ...] | None, *required: str) -> tuple[str, ...] | None:
+    # Se leen todas las columnas
+    if fields is None:
+        return None
+    # Agregar las columnas necesarias que falten
+    return tuple(dict.fromkeys((*fields, *required)))
+
+# Recortar una fila a los campos indicados
+def _pick(row: dict | None, fields: tuple[str, ...]) -> dict | None:
+    # Mantener las posiciones sin fila
+    if row is None:
+        return None
+    # Copiar solo los campos indicados
+    return {name: row[name] for name in fields if name in row}
+
+# Función para recortar un resultado (una fila, una lista de filas o un documento con items) a los campos pedidos
+# y a las relaciones expandidas indicadas en extra.
+def pick_fields(result, fields: tuple[str, ...] | None, *extra: str):
+    # Nada que recortar (las respuestas propias, como las transmitidas, se devuelven sin cambios)
+    if fields is None or isinstance(result, Response):
+        return result
+    # Campos que se devuelven
+    fields = (*fields, *extra)
+    # Recortar las filas de una página o de una lista de IDs
+    if isinstance(result, dict) and "items" in result:
+        return {**result, "items": [_pick(row, fields) for row in result["items"]]}
+    # Recortar una sola fila
+    if isinstance(result, dict):
+        return _pick(result, fields)
+    # Recortar una lista de filas
+    return [_pick(row, fields) for row in result]
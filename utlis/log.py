@@ -0,0 +1,252 @@
+# Módulo para la configuración del logging de la aplicación.
+# Los registros se encolan sin bloquear y un hilo aparte los formatea y escribe, de modo que el event loop
+# y los hilos de base de datos nunca esperan por la salida. Los registros de consultas son estructurados
+# (ID de consulta, duración y número de filas) y el detalle por consulta se muestrea o se deja en DEBUG.
+# Importar librerías necesarias
+# Librerías para logging, colas, JSON, entorno, azar y medición de tiempos
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+import copy
+import itertools
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+# Configuración del logging desde variables de entorno
+log_level: str = os.getenv("LOG_LEVEL", "INFO").upper()
+# Formato de salida: "json" (una línea JSON por registro) o "text"
+log_format: str = os.getenv("LOG_FORMAT", "json").lower()
+# Número máximo de registros en espera (los que no caben se descartan y se cuentan)
+log_queue_size: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fracción de consultas cuyo detalle se registra en INFO (el resto solo en DEBUG)
+query_sample_rate: float = float(os.getenv("LOG_QUERY_SAMPLE_RATE", "0.01"))
+# Duración a partir de la cual una consulta se registra siempre como lenta
+slow_query_ms: float = float(os.getenv("LOG_SLOW_QUERY_MS", "500"))
+
+# Logger de las consultas a la base de datos
+query_logger = logging.getLogger("kitchens.query")
+
+# Atributos propios de LogRecord (el resto son campos estructurados enviados con extra=)
+_RECORD_ATTRS = set(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {"message", "asctime", "taskName"}
+
+# Formateador usado para convertir las trazas a texto antes de encolar los registros
+_traceback_formatter = logging.Formatter()
+
+# Generador de IDs de consulta
+_query_ids = itertools.count(1)
+
+# Formateador que escribe cada registro como una línea JSON con sus campos estructurados
+class JsonFormatter(logging.Formatter):
+    # Formatear el registro
+    def format(self, record: logging.LogRecord) -> str:
+        # Campos básicos del registro
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        # Agregar los campos estructurados
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                data[key] = value
+        # Agregar la traza de la excepción (ya convertida a texto si el registro pasó por la cola)
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        # Agregar la pila pedida con stack_info=True
+        if record.stack_info:
+            data["stack"] = self.formatStack(record.stack_info)
+        # Serializar el registro
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+# Formateador de texto que agrega los campos estructurados al final del mensaje
+class TextFormatter(logging.Formatter):
+    # Inicializar con el formato tradicional de la aplicación
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    # Formatear el registro
+    def format(self, record: logging.LogRecord) -> str:
+        # Formatear el mensaje base
+        text = super().format(record)
+        # Campos estructurados del registro
+        fields = " ".join(f"{k}={v}" for k, v in record.__dict__.items() if k not in _RECORD_ATTRS)
+        # Devolver el mensaje con sus campos
+        return f"{text} {fields}" if fields else text
+
+# Manejador que encola los registros sin bloquear y mide su propio costo
+class _StatsQueueHandler(QueueHandler):
+    # Inicializar el manejador y sus contadores
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        # Bloqueo para los contadores
+        self._lock = threading.Lock()
+        # Contadores para las estadísticas
+        self.enqueued = 0
+        self.dropped = 0
+        self.enqueue_time_total = 0.0
+
+    # Preparar una copia del registro para la cola
+    # La implementación base mezcla la traza y la pila con el mensaje; aquí se conservan en sus propios campos
+    # y solo la excepción se convierte a texto, porque sus objetos no deben pasar al hilo que escribe.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Copiar el registro para no modificar el que ven otros manejadores
+        record = copy.copy(record)
+        # Unir el mensaje con sus argumentos
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        # Convertir la traza de la excepción a texto
+        if record.exc_info:
+            record.exc_text = record.exc_text or _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        # Devolver el registro listo para la cola
+        return record
+
+    # Encolar el registro midiendo el tiempo usado en el hilo que registra
+    def emit(self, record: logging.LogRecord):
+        # Marcar el inicio
+        start = time.perf_counter()
+        # Preparar y encolar el registro sin esperar
+        try:
+            self.queue.put_nowait(self.prepare(record))
+            dropped = 0
+        # Descartar el registro si la cola está llena
+        except queue.Full:
+            dropped = 1
+        # Registrar el costo de la operación
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.enqueued += 1 - dropped
+            self.dropped += dropped
+            self.enqueue_time_total += elapsed
+
+    # Obtener las estadísticas del manejador
+    def stats(self) -> dict:
+        # Leer los contadores de forma consistente
+        with self._lock:
+            # Número de registros procesados
+            handled = self.enqueued + self.dropped
+            # Devolver las estadísticas
+            return {
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "pending": self.queue.qsize(),
+                "enqueue_time_total_ms": round(self.enqueue_time_total * 1000, 3),
+                "enqueue_time_avg_us": round(self.enqueue_time_total * 1_000_000 / handled, 3) if handled else 0.0
+            }
+
+# Manejador de la cola instalado en el logger raíz
+_handler: _StatsQueueHandler | None = None
+# Hilo que escribe los registros encolados
+_listener: QueueListener | None = None
+# Bloqueo y contadores de las consultas registradas
+_query_lock = threading.Lock()
+_query_stats = {"queries": 0, "sampled": 0, "slow": 0, "errors": 0}
+
+# Función para configurar el logging de la aplicación (se llama al iniciar la aplicación)
+def setup_logging():
+    global _handler, _listener
+    # Configurar solo una vez
+    if _handler is not None:
+        return
+    # Manejador que escribe en la salida estándar desde el hilo del listener
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+    # Cola acotada entre quien registra y el hilo que escribe
+    log_queue = queue.Queue(maxsize=log_queue_size)
+    _handler = _StatsQueueHandler(log_queue)
+    # Iniciar el hilo que escribe los registros
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    # Instalar el manejador de la cola en el logger raíz
+    root = logging.getLogger()
+    root.setLevel(log_level)
+    root.addHandler(_handler)
+
+# Función para detener el logging (se llama al detener la aplicación; escribe los registros pendientes)
+def shutdown_logging():
+    global _handler, _listener
+    # Detener solo si fue configurado
+    if _handler is None:
+        return
+    # Quitar el manejador del logger raíz
+    logging.getLogger().removeHandler(_handler)
+    # Esperar a que se escriban los registros pendientes
+    _listener.stop()
+    _handler = None
+    _listener = None
+
+# Función para obtener un ID nuevo de consulta
+def new_query_id() -> int:
+    # Devolver el siguiente ID
+    return next(_query_ids)
+
+# Función para registrar una consulta ejecutada
+# Las consultas lentas se registran siempre en WARNING; el resto se registra en DEBUG o, si fue muestreada, en INFO.
+def log_query(query_id: int, kind: str, sql_template: str, params_count: int, duration: float, rows: int | None):
+    # Duración en milisegundos
+    duration_ms = round(duration * 1000, 3)
+    # Clasificar la consulta
+    slow = duration_ms >= slow_query_ms
+    sampled = not slow and random.random() < query_sample_rate
+    # Contar la consulta
+    with _query_lock:
+        _query_stats["queries"] += 1
+        _query_stats["sampled"] += sampled
+        _query_stats["slow"] += slow
+    # Elegir el nivel del registro
+    level = logging.WARNING if slow else logging.INFO if sampled else logging.DEBUG
+    # Terminar sin armar el registro si el nivel no está habilitado
+    if not query_logger.isEnabledFor(level):
+        return
+    # Registrar la consulta con sus campos estructurados
+    query_logger.log(
+        level,
+        "Consulta lenta" if slow else "Consulta ejecutada",
+        extra={
+            "query_id": query_id,
+            "kind": kind,
+            "duration_ms": duration_ms,
+            "rows": rows,
+            "params": params_count,
+            "sql": " ".join(sql_template.split())
+        }
+    )
+
+# Función para registrar una consulta que falló (siempre se registra)
+def log_query_error(query_id: int, kind: str, sql_template: str, duration: float, error: Exception):
+    # Contar el error
+    with _query_lock:
+        _query_stats["errors"] += 1
+    # Registrar el error con sus campos estructurados
+    query_logger.error(
+        "Error ejecutando la consulta",
+        extra={
+            "query_id": query_id,
+            "kind": kind,
+            "duration_ms": round(duration * 1000, 3),
+            "error": str(error),
+            "sql": " ".join(sql_template.split())
+        }
+    )
+
+# Función para obtener las estadísticas del logging
+def get_logging_stats() -> dict:
+    # Leer los contadores de las consultas
+    with _query_lock:
+        queries = dict(_query_stats)
+    # Devolver las estadísticas de la cola y de las consultas registradas
+    return {
+        "level": logging.getLevelName(logging.getLogger().level),
+        "query_sample_rate": query_sample_rate,
+        "slow_query_ms": slow_query_ms,
+        "queue": _handler.stats() if _handler is not None else None,
+        **queries
+    }
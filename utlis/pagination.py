@@ -0,0 +1,96 @@
+# Módulo para la paginación por clave (keyset) de los listados.
+# Codifica y decodifica los cursores opacos y arma la respuesta de cada página.
+# Importar librerías necesarias
+# Librerías para codificación, JSON, entorno y excepciones HTTP
+import base64
+import binascii
+import json
+import os
+from fastapi import HTTPException
+
+# Tamaño de página por defecto cuando solo se envía el cursor
+default_page_size: int = int(os.getenv("PAGE_DEFAULT_LIMIT", "100"))
+# Tamaño máximo de página permitido
+max_page_size: int = int(os.getenv("PAGE_MAX_LIMIT", "1000"))
+# Valor de clave anterior a cualquier ID (primera página)
+FIRST_KEY: int = -2147483648
+
+# Codificar la posición de la última fila devuelta como un cursor opaco
+def encode_cursor(position: dict) -> str:
+    # Serializar la posición y codificarla en base64 apta para URL
+    raw = json.dumps(position, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+# Decodificar un cursor opaco a la posición de la última fila devuelta
+def decode_cursor(cursor: str) -> dict:
+    # Intentar decodificar el cursor
+    try:
+        # Restaurar el relleno de base64 y decodificar
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+    # Manejo de cursores mal formados
+    except (binascii.Error, ValueError) as e:
+        # Lanzar una excepción HTTP 400 indicando que el cursor es inválido
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido") from e
+    # Verificar que el cursor tenga la forma esperada
+    if not isinstance(position, dict):
+        # Lanzar una excepción HTTP 400 indicando que el cursor es inválido
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+    # Devolver la posición
+    return position
+
+# Obtener el límite de página efectivo (None si no se pidió paginar)
+def page_limit(limit: int | None, cursor: str | None) -> int | None:
+    # No paginar si no se envió límite ni cursor
+    if limit is None and cursor is None:
+        return None
+    # Usar el límite pedido o el de por defecto, sin superar el máximo
+    return min(limit or default_page_size, max_page_size)
+
+# Obtener el último ID devuelto a partir del cursor (FIRST_KEY en la primera página)
+def cursor_key(cursor: str | None, key: str = "id") -> int:
+    # Primera página
+    if not cursor:
+        return FIRST_KEY
+    # Leer la clave del cursor
+    value = decode_cursor(cursor).get(key)
+    # Verificar que la clave sea un entero
+    if not isinstance(value, int):
+        # Lanzar una excepción HTTP 400 indicando que el cursor es inválido
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+    # Devolver la clave
+    return value
+
+# Obtener la posición (valor de la columna de orden, ID) de la última fila devuelta (None en la primera página)
+def cursor_after(cursor: str | None, column: str, key: str = "id") -> tuple | None:
+    # Primera página
+    if not cursor:
+        return None
+    # Leer la posición del cursor
+    position = decode_cursor(cursor)
+    value = position.get(key)
+    # Verificar que el cursor tenga la clave y el valor de la columna de orden (otro orden invalida el cursor)
+    if not isinstance(value, int) or column not in position or not isinstance(position[column], (str, int, float, type(None))):
+        # Lanzar una excepción HTTP 400 indicando que el cursor es inválido
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+    # Devolver la posición
+    return position[column], value
+
+# Armar la respuesta de una página a partir de limit + 1 filas leídas
+# Si se indica la columna de orden, su valor se guarda en el cursor junto con la clave.
+def page_response(rows: list[dict], limit: int, key: str = "id", column: str | None = None) -> dict:
+    # Verificar si hay más filas después de esta página
+    has_more = len(rows) > limit
+    # Recortar la fila extra usada para detectar la página siguiente
+    items = rows[:limit]
+    # Posición de la última fila devuelta (clave y, si se indicó, valor de la columna de orden)
+    position = None
+    if has_more:
+        position = {key: items[-1][key]}
+        if column:
+            position[column] = items[-1][column]
+    # Devolver las filas y el cursor de la página siguiente
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(position) if position else None
+    }
@@ -0,0 +1,356 @@
+# Módulo para el pool de conexiones a la base de datos.
+# Mantiene conexiones pyodbc reutilizables con tamaño mínimo y máximo, verificación de salud al obtenerlas
+# y reciclaje por tiempo de inactividad y por tiempo de vida.
+# Importar librerías necesarias
+# Librerías para base de datos, logging, hilos y medición de tiempos
+from collections import deque
+import logging
+import threading
+import time
+import pyodbc
+
+# Configurar el logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Excepción lanzada cuando no se obtiene una conexión dentro del tiempo de espera
+class PoolTimeoutError(Exception):
+    pass
+
+# Excepción lanzada cuando se usa un pool que ya fue cerrado
+class PoolClosedError(Exception):
+    pass
+
+# Verificar si un error del driver indica que la conexión se cortó (SQLSTATE de clase 08)
+def is_disconnect(error: pyodbc.Error) -> bool:
+    # El primer argumento del error es el SQLSTATE
+    return bool(error.args) and str(error.args[0]).startswith("08")
+
+# Conexión administrada por el pool junto con sus marcas de tiempo
+class PooledConnection:
+    # Inicializar la conexión administrada
+    def __init__(self, conn):
+        # Conexión pyodbc subyacente
+        self.conn = conn
+        # Momento de creación (para el reciclaje por tiempo de vida)
+        self.created_at = time.monotonic()
+        # Momento del último uso (para el reciclaje por inactividad)
+        self.last_used = self.created_at
+        # Cursor reutilizable de la conexión
+        self._cursor = None
+
+    # Obtener el cursor reutilizable de la conexión
+    # pyodbc no vuelve a preparar la sentencia cuando el mismo cursor ejecuta el mismo texto SQL
+    def cursor(self):
+        # Crear el cursor la primera vez
+        if self._cursor is None:
+            self._cursor = self.conn.cursor()
+        # Devolver el cursor
+        return self._cursor
+
+    # Descartar el cursor reutilizable (por ejemplo, tras un error)
+    def reset_cursor(self):
+        # Cerrar el cursor si existe
+        if self._cursor is not None:
+            # Intentar cerrar el cursor
+            try:
+                self._cursor.close()
+            # Ignorar errores al cerrar
+            except pyodbc.Error:
+                pass
+            self._cursor = None
+
+# Pool de conexiones seguro para hilos
+class ConnectionPool:
+    # Inicializar el pool con su configuración
+    def __init__(
+        self,
+        connection_string: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        max_idle: float = 300,
+        max_lifetime: float = 1800,
+        acquire_timeout: float = 30,
+        connect_timeout: int = 5,
+        health_check_interval: float = 30
+    ):
+        # Validar los límites de tamaño
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            # Lanzar error si la configuración es inválida
+            raise ValueError(f"Tamaño de pool inválido: min={min_size}, max={max_size}")
+        # Guardar la configuración
+        self.connection_string = connection_string
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.acquire_timeout = acquire_timeout
+        self.connect_timeout = connect_timeout
+        self.health_check_interval = health_check_interval
+        # Conexiones libres (la más reciente al final)
+        self._idle: deque[PooledConnection] = deque()
+        # Número total de conexiones abiertas (libres + en uso)
+        self._size = 0
+        # Número de conexiones prestadas
+        self._in_use = 0
+        # Indicador de pool cerrado
+        self._closed = False
+        # Condición para esperar a que se libere una conexión
+        self._cond = threading.Condition()
+        # Contadores para las estadísticas
+        self._checkouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._failed_health_checks = 0
+        self._timeouts = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    # Abrir las conexiones mínimas del pool
+    def open(self):
+        # Crear las conexiones iniciales
+        for _ in range(self.min_size):
+            # Intentar crear una conexión
+            try:
+                # Crear la conexión y registrarla en el pool
+                pooled = PooledConnection(self._connect())
+            # Manejo de errores al crear la conexión inicial
+            except pyodbc.Error as e:
+                # Registrar el error sin impedir el arranque de la aplicación
+                logger.warning(f"No se pudo precrear una conexión del pool: {e}")
+                # Dejar de intentar crear más conexiones
+                break
+            # Agregar la conexión a las libres
+            with self._cond:
+                # Registrar la nueva conexión
+                self._size += 1
+                self._idle.append(pooled)
+        # Registrar la apertura del pool
+        logger.info(f"Pool de conexiones abierto ({self._size} conexiones, máximo {self.max_size}).")
+
+    # Obtener una conexión del pool
+    def acquire(self) -> PooledConnection:
+        # Marcar el inicio de la espera
+        start = time.monotonic()
+        # Calcular el límite de espera
+        deadline = start + self.acquire_timeout
+        # Repetir hasta obtener una conexión válida
+        while True:
+            # Conexión candidata
+            pooled = None
+            # Indica si se debe crear una conexión nueva
+            create = False
+            # Reservar una conexión libre o un lugar para crear una nueva
+            with self._cond:
+                # Esperar hasta que haya una conexión disponible
+                while True:
+                    # Verificar si el pool fue cerrado
+                    if self._closed:
+                        # Lanzar error de pool cerrado
+                        raise PoolClosedError("El pool de conexiones está cerrado")
+                    # Reutilizar la conexión libre más reciente
+                    if self._idle:
+                        # Tomar la conexión libre
+                        pooled = self._idle.pop()
+                        self._in_use += 1
+                        break
+                    # Crear una conexión nueva si no se alcanzó el máximo
+                    if self._size < self.max_size:
+                        # Reservar el lugar para la nueva conexión
+                        self._size += 1
+                        self._in_use += 1
+                        create = True
+                        break
+                    # Calcular el tiempo de espera restante
+                    remaining = deadline - time.monotonic()
+                    # Verificar si se agotó el tiempo de espera
+                    if remaining <= 0:
+                        # Contar el tiempo de espera agotado
+                        self._timeouts += 1
+                        # Lanzar error de tiempo agotado
+                        raise PoolTimeoutError(f"No hay conexiones disponibles tras {self.acquire_timeout} segundos")
+                    # Esperar a que se libere una conexión
+                    self._cond.wait(remaining)
+
+            # Crear la conexión nueva fuera del bloqueo
+            if create:
+                # Intentar conectar
+                try:
+                    # Crear la conexión administrada
+                    pooled = PooledConnection(self._connect())
+                # Liberar el lugar reservado si la conexión falla
+                except BaseException:
+                    # Devolver el lugar reservado
+                    with self._cond:
+                        self._size -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    # Relanzar la excepción
+                    raise
+            # Verificar que la conexión reutilizada siga siendo válida
+            elif not self._is_usable(pooled):
+                # Descartar la conexión y volver a intentar
+                self._discard(pooled)
+                continue
+
+            # Registrar las estadísticas de la obtención
+            waited = time.monotonic() - start
+            with self._cond:
+                self._checkouts += 1
+                self._wait_time_total += waited
+                self._wait_time_max = max(self._wait_time_max, waited)
+            # Devolver la conexión
+            return pooled
+
+    # Devolver una conexión al pool
+    def release(self, pooled: PooledConnection, discard: bool = False):
+        # Marcar el momento del último uso
+        pooled.last_used = time.monotonic()
+        # Deshacer la transacción implícita que dejan abierta las lecturas (autocommit desactivado)
+        if not discard and not self._closed:
+            # Intentar hacer rollback
+            try:
+                pooled.conn.rollback()
+            # Descartar la conexión si quedó en un estado inválido
+            except pyodbc.Error as e:
+                # Registrar el error
+                logger.warning(f"Conexión del pool descartada por rollback fallido: {e}")
+                discard = True
+        # Descartar la conexión si se pidió o si el pool está cerrado
+        if discard or self._closed:
+            # Cerrar la conexión y liberar su lugar
+            self._discard(pooled)
+            return
+        # Reciclar la conexión si superó su tiempo de vida
+        if pooled.last_used - pooled.created_at > self.max_lifetime:
+            # Contar la conexión reciclada
+            with self._cond:
+                self._recycled += 1
+            # Cerrar la conexión y liberar su lugar
+            self._discard(pooled)
+            return
+        # Conexiones inactivas que deben cerrarse
+        stale = []
+        # Devolver la conexión a las libres
+        with self._cond:
+            # Registrar la devolución
+            self._in_use -= 1
+            self._idle.append(pooled)
+            # Retirar las conexiones libres más antiguas que superaron el tiempo de inactividad
+            while self._idle and self._size - len(stale) > self.min_size and pooled.last_used - self._idle[0].last_used > self.max_idle:
+                # Sacar la conexión inactiva
+                stale.append(self._idle.popleft())
+            # Descontar las conexiones retiradas
+            self._size -= len(stale)
+            self._recycled += len(stale)
+            # Avisar a quien esté esperando una conexión
+            self._cond.notify()
+        # Cerrar las conexiones inactivas fuera del bloqueo
+        for old in stale:
+            # Cerrar la conexión
+            self._close_quietly(old)
+
+    # Cerrar todas las conexiones del pool
+    def close(self):
+        # Marcar el pool como cerrado y tomar las conexiones libres
+        with self._cond:
+            # Marcar como cerrado
+            self._closed = True
+            # Tomar las conexiones libres
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            # Despertar a quienes esperan para que reciban el error
+            self._cond.notify_all()
+        # Cerrar las conexiones libres
+        for pooled in idle:
+            # Cerrar la conexión
+            self._close_quietly(pooled)
+        # Registrar el cierre del pool
+        logger.info("Pool de conexiones cerrado.")
+
+    # Obtener las estadísticas del pool
+    def stats(self) -> dict:
+        # Leer los contadores de forma consistente
+        with self._cond:
+            # Devolver las estadísticas
+            return {
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "checkouts": self._checkouts,
+                "created": self._created,
+                "recycled": self._recycled,
+                "failed_health_checks": self._failed_health_checks,
+                "timeouts": self._timeouts,
+                "wait_time_total_ms": round(self._wait_time_total * 1000, 3),
+                "wait_time_avg_ms": round(self._wait_time_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                "wait_time_max_ms": round(self._wait_time_max * 1000, 3)
+            }
+
+    # Crear una conexión nueva a la base de datos
+    def _connect(self):
+        # Establecer la conexión
+        conn = pyodbc.connect(self.connection_string, timeout=self.connect_timeout)
+        # Contar la conexión creada
+        with self._cond:
+            self._created += 1
+        # Devolver la conexión
+        return conn
+
+    # Verificar si una conexión superó su tiempo de vida o de inactividad
+    def _expired(self, pooled: PooledConnection, now: float) -> bool:
+        # Comparar contra los límites configurados
+        return now - pooled.created_at > self.max_lifetime or now - pooled.last_used > self.max_idle
+
+    # Verificar si una conexión libre puede reutilizarse
+    def _is_usable(self, pooled: PooledConnection) -> bool:
+        # Obtener el momento actual
+        now = time.monotonic()
+        # Descartar conexiones vencidas
+        if self._expired(pooled, now):
+            # Contar la conexión reciclada
+            with self._cond:
+                self._recycled += 1
+            return False
+        # Omitir la verificación si la conexión se usó hace poco
+        if now - pooled.last_used < self.health_check_interval:
+            return True
+        # Verificar la conexión con una consulta mínima
+        try:
+            # Ejecutar la consulta de verificación
+            cursor = pooled.conn.cursor()
+            cursor.execute("select 1")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        # Manejo de errores de la verificación
+        except pyodbc.Error as e:
+            # Registrar la conexión inválida
+            logger.warning(f"Conexión del pool descartada por verificación fallida: {e}")
+            # Contar la verificación fallida
+            with self._cond:
+                self._failed_health_checks += 1
+            return False
+
+    # Cerrar una conexión prestada y liberar su lugar en el pool
+    def _discard(self, pooled: PooledConnection):
+        # Cerrar la conexión
+        self._close_quietly(pooled)
+        # Liberar el lugar
+        with self._cond:
+            self._size -= 1
+            self._in_use -= 1
+            self._cond.notify()
+
+    # Cerrar una conexión ignorando errores
+    @staticmethod
+    def _close_quietly(pooled: PooledConnection):
+        # Intentar cerrar la conexión
+        try:
+            pooled.conn.close()
+        # Ignorar errores al cerrar
+        except pyodbc.Error as e:
+            # Registrar el error
+            logger.warning(f"Error al cerrar una conexión del pool: {e}")
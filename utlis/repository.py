@@ -0,0 +1,289 @@
+# Módulo con el repositorio genérico de entidades.
+# Genera una sola vez las sentencias SQL de cada tabla a partir de su modelo Pydantic y las reutiliza en cada
+# petición; las sentencias UPDATE se generan y guardan una vez por cada conjunto de campos modificados.
+# Importar librerías necesarias
+# Librerías para modelos de datos
+from pydantic import BaseModel
+
+# Repositorios creados (para las estadísticas)
+_repositories: list["Repository"] = []
+# Operadores permitidos en los filtros de los listados
+FILTER_OPERATORS: tuple[str, ...] = ("=", ">=", "<=")
+
+# Repositorio de una tabla descrito por su modelo Pydantic
+class Repository:
+    # Inicializar el repositorio y generar sus sentencias fijas
+    def __init__(
+        self,
+        model: type[BaseModel],
+        table: str,
+        keys: tuple[str, ...] = ("id",),
+        columns: tuple[str, ...] | None = None,
+        identity: bool = True,
+        returning: str | None = None
+    ):
+        # Modelo y tabla de la entidad
+        self.model = model
+        self.table = table
+        # Columnas clave (la primera se usa para ordenar y paginar)
+        self.keys = tuple(keys)
+        self.key = self.keys[0]
+        # Columnas de la tabla (por defecto, los campos del modelo)
+        self.columns = tuple(columns or model.model_fields)
+        # Columnas que se envían al insertar (la clave autoincrementable la genera la base de datos)
+        self.insert_columns = tuple(c for c in self.columns if not (identity and c in self.keys))
+        # Columnas que se pueden actualizar
+        self.update_columns = tuple(c for c in self.columns if c not in self.keys)
+        # Consulta que devuelve la fila afectada cuando no basta con OUTPUT (por ejemplo, con joins)
+        self.returning = returning
+
+        # Partes comunes de las sentencias
+        select_list = "\n            ,".join(f"[{c}]" for c in self.columns)
+        self.output_list = "\n            ,".join(f"inserted.[{c}]" for c in self.columns)
+        self.where_keys = " and ".join(f"[{k}] = ?" for k in self.keys)
+        insert_list = ", ".join(f"[{c}]" for c in self.insert_columns)
+        placeholders = ",".join("?" for _ in self.insert_columns)
+
+        # Sentencia para insertar una fila y devolverla
+        if returning:
+            self.insert_sql = f"""
+        set nocount on;
+        insert into {table} ({insert_list})
+        values ({placeholders});
+        {returning}
+    """
+        else:
+            self.insert_sql = f"""
+        insert into {table} ({insert_list})
+        output {self.output_list}
+        values ({placeholders})
+    """
+        # Sentencia para obtener todas las filas
+        self.select_all_sql = f"""
+        select {select_list}
+        from {table}
+    """
+        # Sentencia para obtener una fila por su clave
+        self.select_one_sql = f"""
+        select {select_list}
+        from {table}
+        where {self.where_keys}
+    """
+        # Sentencia para obtener una página ordenada por la clave (paginación por clave)
+        self.select_page_sql = f"""
+        select top (?) {select_list}
+        from {table}
+        where [{self.key}] > ?
+        order by [{self.key}]
+    """
+        # Sentencia para eliminar una fila por su clave
+        self.delete_sql = f"""
+        delete from {table}
+        where {self.where_keys}
+    """
+        # Sentencias UPDATE generadas por conjunto de campos modificados
+        self._update_sql: dict[tuple[str, ...], str] = {}
+        # Sentencias SELECT generadas por forma de consulta (filtros, orden y página)
+        self._select_sql: dict[tuple, str] = {}
+        # Registrar el repositorio
+        _repositories.append(self)
+
+    # Obtener la sentencia UPDATE para un conjunto de campos (se genera una sola vez)
+    def update_sql(self, fields: tuple[str, ...]) -> str:
+        # Buscar la sentencia ya generada
+        sql = self._update_sql.get(fields)
+        # Generar y guardar la sentencia si es la primera vez
+        if sql is None:
+            # Parte SET de la sentencia
+            variables = ", ".join(f"[{f}] = ?" for f in fields)
+            # Sentencia seguida de la consulta que devuelve la fila actualizada
+            if self.returning:
+                sql = f"""
+        set nocount on;
+        update {self.table}
+        set {variables}
+        where {self.where_keys};
+        {self.returning}
+    """
+            # Sentencia que devuelve la fila actualizada con OUTPUT
+            else:
+                sql = f"""
+        update {self.table}
+        set {variables}
+        output {self.output_list}
+        where {self.where_keys}
+    """
+            # Guardar la sentencia
+            self._update_sql[fields] = sql
+        # Devolver la sentencia
+        return sql
+
+    # Obtener la sentencia SELECT para unos filtros, un orden, un tipo de página y unas columnas (se genera una sola vez)
+    # filters son pares (columna, operador); sort es una columna, con "-" delante para orden descendente;
+    # page es None (sin página), "first" (primera página), "after" o "after_null" (después de una fila cuyo
+    # valor de la columna de orden es o no es NULL); columns son las columnas a leer (None para todas).
+    def select_sql(
+        self,
+        filters: tuple[tuple[str, str], ...] = (),
+        sort: str | None = None,
+        page: str | None = None,
+        columns: tuple[str, ...] | None = None
+    ) -> str:
+        # Buscar la sentencia ya generada
+        shape = (filters, sort, page, columns)
+        sql = self._select_sql.get(shape)
+        # Generar y guardar la sentencia si es la primera vez
+        if sql is None:
+            # Columna y dirección del orden (por defecto, la clave ascendente)
+            column = (sort or self.key).removeprefix("-")
+            descending = bool(sort) and sort.startswith("-")
+            # Verificar las columnas y operadores (los nombres se escriben en la sentencia)
+            for name, operator in (*filters, (column, "="), *((c, "=") for c in columns or ())):
+                if name not in self.columns or operator not in FILTER_OPERATORS:
+                    raise ValueError(f"Filtro, orden o columna no permitida: {name} {operator}")
+            # Condiciones de los filtros
+            conditions = [f"[{name}] {operator} ?" for name, operator in filters]
+            # Condición para continuar después de la última fila de la página anterior
+            if page in ("after", "after_null"):
+                conditions.append(self._after_condition(column, descending, page == "after_null"))
+            # Partes de la sentencia
+            select_list = "\n            ,".join(f"[{c}]" for c in columns or self.columns)
+            top = "top (?) " if page else ""
+            where = f"\n        where {' and '.join(conditions)}" if conditions else ""
+            direction = " desc" if descending else ""
+            # Ordenar por la columna pedida y desempatar por la clave (necesario para paginar)
+            if column == self.key:
+                order = f"\n        order by [{self.key}]{direction}"
+            else:
+                order = f"\n        order by [{column}]{direction}, [{self.key}]{direction}"
+            # Sin orden explícito ni página se devuelve la tabla en el orden de la base de datos
+            if not sort and not page:
+                order = ""
+            # Sentencia completa
+            sql = f"""
+        select {top}{select_list}
+        from {self.table}{where}{order}
+    """
+            # Guardar la sentencia
+            self._select_sql[shape] = sql
+        # Devolver la sentencia
+        return sql
+
+    # Obtener la sentencia SELECT de las filas cuya columna está en una lista de valores
+    # La lista se escribe como {values} y se completa con los marcadores al ejecutar (ver utlis.expand.select_in).
+    def select_in_template(self, column: str) -> str:
+        # Verificar la columna (el nombre se escribe en la sentencia)
+        if column not in self.columns:
+            raise ValueError(f"Columna no permitida: {column}")
+        # Lista de columnas
+        select_list = "\n            ,".join(f"[{c}]" for c in self.columns)
+        # Devolver la sentencia
+        return f"""
+        select {select_list}
+        from {self.table}
+        where [{column}] in ({{values}})
+    """
+
+    # Obtener la condición para leer las filas posteriores a una posición (valor de la columna de orden, clave)
+    # SQL Server ordena los NULL primero en orden ascendente y al final en orden descendente.
+    def _after_condition(self, column: str, descending: bool, after_null: bool) -> str:
+        # Comparación según la dirección del orden
+        op = "<" if descending else ">"
+        # Ordenar solo por la clave
+        if column == self.key:
+            return f"[{self.key}] {op} ?"
+        # Después de una fila con NULL: el resto de los NULL y, en orden ascendente, todos los valores
+        if after_null:
+            if descending:
+                return f"([{column}] is null and [{self.key}] {op} ?)"
+            return f"([{column}] is not null or [{self.key}] {op} ?)"
+        # Después de una fila con valor: valores posteriores, empates con clave posterior y, en orden descendente, los NULL
+        condition = f"[{column}] {op} ? or ([{column}] = ? and [{self.key}] {op} ?)"
+        if descending:
+            condition += f" or [{column}] is null"
+        return f"({condition})"
+
+    # Obtener la sentencia y los parámetros de un listado con filtros, orden y página
+    # filters son ternas (columna, operador, valor) y se ignoran las que tienen valor None; top es el número de
+    # filas a leer (None para leer todas), after la posición (valor de la columna de orden, clave) de la última
+    # fila devuelta por la página anterior y columns las columnas a leer (None para todas).
+    def select_statement(
+        self,
+        filters: list[tuple[str, str, object]] = (),
+        sort: str | None = None,
+        top: int | None = None,
+        after: tuple | None = None,
+        columns: tuple[str, ...] | None = None
+    ) -> tuple[str, list]:
+        # Filtros enviados
+        active = [(name, operator, value) for name, operator, value in filters if value is not None]
+        # Tipo de página
+        if top is None:
+            page = None
+        elif after is None:
+            page = "first"
+        else:
+            page = "after_null" if after[0] is None else "after"
+        # Sentencia para esta forma de consulta
+        sql = self.select_sql(tuple((name, operator) for name, operator, _ in active), sort, page, columns)
+        # Parámetros en el orden de la sentencia: TOP, filtros y posición de la página anterior
+        params = [top] if top is not None else []
+        params.extend(value for _, _, value in active)
+        if page == "after_null" or page == "after" and (sort or self.key).removeprefix("-") == self.key:
+            params.append(after[1])
+        elif page == "after":
+            params.extend((after[0], after[0], after[1]))
+        # Devolver la sentencia y los parámetros
+        return sql, params
+
+    # Obtener los valores de la clave de un elemento
+    def key_params(self, item: BaseModel) -> list:
+        # Leer cada columna clave
+        return [getattr(item, k) for k in self.keys]
+
+    # Obtener la sentencia y los parámetros para insertar un elemento
+    def insert_statement(self, item: BaseModel) -> tuple[str, list]:
+        # Valores de las columnas a insertar
+        params = [getattr(item, c) for c in self.insert_columns]
+        # Agregar la clave para la consulta que devuelve la fila
+        if self.returning:
+            params.extend(self.key_params(item))
+        # Devolver la sentencia y los parámetros
+        return self.insert_sql, params
+
+    # Obtener la sentencia y los parámetros para actualizar los campos enviados de un elemento
+    # Devuelve None si el elemento no trae ningún campo actualizable.
+    def update_statement(self, item: BaseModel, exclude_none: bool = False) -> tuple[str, list] | None:
+        # Obtener los campos enviados
+        data = item.model_dump(exclude_unset=True, exclude_none=exclude_none)
+        # Campos a actualizar en el orden de las columnas (una sentencia por conjunto, sin importar el orden)
+        fields = tuple(c for c in self.update_columns if c in data)
+        # Nada que actualizar
+        if not fields:
+            return None
+        # Valores de los campos seguidos de la clave
+        params = [data[f] for f in fields] + self.key_params(item)
+        # Agregar la clave para la consulta que devuelve la fila
+        if self.returning:
+            params.extend(self.key_params(item))
+        # Devolver la sentencia y los parámetros
+        return self.update_sql(fields), params
+
+    # Obtener las filas para una inserción masiva en el orden recibido
+    def bulk_rows(self, items: list[BaseModel]) -> list[list]:
+        # Leer las columnas a insertar de cada elemento
+        return [[getattr(item, c) for c in self.insert_columns] for item in items]
+
+    # Obtener las estadísticas del repositorio
+    def stats(self) -> dict:
+        # Devolver el número de sentencias UPDATE generadas
+        return {
+            "table": self.table,
+            "update_statements": len(self._update_sql),
+            "select_statements": len(self._select_sql)
+        }
+
+# Función para obtener las estadísticas de todos los repositorios
+def get_repository_stats() -> list[dict]:
+    # Devolver las estadísticas de cada repositorio
+    return [repository.stats() for repository in _repositories]
@@ -0,0 +1,317 @@
+# Módulo con los índices en memoria para las búsquedas que no deben recorrer la tabla.
+# PrefixIndex guarda los nombres normalizados (sin acentos ni mayúsculas) de una tabla en un arreglo ordenado
+# para el autocompletado con búsqueda binaria (bisect); LinkIndex guarda una relación entre dos columnas para
+# las búsquedas inversas (por ejemplo, los platos que usan un ingrediente). Cada índice se construye con una
+# sola consulta la primera vez que se usa y los controladores de creación, actualización y eliminación lo
+# mantienen al día; si la versión de sus tablas cambió por otra vía (por ejemplo, otro worker, comparando con
+# los incrementos hechos por este proceso) o el índice superó su edad máxima, se vuelve a construir.
+# Importar librerías necesarias
+# Librerías para clases abstractas, búsqueda binaria, entorno, hilos, normalización de texto y medición de tiempos
+from abc import ABC, abstractmethod
+import bisect
+import os
+import threading
+import time
+import unicodedata
+from utlis.database import execute_query_rows
+from utlis.singleflight import SingleFlight
+from utlis.versions import tables_read, table_versions, local_versions
+
+# Edad máxima de un índice antes de volver a construirlo
+search_index_ttl: float = float(os.getenv("SEARCH_INDEX_TTL_SECONDS", "300"))
+# Número máximo de sugerencias por búsqueda
+search_max_results: int = int(os.getenv("SEARCH_MAX_RESULTS", "50"))
+
+# Índices creados (para las estadísticas)
+_indexes: list["_TableIndex"] = []
+# Construcciones en curso (una sola consulta aunque lleguen varias búsquedas a la vez)
+_builds = SingleFlight()
+
+# Función para normalizar un texto para la búsqueda (sin acentos, sin mayúsculas y con espacios simples)
+def normalize_text(text: str) -> str:
+    # Separar las letras de sus acentos y quitar los acentos
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    # Pasar a minúsculas y unir las palabras con un solo espacio
+    return " ".join(stripped.casefold().split())
+
+# Obtener las claves de un nombre: el nombre completo y el resto a partir de cada palabra
+# (así "manch" encuentra "Queso Manchego")
+def _keys(name: str) -> list[str]:
+    # Palabras del nombre normalizado
+    words = normalize_text(name).split(" ")
+    # Una clave por cada palabra hasta el final del nombre
+    return [" ".join(words[i:]) for i in range(len(words)) if words[i]]
+
+# Índice en memoria construido a partir de una consulta y mantenido por los controladores
+# (cada tipo de índice define cómo cargar sus filas y cómo informar su tamaño)
+class _TableIndex(ABC):
+    # Inicializar el índice (se construye al primer uso)
+    def __init__(self, name: str, select_sql: str):
+        # Nombre del índice y sentencia que lee sus datos
+        self.name = name
+        self.select_sql = select_sql
+        # Tablas de las que dependen las versiones
+        self.tables = tables_read(select_sql)
+        # Versión de las tablas y momento de la última construcción (None si no se construyó)
+        self._version: tuple[int, ...] | None = None
+        # Incrementos propios de este proceso en las tablas cuando se fijó la versión
+        self._local: tuple[int, ...] = ()
+        self._built_at = 0.0
+        # Bloqueo para modificar el índice
+        self._lock = threading.Lock()
+        # Contadores para las estadísticas
+        self._builds = 0
+        self._searches = 0
+        self._search_time = 0.0
+        # Registrar el índice
+        _indexes.append(self)
+
+    # Verificar si hay que volver a construir el índice
+    def _stale(self) -> bool:
+        # No se construyó, venció o las tablas cambiaron sin pasar por este índice
+        return (
+            self._version is None
+            or time.monotonic() - self._built_at > search_index_ttl
+            or table_versions(*self.tables) != self._version
+        )
+
+    # Construir el índice con una sola consulta
+    async def _build(self):
+        # Versión de las tablas antes de consultar (una escritura durante la consulta obliga a reconstruir)
+        version = table_versions(*self.tables)
+        local = local_versions(*self.tables)
+        # Leer las filas
+        rows = await execute_query_rows(self.select_sql)
+        # Reemplazar el contenido del índice
+        with self._lock:
+            self._load(rows)
+            self._version = version
+            self._local = local
+            self._built_at = time.monotonic()
+            self._builds += 1
+
+    # Cargar el contenido del índice a partir de las filas (se llama con el bloqueo tomado)
+    @abstractmethod
+    def _load(self, rows: list[dict]):
+        ...
+
+    # Construir el índice si hace falta
+    async def ensure(self):
+        # Construir solo si está vencido (las búsquedas simultáneas comparten la construcción)
+        if self._stale():
+            await _builds.do(self.name, self._build)
+
+    # Registrar que el índice refleja la escritura que acaba de incrementar la versión de las tablas
+    # (se llama con el bloqueo tomado)
+    # La versión avanza solo si todos los cambios desde la anterior son incrementos de este proceso; si otro
+    # worker o escritor también cambió las tablas, la versión queda atrás y el índice se reconstruye al usarlo.
+    def _written(self):
+        # Versión actual e incrementos propios
+        version = table_versions(*self.tables)
+        local = local_versions(*self.tables)
+        # Comparar los cambios de cada tabla con los hechos por este proceso (una versión desconocida, negativa,
+        # no permite comparar y deja que el índice se reconstruya)
+        if all(v >= 0 and old_v >= 0 and v - old_v == l - old_l for v, old_v, l, old_l in zip(version, self._version, local, self._local)):
+            self._version = version
+            self._local = local
+
+    # Registrar una escritura en las tablas que no cambia el contenido del índice
+    # (por ejemplo, un cambio en otra columna o una actualización que no encontró la fila)
+    def mark_written(self):
+        with self._lock:
+            # Nada que hacer si el índice aún no se construyó
+            if self._version is None:
+                return
+            self._written()
+
+    # Contar una búsqueda
+    def _count(self, start: float):
+        self._searches += 1
+        self._search_time += time.perf_counter() - start
+
+    # Obtener el tamaño del índice (se llama con el bloqueo tomado)
+    @abstractmethod
+    def _size(self) -> dict:
+        ...
+
+    # Obtener las estadísticas del índice
+    def stats(self) -> dict:
+        # Devolver el tamaño, las construcciones y el tiempo medio de búsqueda
+        with self._lock:
+            return {
+                "name": self.name,
+                **self._size(),
+                "builds": self._builds,
+                "searches": self._searches,
+                "avg_search_us": round(self._search_time / self._searches * 1_000_000, 1) if self._searches else 0.0
+            }
+
+# Índice de prefijos de los nombres de una tabla
+class PrefixIndex(_TableIndex):
+    # Inicializar el índice a partir del repositorio de la tabla
+    def __init__(self, name: str, repository, column: str = "name"):
+        # Columna indexada y clave de la tabla
+        self.column = column
+        self.key = repository.key
+        # Claves ordenadas (clave normalizada, ID) y nombre original por ID
+        self._entries: list[tuple[str, int]] = []
+        self._names: dict[int, str] = {}
+        # Leer solo los IDs y nombres de la tabla
+        super().__init__(name, repository.select_sql(columns=(repository.key, column)))
+
+    # Cargar los nombres y ordenar sus claves
+    def _load(self, rows: list[dict]):
+        self._names = {row[self.key]: row[self.column] for row in rows if row[self.column]}
+        self._entries = sorted((key, id) for id, name in self._names.items() for key in _keys(name))
+
+    # Buscar los nombres que empiezan por un prefijo (en cualquier palabra), sin acentos ni mayúsculas
+    async def search(self, prefix: str, limit: int = 10) -> list[dict]:
+        # Asegurar que el índice esté construido y al día
+        await self.ensure()
+        # Normalizar el prefijo
+        prefix = normalize_text(prefix)
+        start = time.perf_counter()
+        # IDs encontrados en el orden de las claves
+        found: dict[int, None] = {}
+        with self._lock:
+            # Posición de la primera clave mayor o igual al prefijo
+            position = bisect.bisect_left(self._entries, (prefix,))
+            # Recorrer las claves que empiezan por el prefijo
+            while position < len(self._entries) and len(found) < limit:
+                key, id = self._entries[position]
+                if not key.startswith(prefix):
+                    break
+                found[id] = None
+                position += 1
+            # Sugerencias con el nombre original
+            results = [{"id": id, "name": self._names[id]} for id in found]
+            # Contar la búsqueda
+            self._count(start)
+        # Devolver las sugerencias
+        return results
+
+    # Agregar o reemplazar el nombre de un elemento (después de crearlo o actualizarlo)
+    def upsert(self, id: int, name: str | None):
+        with self._lock:
+            # Nada que hacer si el índice aún no se construyó (se construirá con el dato nuevo)
+            if self._version is None:
+                return
+            # Quitar las claves anteriores del elemento
+            self._discard(id)
+            # Agregar las claves del nombre nuevo en su posición
+            if name:
+                self._names[id] = name
+                for key in _keys(name):
+                    bisect.insort(self._entries, (key, id))
+            self._written()
+
+    # Quitar un elemento (después de eliminarlo)
+    def remove(self, id: int):
+        with self._lock:
+            # Nada que hacer si el índice aún no se construyó
+            if self._version is None:
+                return
+            # Quitar las claves del elemento
+            self._discard(id)
+            self._written()
+
+    # Quitar las claves de un elemento (se llama con el bloqueo tomado)
+    def _discard(self, id: int):
+        # Nombre anterior del elemento
+        name = self._names.pop(id, None)
+        if name is None:
+            return
+        # Quitar cada clave con una búsqueda binaria
+        for key in _keys(name):
+            position = bisect.bisect_left(self._entries, (key, id))
+            if position < len(self._entries) and self._entries[position] == (key, id):
+                del self._entries[position]
+
+    # Obtener el tamaño del índice
+    def _size(self) -> dict:
+        return {"items": len(self._names), "keys": len(self._entries)}
+
+# Índice inverso de una relación entre dos columnas (por ejemplo, ingrediente -> platos que lo usan)
+# La sentencia devuelve filas con las columnas source y target; el índice responde qué valores de source
+# están relacionados con uno o varios valores de target sin recorrer la tabla.
+class LinkIndex(_TableIndex):
+    # Inicializar el índice
+    def __init__(self, name: str, select_sql: str, source: str, target: str):
+        # Columnas de la relación
+        self.source = source
+        self.target = target
+        # Valores de source por cada target y de target por cada source
+        self._by_target: dict[int, set[int]] = {}
+        self._by_source: dict[int, set[int]] = {}
+        super().__init__(name, select_sql)
+
+    # Cargar las relaciones
+    def _load(self, rows: list[dict]):
+        self._by_target = {}
+        self._by_source = {}
+        for row in rows:
+            self._link(row[self.source], row[self.target])
+
+    # Agregar una relación (se llama con el bloqueo tomado)
+    def _link(self, source: int, target: int):
+        self._by_target.setdefault(target, set()).add(source)
+        self._by_source.setdefault(source, set()).add(target)
+
+    # Obtener los valores de source relacionados con alguno de los targets, ordenados
+    async def lookup(self, targets) -> list[int]:
+        # Asegurar que el índice esté construido y al día
+        await self.ensure()
+        start = time.perf_counter()
+        with self._lock:
+            # Unir los valores de cada target
+            found = set()
+            for target in targets:
+                found.update(self._by_target.get(target, ()))
+            # Contar la búsqueda
+            self._count(start)
+        # Devolver los valores ordenados
+        return sorted(found)
+
+    # Agregar relaciones (después de insertarlas) como pares (source, target)
+    def add(self, *pairs: tuple[int, int]):
+        with self._lock:
+            # Nada que hacer si el índice aún no se construyó
+            if self._version is None:
+                return
+            for source, target in pairs:
+                self._link(source, target)
+            self._written()
+
+    # Quitar relaciones (después de eliminarlas): un par, todas las de un source o todas las de un target
+    def discard(self, source: int | None = None, target: int | None = None):
+        with self._lock:
+            # Nada que hacer si el índice aún no se construyó
+            if self._version is None:
+                return
+            # Pares a quitar
+            if source is not None and target is not None:
+                pairs = [(source, target)]
+            elif source is not None:
+                pairs = [(source, t) for t in self._by_source.get(source, ())]
+            else:
+                pairs = [(s, target) for s in self._by_target.get(target, ())]
+            # Quitar cada par de los dos lados
+            for s, t in pairs:
+                self._by_target.get(t, set()).discard(s)
+                self._by_source.get(s, set()).discard(t)
+                # Quitar los conjuntos que quedaron vacíos
+                if not self._by_target.get(t, True):
+                    del self._by_target[t]
+                if not self._by_source.get(s, True):
+                    del self._by_source[s]
+            self._written()
+
+    # Obtener el tamaño del índice
+    def _size(self) -> dict:
+        return {"targets": len(self._by_target), "links": sum(len(s) for s in self._by_target.values())}
+
+# Función para obtener las estadísticas de todos los índices
+def get_search_stats() -> list[dict]:
+    # Devolver las estadísticas de cada índice
+    return [index.stats() for index in _indexes]
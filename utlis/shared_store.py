@@ -0,0 +1,340 @@
+# Módulo con el almacén compartido entre los procesos de la aplicación.
+# Es una base SQLite en memoria compartida (/dev/shm) que todos los workers de uvicorn del mismo host abren a
+# la vez; guarda los elementos de las cachés, sus etiquetas y las versiones de las tablas, de modo que una
+# escritura atendida por cualquier worker invalida los datos de todos.
+# La base vive en un directorio privado del usuario (0700) y los valores se guardan como JSON, nunca como
+# objetos serializados con pickle, así otro usuario del host no puede inyectar código en los workers.
+# Las llamadas se hacen desde el event loop, así que esperan un bloqueo de la base muy poco tiempo: si la base está
+# ocupada, una lectura cuenta como fallo de caché y una invalidación se reintenta desde un hilo aparte.
+# Importar librerías necesarias
+# Librerías para SQLite, JSON, fechas, permisos, entorno, logging, colas, hilos y archivos temporales
+from datetime import date, datetime, time as dt_time
+import json
+import logging
+import os
+import queue
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+
+# Ruta de la base compartida (en un directorio privado del usuario, en memoria compartida si el sistema la tiene)
+shared_store_path: str = os.getenv(
+    "CACHE_SHARED_PATH",
+    os.path.join(
+        "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+        f"kitchens_cache-{os.getuid()}",
+        "cache.sqlite3"
+    )
+)
+
+# Tiempo máximo de espera por un bloqueo de la base en las llamadas de las peticiones
+shared_store_timeout: float = float(os.getenv("CACHE_SHARED_TIMEOUT_SECONDS", "0.05"))
+# Tiempo máximo de espera por un bloqueo de la base al reintentar una escritura fuera del event loop
+shared_store_retry_timeout: float = float(os.getenv("CACHE_SHARED_RETRY_TIMEOUT_SECONDS", "5"))
+
+# Configurar el logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Script SQL para crear las tablas del almacén
+SCHEMA_SQL: str = """
+    create table if not exists entries (
+        cache text not null,
+        key text not null,
+        value text not null,
+        expires_at real not null,
+        stored_at real not null,
+        primary key (cache, key)
+    );
+    create index if not exists entries_age on entries (cache, stored_at);
+    create table if not exists tags (
+        cache text not null,
+        tag text not null,
+        key text not null,
+        primary key (cache, tag, key)
+    );
+    create index if not exists tags_key on tags (cache, key);
+    create table if not exists versions (
+        name text primary key,
+        version integer not null
+    );
+"""
+
+# Convertir a JSON los valores que no tienen representación propia (fechas y horas)
+def _encode_value(value):
+    # Guardar las fechas y horas con su tipo para recuperarlas igual
+    if isinstance(value, datetime):
+        return {"$t": "datetime", "v": value.isoformat()}
+    if isinstance(value, date):
+        return {"$t": "date", "v": value.isoformat()}
+    if isinstance(value, dt_time):
+        return {"$t": "time", "v": value.isoformat()}
+    # Rechazar cualquier otro tipo
+    raise TypeError(f"Valor no admitido en la caché compartida: {type(value).__name__}")
+
+# Recuperar las fechas y horas guardadas con su tipo
+def _decode_value(obj: dict):
+    # Convertir según el tipo guardado
+    kind = obj.get("$t")
+    if kind == "datetime":
+        return datetime.fromisoformat(obj["v"])
+    if kind == "date":
+        return date.fromisoformat(obj["v"])
+    if kind == "time":
+        return dt_time.fromisoformat(obj["v"])
+    # Devolver los demás objetos sin cambios
+    return obj
+
+# Serializar un valor como JSON (las tuplas se guardan como listas)
+def dump_value(value) -> str:
+    # Convertir a texto JSON
+    return json.dumps(value, default=_encode_value, separators=(",", ":"))
+
+# Deserializar un valor guardado como JSON
+def load_value(text: str):
+    # Convertir desde el texto JSON
+    return json.loads(text, object_hook=_decode_value)
+
+# Función para crear el directorio de la base y verificar que solo el usuario actual puede usarlo
+def _private_directory(path: str):
+    # Directorio de la base
+    directory = os.path.dirname(os.path.abspath(path))
+    # Crear el directorio con permisos solo para el usuario
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    # Verificar el dueño y los permisos del directorio (sin seguir enlaces)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        # Lanzar error si otro usuario puede escribir o crear la base
+        raise PermissionError(f"El directorio de la caché compartida debe ser del usuario actual y tener permisos 0700: {directory}")
+    # Verificar el dueño de la base si ya existe
+    if os.path.lexists(path) and os.lstat(path).st_uid != os.getuid():
+        # Lanzar error si la base es de otro usuario
+        raise PermissionError(f"La base de la caché compartida pertenece a otro usuario: {path}")
+
+# Almacén compartido sobre SQLite
+class SharedStore:
+    # Inicializar el almacén (la conexión se abre al primer uso en cada proceso)
+    def __init__(self, path: str, timeout: float = shared_store_timeout):
+        # Ruta de la base y tiempo máximo de espera por un bloqueo
+        self.path = path
+        self.timeout = timeout
+        # Conexión del proceso actual y su PID (se reabre tras un fork)
+        self._conn: sqlite3.Connection | None = None
+        self._pid: int | None = None
+        # Bloqueo para usar la conexión desde varios hilos
+        self._lock = threading.Lock()
+
+    # Obtener la conexión del proceso actual (se llama con el bloqueo tomado)
+    def _connection(self) -> sqlite3.Connection:
+        # Abrir la conexión si no existe o si el proceso cambió
+        if self._conn is None or self._pid != os.getpid():
+            # Verificar que el directorio de la base sea privado
+            _private_directory(self.path)
+            # Abrir la base en modo autocommit
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            # Permitir lectores concurrentes y no sincronizar al disco (los datos se pueden reconstruir)
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("pragma synchronous=off")
+            # Crear las tablas si no existen
+            conn.executescript(SCHEMA_SQL)
+            self._conn = conn
+            self._pid = os.getpid()
+        # Devolver la conexión
+        return self._conn
+
+    # Leer un valor vigente de una caché (None si no está o venció)
+    def get(self, cache: str, key: str):
+        # Buscar el valor
+        with self._lock:
+            row = self._connection().execute(
+                "select value from entries where cache = ? and key = ? and expires_at > ?",
+                (cache, key, time.time())
+            ).fetchone()
+        # Deserializar el valor
+        return load_value(row[0]) if row else None
+
+    # Guardar un valor con sus etiquetas y desalojar los más antiguos si se superó el tamaño máximo
+    def set(self, cache: str, key: str, value, ttl: float, tags: tuple[str, ...], max_size: int) -> int:
+        # Serializar fuera del bloqueo
+        text = dump_value(value)
+        now = time.time()
+        # Guardar en una sola transacción
+        with self._lock:
+            conn = self._connection()
+            conn.execute("begin immediate")
+            try:
+                # Reemplazar el valor y sus etiquetas
+                conn.execute(
+                    "insert or replace into entries (cache, key, value, expires_at, stored_at) values (?, ?, ?, ?, ?)",
+                    (cache, key, text, now + ttl, now)
+                )
+                conn.execute("delete from tags where cache = ? and key = ?", (cache, key))
+                conn.executemany("insert or ignore into tags (cache, tag, key) values (?, ?, ?)", [(cache, tag, key) for tag in tags])
+                # Desalojar los elementos más antiguos que superan el tamaño máximo
+                evicted = conn.execute(
+                    """
+                    delete from entries where cache = ? and key in (
+                        select key from entries where cache = ? order by stored_at desc limit -1 offset ?
+                    )
+                    """,
+                    (cache, cache, max_size)
+                ).rowcount
+                # Quitar las etiquetas de los elementos desalojados
+                if evicted:
+                    conn.execute("delete from tags where cache = ? and key not in (select key from entries where cache = ?)", (cache, cache))
+                conn.execute("commit")
+            except BaseException:
+                conn.execute("rollback")
+                raise
+        # Devolver el número de elementos desalojados
+        return evicted
+
+    # Eliminar valores de una caché por clave o por etiqueta y devolver cuántos se quitaron
+    def delete(self, cache: str, key: str | None = None, tag: str | None = None) -> int:
+        # Eliminar en una sola transacción
+        with self._lock:
+            conn = self._connection()
+            conn.execute("begin immediate")
+            try:
+                # Claves a quitar
+                if tag is not None:
+                    keys = [row[0] for row in conn.execute("select key from tags where cache = ? and tag = ?", (cache, tag))]
+                elif key is not None:
+                    keys = [key]
+                else:
+                    keys = [row[0] for row in conn.execute("select key from entries where cache = ?", (cache,))]
+                # Quitar los elementos y sus etiquetas
+                removed = 0
+                for k in keys:
+                    removed += conn.execute("delete from entries where cache = ? and key = ?", (cache, k)).rowcount
+                    conn.execute("delete from tags where cache = ? and key = ?", (cache, k))
+                conn.execute("commit")
+            except BaseException:
+                conn.execute("rollback")
+                raise
+        # Devolver el número de elementos quitados
+        return removed
+
+    # Contar los elementos y etiquetas de una caché
+    def size(self, cache: str) -> tuple[int, int]:
+        # Contar en la base
+        with self._lock:
+            conn = self._connection()
+            entries = conn.execute("select count(*) from entries where cache = ?", (cache,)).fetchone()[0]
+            tags = conn.execute("select count(distinct tag) from tags where cache = ?", (cache,)).fetchone()[0]
+        # Devolver los conteos
+        return entries, tags
+
+    # Incrementar la versión de varios contadores en una sola transacción
+    def bump(self, names: tuple[str, ...]):
+        # Incrementar cada contador
+        with self._lock:
+            conn = self._connection()
+            conn.execute("begin immediate")
+            try:
+                conn.executemany(
+                    "insert into versions (name, version) values (?, 1) on conflict (name) do update set version = version + 1",
+                    [(name,) for name in names]
+                )
+                conn.execute("commit")
+            except BaseException:
+                conn.execute("rollback")
+                raise
+
+    # Leer la versión de varios contadores (0 si nunca se incrementaron)
+    def versions(self, names: tuple[str, ...]) -> tuple[int, ...]:
+        # Nada que leer
+        if not names:
+            return ()
+        # Leer los contadores
+        with self._lock:
+            rows = dict(self._connection().execute(
+                f"select name, version from versions where name in ({','.join('?' for _ in names)})",
+                names
+            ).fetchall())
+        # Devolver las versiones en el orden pedido
+        return tuple(rows.get(name, 0) for name in names)
+
+    # Obtener el identificador aleatorio de esta base (cambia si la base se vuelve a crear)
+    def instance_id(self) -> str:
+        # Crear el identificador la primera vez y leerlo
+        with self._lock:
+            conn = self._connection()
+            conn.execute("insert or ignore into versions (name, version) values ('__instance__', abs(random()))")
+            value = conn.execute("select version from versions where name = '__instance__'").fetchone()[0]
+        # Devolver el identificador en hexadecimal
+        return format(value, "x")
+
+    # Eliminar todos los elementos de todas las cachés (cuando una invalidación no se pudo aplicar)
+    def clear_all(self):
+        # Vaciar los elementos y sus etiquetas en una sola transacción
+        with self._lock:
+            conn = self._connection()
+            conn.execute("begin immediate")
+            try:
+                conn.execute("delete from entries")
+                conn.execute("delete from tags")
+                conn.execute("commit")
+            except BaseException:
+                conn.execute("rollback")
+                raise
+
+    # Leer todos los contadores
+    def all_versions(self) -> dict:
+        # Leer la tabla completa
+        with self._lock:
+            return dict(self._connection().execute("select name, version from versions").fetchall())
+
+# Almacén compartido del proceso
+_store: SharedStore | None = None
+# Escrituras pendientes de reintentar (nombre del método, argumentos)
+_retries: queue.SimpleQueue = queue.SimpleQueue()
+# Hilo que reintenta las escrituras pendientes y PID del proceso que lo creó
+_retry_thread: threading.Thread | None = None
+_retry_pid: int | None = None
+# Bloqueo para crear el hilo
+_retry_lock = threading.Lock()
+
+# Función para obtener el almacén compartido (se crea la primera vez)
+def get_shared_store() -> SharedStore:
+    global _store
+    # Crear el almacén solo si no existe
+    if _store is None:
+        _store = SharedStore(shared_store_path)
+    # Devolver el almacén
+    return _store
+
+# Función para reintentar fuera del event loop una escritura que no se pudo hacer por un bloqueo de la base
+# (por ejemplo, una invalidación o el incremento de versiones tras una escritura ya confirmada)
+def retry_later(method: str, *args, **kwargs):
+    global _retry_thread, _retry_pid
+    # Encolar la escritura
+    _retries.put((method, args, kwargs))
+    # Crear el hilo si no existe en este proceso
+    with _retry_lock:
+        if _retry_thread is None or _retry_pid != os.getpid():
+            _retry_thread = threading.Thread(target=_retry_worker, name="shared-store-retry", daemon=True)
+            _retry_pid = os.getpid()
+            _retry_thread.start()
+
+# Reintentar las escrituras pendientes con una espera más larga (se ejecuta en su propio hilo)
+# Si la escritura vuelve a fallar, se vacían todas las cachés para no entregar datos que debían invalidarse.
+def _retry_worker():
+    # Almacén propio del hilo (su propia conexión, así no retiene el bloqueo del almacén del proceso)
+    store = SharedStore(shared_store_path, timeout=shared_store_retry_timeout)
+    # Atender las escrituras pendientes
+    while True:
+        method, args, kwargs = _retries.get()
+        # Intentar la escritura
+        try:
+            getattr(store, method)(*args, **kwargs)
+        # Vaciar las cachés si no se pudo hacer
+        except sqlite3.Error as e:
+            logger.error(f"No se pudo reintentar la escritura {method} en la caché compartida: {e}")
+            # Intentar vaciar las cachés
+            try:
+                store.clear_all()
+            # Registrar el error si tampoco se pudo
+            except sqlite3.Error as clear_e:
+                logger.error(f"No se pudo vaciar la caché compartida: {clear_e}")
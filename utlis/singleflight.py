@@ -0,0 +1,65 @@
+# Módulo para agrupar llamadas idénticas concurrentes (single-flight).
+# Si llega una lectura igual a otra que todavía está en curso, espera el resultado de la primera en lugar
+# de ocupar otra conexión y repetir la misma consulta.
+# Importar librerías necesarias
+# Librerías para asincronía
+import asyncio
+
+# Grupo de llamadas en curso identificadas por clave
+class SingleFlight:
+    # Inicializar el grupo
+    def __init__(self):
+        # Llamadas en curso por clave
+        self._flights: dict = {}
+        # Contadores para las estadísticas
+        self._executed = 0
+        self._coalesced = 0
+        self._max_waiters = 0
+        # Número de llamadas que esperan a cada llamada en curso
+        self._waiters: dict = {}
+
+    # Ejecutar la función o esperar la llamada en curso con la misma clave
+    # Todas las llamadas agrupadas reciben el mismo resultado o la misma excepción.
+    async def do(self, key, fn, *args, **kwargs):
+        # Buscar una llamada en curso con la misma clave
+        task = self._flights.get(key)
+        # Unirse a la llamada en curso
+        if task is not None:
+            # Contar la llamada agrupada
+            self._coalesced += 1
+            self._waiters[key] += 1
+            self._max_waiters = max(self._max_waiters, self._waiters[key])
+        # Iniciar una llamada nueva
+        else:
+            # Crear la tarea compartida
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._flights[key] = task
+            self._waiters[key] = 1
+            self._executed += 1
+            # Quitar la llamada al terminar para que las siguientes vuelvan a consultar
+            task.add_done_callback(lambda _: self._finish(key, task))
+        # Esperar el resultado sin cancelar la tarea compartida si esta petición se cancela
+        return await asyncio.shield(task)
+
+    # Quitar una llamada terminada
+    def _finish(self, key, task):
+        # Quitar solo si sigue siendo la misma llamada
+        if self._flights.get(key) is task:
+            del self._flights[key]
+            del self._waiters[key]
+        # Marcar la excepción como recuperada si nadie la esperó
+        if not task.cancelled():
+            task.exception()
+
+    # Obtener las estadísticas del grupo
+    def stats(self) -> dict:
+        # Número total de llamadas
+        calls = self._executed + self._coalesced
+        # Devolver las estadísticas
+        return {
+            "in_flight": len(self._flights),
+            "executed": self._executed,
+            "coalesced": self._coalesced,
+            "coalesced_ratio": round(self._coalesced / calls, 4) if calls else 0.0,
+            "max_waiters": self._max_waiters
+        }
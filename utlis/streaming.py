@@ -0,0 +1,99 @@
+# Módulo para las respuestas transmitidas de los listados.
+# Convierte los bloques de filas de la base de datos en NDJSON o en un arreglo JSON a medida que llegan.
+# Importar librerías necesarias
+# Librerías para JSON, fechas, decimales y respuestas de FastAPI
+from datetime import date, datetime, time
+from decimal import Decimal
+import json
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from utlis.database import stream_query_rows
+
+# Tipos de contenido de cada formato transmitido
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json"
+}
+
+# Convertir a JSON los valores que json.dumps no sabe serializar
+def _json_default(value):
+    # Convertir fechas y horas a formato ISO 8601
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    # Convertir decimales a float
+    if isinstance(value, Decimal):
+        return float(value)
+    # Convertir cualquier otro valor a texto
+    return str(value)
+
+# Serializar una fila a JSON
+def _dump(row: dict) -> str:
+    # Serializar la fila sin escapar caracteres no ASCII
+    return json.dumps(row, default=_json_default, ensure_ascii=False)
+
+# Determinar el formato transmitido pedido por el cliente (None si no se pidió transmitir)
+def resolve_stream_format(request: Request, stream: str | None) -> str | None:
+    # Dar prioridad al parámetro de consulta
+    if stream:
+        return stream
+    # Transmitir en NDJSON si el cliente lo pide en la cabecera Accept
+    if MEDIA_TYPES["ndjson"] in request.headers.get("accept", ""):
+        return "ndjson"
+    # No transmitir
+    return None
+
+# Generar el cuerpo en formato NDJSON (una fila por línea)
+async def _ndjson_body(first: list[dict], chunks):
+    # Bloque actual
+    rows = first
+    # Entregar cada bloque como líneas JSON
+    try:
+        while rows is not None:
+            # Entregar el bloque
+            yield "".join(_dump(row) + "\n" for row in rows)
+            # Leer el siguiente bloque
+            rows = await anext(chunks, None)
+    # Cerrar la consulta transmitida aunque el cuerpo se cierre antes de terminar (devuelve la conexión al pool)
+    finally:
+        await chunks.aclose()
+
+# Generar el cuerpo en formato de arreglo JSON
+async def _json_array_body(first: list[dict] | None, chunks):
+    # Bloque actual
+    rows = first
+    # Indica si ya se escribió alguna fila
+    written = False
+    # Entregar el arreglo
+    try:
+        # Abrir el arreglo
+        yield "["
+        # Entregar cada bloque separado por comas
+        while rows is not None:
+            # Serializar el bloque
+            part = ",".join(_dump(row) for row in rows)
+            # Entregar el bloque si tiene filas
+            if part:
+                yield ("," if written else "") + part
+                written = True
+            # Leer el siguiente bloque
+            rows = await anext(chunks, None)
+        # Cerrar el arreglo
+        yield "]"
+    # Cerrar la consulta transmitida aunque el cuerpo se cierre antes de terminar (devuelve la conexión al pool)
+    finally:
+        await chunks.aclose()
+
+# Crear una respuesta transmitida para una consulta SQL
+async def stream_rows_response(sql_template, params=None, stream_format: str = "ndjson") -> StreamingResponse:
+    # Iniciar la consulta transmitida
+    chunks = stream_query_rows(sql_template, params=params)
+    # Leer el primer bloque antes de responder para que los errores de la consulta lleguen como error HTTP
+    first = await anext(chunks, None)
+    # Elegir el generador del cuerpo según el formato
+    if stream_format == "json":
+        body = _json_array_body(first, chunks)
+    # Usar NDJSON por defecto
+    else:
+        body = _ndjson_body(first, chunks)
+    # Devolver la respuesta transmitida
+    return StreamingResponse(body, media_type=MEDIA_TYPES.get(stream_format, MEDIA_TYPES["ndjson"]))
@@ -0,0 +1,165 @@
+# Módulo con las versiones de las tablas.
+# Cada escritura confirmada incrementa la versión de las tablas que modifica, de modo que las respuestas
+# y cachés que dependen de una tabla pueden saber si cambió sin volver a consultarla.
+# Con CACHE_BACKEND=shared las versiones se guardan en el almacén compartido, así una escritura atendida
+# por cualquier worker cambia las versiones que ven todos. Cada lectura es entonces una consulta SQLite local
+# hecha desde el event loop: en WAL no espera a los escritores, y si la base está bloqueada (por ejemplo, al
+# abrirse o durante un checkpoint) espera como máximo CACHE_SHARED_TIMEOUT_SECONDS (50 ms por defecto).
+# Si la lectura falla se devuelven versiones desconocidas (números negativos que no se repiten), así quien
+# compara versiones (cachés, ETag, índices, lecturas agrupadas) actúa como si las tablas hubieran cambiado.
+# Importar librerías necesarias
+# Librerías para expresiones regulares, logging, SQLite, hilos, IDs aleatorios y caché de funciones
+from functools import lru_cache
+import itertools
+import logging
+import re
+import sqlite3
+import threading
+import uuid
+from utlis.cache import cache_backend
+from utlis.shared_store import get_shared_store, retry_later
+
+# Configurar el logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Guardar las versiones en el almacén compartido entre procesos
+shared_versions: bool = cache_backend == "shared"
+# Contador compartido con el total de escrituras
+EPOCH_NAME: str = "__epoch__"
+
+# Identificador de este proceso (evita repetir versiones tras un reinicio)
+boot_id: str = uuid.uuid4().hex[:8]
+# Identificador del almacén compartido (se lee la primera vez)
+_instance_id: str | None = None
+
+# Sentencias que modifican una tabla del esquema (ignora tablas temporales y variables de tabla, y el
+# "then update set" de un MERGE, que no nombra una tabla)
+_WRITE_PATTERN = re.compile(
+    r"\b(?:insert\s+into|update(?!\s+set\b)|delete\s+from|merge\s+into)\s+(?:\[?\w+\]?\.)?\[?(\w+)\]?",
+    re.IGNORECASE
+)
+# Tablas del esquema de las que lee una consulta
+_READ_PATTERN = re.compile(
+    r"\b(?:from|join)\s+(?:\[?\w+\]?\.)?\[?(\w+)\]?",
+    re.IGNORECASE
+)
+
+# Versión actual de cada tabla
+_versions: dict[str, int] = {}
+# Número total de escrituras confirmadas en cualquier tabla
+_epoch = 0
+# Número de incrementos hechos por este proceso en cada tabla (también con versiones compartidas)
+_local: dict[str, int] = {}
+# Bloqueo para las versiones
+_lock = threading.Lock()
+# Generador de versiones desconocidas (cuando no se pudo leer el almacén compartido)
+_unknown = itertools.count(-1, -1)
+
+# Función para obtener las tablas que modifica una sentencia SQL (se analiza una sola vez por texto)
+@lru_cache(maxsize=512)
+def tables_written(sql_template: str) -> tuple[str, ...]:
+    # Devolver los nombres de tabla sin repetir, en minúsculas
+    return tuple(dict.fromkeys(name.lower() for name in _WRITE_PATTERN.findall(sql_template)))
+
+# Función para obtener las tablas de las que lee una consulta SQL (se analiza una sola vez por texto)
+@lru_cache(maxsize=512)
+def tables_read(sql_template: str) -> tuple[str, ...]:
+    # Devolver los nombres de tabla sin repetir, en minúsculas
+    return tuple(dict.fromkeys(name.lower() for name in _READ_PATTERN.findall(sql_template)))
+
+# Función para normalizar el texto de una consulta SQL (espacios y saltos de línea)
+@lru_cache(maxsize=512)
+def normalize_sql(sql_template: str) -> str:
+    # Unir las palabras con un solo espacio
+    return " ".join(sql_template.split())
+
+# Función para incrementar la versión de las tablas modificadas
+def bump(*tables: str):
+    global _epoch
+    # Contar los incrementos propios de este proceso
+    with _lock:
+        for table in tables:
+            _local[table] = _local.get(table, 0) + 1
+    # Incrementar en el almacén compartido
+    # (la escritura en la base ya está confirmada: si el almacén está ocupado se reintenta en otro hilo y, si
+    # tampoco se puede, se vacían las cachés; nunca se convierte en un error de la petición)
+    if shared_versions:
+        try:
+            get_shared_store().bump((EPOCH_NAME, *tables))
+        except sqlite3.Error as e:
+            logger.warning(f"Incremento de versiones pospuesto para {tables}: {e}")
+            retry_later("bump", (EPOCH_NAME, *tables))
+        return
+    # Incrementar cada tabla y el total de escrituras
+    with _lock:
+        _epoch += 1
+        for table in tables:
+            _versions[table] = _versions.get(table, 0) + 1
+
+# Función para leer contadores del almacén compartido (versiones desconocidas si la base está ocupada)
+def _shared_versions(names: tuple[str, ...]) -> tuple[int, ...]:
+    # Leer los contadores
+    try:
+        return get_shared_store().versions(names)
+    # Devolver versiones que no coinciden con ninguna otra lectura
+    except sqlite3.Error as e:
+        logger.warning(f"No se pudieron leer las versiones de {names}: {e}")
+        return tuple(next(_unknown) for _ in names)
+
+# Función para obtener la versión actual de una o varias tablas
+# (con versiones compartidas puede devolver versiones desconocidas, negativas, si el almacén está ocupado)
+def table_versions(*tables: str) -> tuple[int, ...]:
+    # Leer del almacén compartido
+    if shared_versions:
+        return _shared_versions(tables)
+    # Leer las versiones de forma consistente
+    with _lock:
+        return tuple(_versions.get(table, 0) for table in tables)
+
+# Función para obtener cuántas veces este proceso incrementó la versión de una o varias tablas
+# (la diferencia con table_versions indica si otro proceso escribió en ellas)
+def local_versions(*tables: str) -> tuple[int, ...]:
+    # Leer los contadores propios de forma consistente
+    with _lock:
+        return tuple(_local.get(table, 0) for table in tables)
+
+# Función para obtener el número total de escrituras confirmadas
+def write_epoch() -> int:
+    # Leer del almacén compartido
+    if shared_versions:
+        return _shared_versions((EPOCH_NAME,))[0]
+    # Devolver el contador
+    return _epoch
+
+# Función para obtener el identificador de las versiones (del proceso o del almacén compartido)
+# Forma parte de los ETag para que una versión repetida tras un reinicio no coincida con una anterior.
+def versions_id() -> str:
+    global _instance_id
+    # Usar el identificador del proceso si las versiones son locales
+    if not shared_versions:
+        return boot_id
+    # Leer el identificador del almacén la primera vez
+    if _instance_id is None:
+        # Intentar leer el identificador
+        try:
+            _instance_id = get_shared_store().instance_id()
+        # Usar el del proceso mientras la base esté ocupada (un ETag con él solo coincide en este mismo proceso)
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo leer el identificador del almacén compartido: {e}")
+            return boot_id
+    # Devolver el identificador
+    return _instance_id
+
+# Función para obtener todas las versiones conocidas
+def get_table_versions() -> dict:
+    # Leer del almacén compartido
+    if shared_versions:
+        # Intentar leer todos los contadores (sin contadores si la base está ocupada)
+        try:
+            tables = get_shared_store().all_versions()
+        except sqlite3.Error:
+            tables = None
+        return {"id": versions_id(), "shared": True, "tables": tables}
+    # Devolver una copia de las versiones
+    with _lock:
+        return {"id": boot_id, "shared": False, "tables": dict(_versions)}
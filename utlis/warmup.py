@@ -0,0 +1,50 @@
+# Módulo para la precarga de las cachés al iniciar la aplicación.
+# Ejecuta las funciones de carga de cada entidad antes de que la aplicación empiece a recibir peticiones y
+# registra cuánto tardó la precarga y cuánta memoria usó.
+# Importar librerías necesarias
+# Librerías para asincronía, entorno, logging, medición de memoria y de tiempos
+import asyncio
+import logging
+import os
+import time
+import tracemalloc
+
+# Configurar el logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Precargar las cachés al iniciar (desactivado por defecto)
+cache_warmup: bool = os.getenv("CACHE_WARMUP", "false").lower() in ("1", "true", "yes")
+
+# Función para precargar las cachés con las funciones de carga indicadas (nombre -> función asíncrona)
+# Cada función devuelve el número de elementos cargados; un error en una carga no impide el arranque.
+async def warm_up(loaders: dict) -> dict:
+    # Empezar a medir la memoria y el tiempo
+    tracemalloc.start()
+    start = time.perf_counter()
+    # Ejecutar todas las cargas a la vez
+    results = await asyncio.gather(*(loader() for loader in loaders.values()), return_exceptions=True)
+    # Terminar la medición
+    duration = time.perf_counter() - start
+    memory, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Elementos cargados por entidad
+    loaded = {}
+    # Revisar el resultado de cada carga
+    for name, result in zip(loaders, results):
+        # Registrar las cargas que fallaron
+        if isinstance(result, BaseException):
+            logger.warning(f"No se pudo precargar la caché de {name}: {result}")
+            loaded[name] = None
+        else:
+            loaded[name] = result
+    # Resumen de la precarga
+    summary = {
+        "duration_ms": round(duration * 1000, 3),
+        "memory_kb": round(memory / 1024, 1),
+        "memory_peak_kb": round(peak / 1024, 1),
+        "loaded": loaded
+    }
+    # Registrar la precarga
+    logger.info("Cachés precargadas", extra=summary)
+    # Devolver el resumen
+    return summary